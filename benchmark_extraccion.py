@@ -0,0 +1,122 @@
+"""
+Script para comparar la agregación de features con la moda por grupo
+vectorizada contra la versión anterior con safe_mode (una llamada por grupo)
+Ejecutar: python benchmark_extraccion.py [--filas N] [--productos N] [--db]
+"""
+import argparse
+import os
+import time
+
+import django
+import numpy as np
+import pandas as pd
+
+# Configurar Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mlproject.settings')
+django.setup()
+
+from predicciones.ml_model import VentasPredictor
+
+
+def agregar_con_safe_mode(df):
+    """
+    Agregación anterior: la moda del día de la semana con una función de
+    Python que pandas llama una vez por grupo
+    """
+    df = df.copy()
+    df['fecha'] = pd.to_datetime(df['fecha_venta'])
+    df['mes'] = df['fecha'].dt.month
+    df['anio'] = df['fecha'].dt.year
+    df['dia_semana'] = df['fecha'].dt.dayofweek
+    df['trimestre'] = df['fecha'].dt.quarter
+
+    def safe_mode(x):
+        if len(x) == 0:
+            return 0
+        mode_result = x.mode()
+        return mode_result.iloc[0] if len(mode_result) > 0 else x.iloc[0]
+
+    return df.groupby(['producto_id', 'mes', 'anio']).agg({
+        'cantidad_vendida': 'sum',
+        'subtotal_venta': 'sum',
+        'producto_precio': 'first',
+        'producto_categoria_id': 'first',
+        'producto_marca_id': 'first',
+        'trimestre': 'first',
+        'dia_semana': safe_mode
+    }).reset_index()
+
+
+def detalles_sinteticos(filas, productos, semilla=0):
+    """
+    Detalles de ventas aleatorios con la forma de VentasPredictor.consultar_detalles
+    """
+    rng = np.random.default_rng(semilla)
+    producto_id = rng.integers(1, productos + 1, filas)
+    inicio = np.datetime64('2023-01-01T00:00:00', 's')
+    segundos = rng.integers(0, 3 * 365 * 24 * 3600, filas)
+
+    return pd.DataFrame({
+        'producto_id': producto_id,
+        'producto_precio': (producto_id % 97 + 5).astype(np.float64),
+        'producto_categoria_id': producto_id % 7,
+        'producto_marca_id': producto_id % 11,
+        'fecha_venta': pd.to_datetime(inicio + segundos).tz_localize('UTC'),
+        'cantidad_vendida': rng.integers(1, 6, filas),
+        'subtotal_venta': rng.integers(500, 50000, filas) / 100,
+    })
+
+
+def medir(funcion, *args, repeticiones=3):
+    """
+    Mejor tiempo de varias ejecuciones y el último resultado
+    """
+    mejor = float('inf')
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion(*args)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--filas', type=int, default=200000, help='Detalles sintéticos')
+    parser.add_argument('--productos', type=int, default=2000, help='Productos distintos')
+    parser.add_argument('--db', action='store_true',
+                        help='Medir también la extracción completa desde la base de datos')
+    args = parser.parse_args()
+
+    predictor = VentasPredictor()
+
+    print("=" * 60)
+    print("BENCHMARK DE AGREGACIÓN DE FEATURES")
+    print("=" * 60)
+
+    df = detalles_sinteticos(args.filas, args.productos)
+    print(f"\nDetalles sintéticos: {len(df)} ({args.productos} productos)")
+
+    t_anterior, anterior = medir(agregar_con_safe_mode, df)
+    t_nuevo, nuevo = medir(lambda d: predictor.agregar_features(d.copy()), df)
+
+    iguales = (
+        len(anterior) == len(nuevo)
+        and (anterior['dia_semana'].to_numpy() == nuevo['dia_semana'].to_numpy()).all()
+    )
+    print(f"  Grupos:                {len(nuevo)}")
+    print(f"  safe_mode por grupo:   {t_anterior:.3f}s")
+    print(f"  moda vectorizada:      {t_nuevo:.3f}s  ({t_anterior / t_nuevo:.1f}x)")
+    print(f"  Mismo resultado:       {'✅ sí' if iguales else '❌ no'}")
+
+    if args.db:
+        print("\nExtracción desde la base de datos:")
+        for modo in ('pandas', 'sql'):
+            t_modo, features = medir(predictor.extraer_agregados, modo, repeticiones=1)
+            print(f"  {modo:8s} {t_modo:.3f}s  ({len(features)} grupos)")
+
+    print("=" * 60)
+    return 0 if iguales else 1
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -61,7 +61,11 @@ def entrenar_modelo_ejemplo():
         print(f"   R² Test: {metricas['r2_test']:.4f}")
         print(f"   RMSE Test: {metricas['rmse_test']:.4f}")
         print(f"   MAE Test: {metricas['mae_test']:.4f}")
-        print(f"   CV R² Mean: {metricas['cv_r2_mean']:.4f} ± {metricas['cv_r2_std']:.4f}")
+        if 'cv_r2_mean' in metricas:
+            print(f"   CV R² Mean: {metricas['cv_r2_mean']:.4f} ± {metricas['cv_r2_std']:.4f}")
+        if 'oob_r2' in metricas:
+            print(f"   OOB R²: {metricas['oob_r2']:.4f}")
+        print(f"   Evaluación: {resultado['evaluacion']} (entrenamiento en {resultado['tiempos']['total']:.2f}s)")
         
         print("\n🎯 Importancia de Features:")
         for feature, importancia in list(resultado['feature_importance'].items())[:5]:
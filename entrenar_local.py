@@ -11,6 +11,7 @@ django.setup()
 
 from predicciones.ml_model import entrenar_y_guardar_modelo
 from predicciones.models import Detalle_Venta
+from predicciones.registro import ruta_historial, ruta_version, ruta_version_actual
 
 def main():
     print("=" * 60)
@@ -42,8 +43,14 @@ def main():
         print(f"  R² (Test):        {resultado['metricas']['r2_test']:.4f}")
         print(f"  RMSE (Test):      {resultado['metricas']['rmse_test']:.4f}")
         print(f"  MAE (Test):       {resultado['metricas']['mae_test']:.4f}")
-        print(f"  CV R² (Mean):     {resultado['metricas']['cv_r2_mean']:.4f}")
-        print(f"  CV R² (Std):      {resultado['metricas']['cv_r2_std']:.4f}")
+        if 'cv_r2_mean' in resultado['metricas']:
+            print(f"  CV R² (Mean):     {resultado['metricas']['cv_r2_mean']:.4f}")
+            print(f"  CV R² (Std):      {resultado['metricas']['cv_r2_std']:.4f}")
+        if 'oob_r2' in resultado['metricas']:
+            print(f"  OOB R²:           {resultado['metricas']['oob_r2']:.4f}")
+            print(f"  OOB RMSE:         {resultado['metricas']['oob_rmse']:.4f}")
+        print(f"  Evaluación:       {resultado['evaluacion']}")
+        print(f"  Tiempo total:     {resultado['tiempos']['total']:.2f}s")
         
         print("\nIMPORTANCIA DE FEATURES:")
         for feature, importancia in list(resultado['feature_importance'].items())[:5]:
@@ -51,15 +58,20 @@ def main():
         
         print("\n" + "=" * 60)
         print("ARCHIVOS GENERADOS:")
-        print("  - predicciones/ml_models/modelo_rf.pkl")
-        print("  - predicciones/ml_models/scaler.pkl")
-        print("  - predicciones/ml_models/feature_names.pkl")
+        # Los artefactos dependen del backend y de ML_REGISTRAR_CUANTILES
+        directorio = ruta_version(resultado['version'])
+        for nombre in sorted(os.listdir(directorio)):
+            sufijo = '/' if os.path.isdir(os.path.join(directorio, nombre)) else ''
+            print(f"  - {os.path.relpath(os.path.join(directorio, nombre))}{sufijo}")
+        print(f"  - {os.path.relpath(ruta_version_actual())} (versión vigente)")
         print("=" * 60)
         
         print("\nPASOS SIGUIENTES:")
         print("1. Verifica los archivos en predicciones/ml_models/")
         print("2. Agrega los archivos al repositorio:")
-        print("   git add predicciones/ml_models/*.pkl")
+        # versiones/ y el puntero están en .gitignore: se agregan con -f
+        print(f"   git add -f {os.path.relpath(ruta_version(resultado['version']))} "
+              f"{os.path.relpath(ruta_version_actual())} {os.path.relpath(ruta_historial())}")
         print("   git commit -m 'Add trained model'")
         print("   git push")
         print("3. Deploy en Render - el modelo ya estará entrenado")
@@ -14,3 +14,12 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mlproject.settings')
 
 application = get_asgi_application()
+
+# Cargar y calentar el modelo al iniciar (con gunicorn --preload se hace una
+# sola vez en el proceso maestro y los workers lo heredan)
+from django.conf import settings
+
+if settings.ML_PRECARGAR_MODELO:
+    from predicciones.inference import precargar_predictor
+
+    precargar_predictor()
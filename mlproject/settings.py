@@ -198,3 +198,125 @@ CACHES = {
 
 # ML Models Directory
 ML_MODELS_DIR = os.path.join(BASE_DIR, 'predicciones', 'ml_models')
+
+# Guardar la distribución de ventas por hoja al entrenar (intervalos por cuantiles).
+# Activarlo cambia el intervalo_confianza de /predecir/: los límites pasan a
+# salir de la distribución de ventas de las hojas en lugar de la dispersión
+# de las predicciones de los árboles
+ML_REGISTRAR_CUANTILES = config('ML_REGISTRAR_CUANTILES', default=False, cast=bool)
+
+# Percentiles del intervalo de confianza
+ML_INTERVALO_PERCENTILES = (5, 95)
+
+# Máximo de filas (producto × mes) evaluadas por llamada al modelo en lotes grandes
+ML_LOTE_MAX_FILAS = 2000
+
+# Máximo de meses por petición de predicción por lotes
+ML_LOTE_MAX_MESES = 36
+
+# Meses futuros a precalcular en PronosticoMaterializado después de entrenar (0 = desactivado)
+ML_MATERIALIZAR_MESES = config('ML_MATERIALIZAR_MESES', default=0, cast=int)
+
+# Segundos entre revisiones de cambios del catálogo de productos en memoria
+ML_CATALOGO_REVISION_SEG = 30
+
+# Predicción agregada: memoria máxima por parte del catálogo y límites de la consulta
+ML_AGREGADA_MEMORIA_MB = config('ML_AGREGADA_MEMORIA_MB', default=64, cast=int)
+ML_AGREGADA_MAX_MESES = 36
+ML_AGREGADA_MAX_TOP_PRODUCTOS = 50
+
+# Máximo de meses para la tendencia de un producto
+ML_TENDENCIA_MAX_MESES = 36
+
+# Mapear en memoria los arreglos del modelo compilado (páginas compartidas entre workers)
+ML_MMAP_MODELO = config('ML_MMAP_MODELO', default=True, cast=bool)
+
+# Cargar y calentar el modelo al iniciar el servidor (wsgi/asgi)
+ML_PRECARGAR_MODELO = config('ML_PRECARGAR_MODELO', default=False, cast=bool)
+
+# Filas del lote de prueba con el que se calienta el modelo
+ML_CALENTAMIENTO_FILAS = 64
+
+# Segundos entre revisiones del puntero de versión del modelo (recarga en caliente)
+ML_RECARGA_REVISION_SEG = 5
+
+# Versiones del modelo que se conservan en disco
+ML_VERSIONES_CONSERVAR = 3
+
+# Núcleos que usa el entrenamiento (fit y validación cruzada); -1 = todos
+ML_ENTRENAMIENTO_N_JOBS = config('ML_ENTRENAMIENTO_N_JOBS', default=-1, cast=int)
+
+# Núcleos del entrenamiento lanzado desde la API: corre en el mismo host que
+# los workers web, así que no usa todos los núcleos (-1 = todos)
+ML_TRABAJO_N_JOBS = config('ML_TRABAJO_N_JOBS', default=1, cast=int)
+
+# Segundos que un trabajo de entrenamiento espera el lock antes de fallar
+ML_ENTRENAMIENTO_ESPERA_LOCK_SEG = 10
+
+# Días que se conservan los archivos de trabajos de entrenamiento terminados
+ML_TRABAJOS_RETENCION_DIAS = config('ML_TRABAJOS_RETENCION_DIAS', default=7, cast=int)
+
+# Extraer las features de entrenamiento de forma incremental (almacén local).
+# Desactivado por defecto: con False se mantiene la extracción completa de siempre
+ML_FEATURE_STORE = config('ML_FEATURE_STORE', default=False, cast=bool)
+
+# Margen hacia atrás de la marca de agua del almacén de features (segundos)
+ML_FEATURE_STORE_MARGEN_SEG = 300
+
+# Modo de extracción de features: 'sql' (agrupa en la base de datos) o 'pandas'
+ML_EXTRACCION_MODO = config('ML_EXTRACCION_MODO', default='sql')
+
+# Filas por parte al leer detalles de ventas con cursor del servidor
+ML_EXTRACCION_CHUNK = 2000
+
+# Algoritmo del modelo: 'random_forest', 'extra_trees' o 'hist_gradient_boosting'
+ML_BACKEND = config('ML_BACKEND', default='random_forest')
+
+# Evaluación del modelo al entrenar: 'oob', 'cv' (5 entrenamientos extra) o 'holdout'.
+# 'cv' es la evaluación de siempre (métricas de prueba + cv_r2_mean/cv_r2_std);
+# 'oob' evita los 5 entrenamientos extra pero reporta oob_* en lugar de cv_*
+ML_EVALUACION = config('ML_EVALUACION', default='cv')
+
+# Búsqueda de hiperparámetros con successive halving al entrenar
+ML_AJUSTAR_HIPERPARAMETROS = config('ML_AJUSTAR_HIPERPARAMETROS', default=False, cast=bool)
+ML_BUSQUEDA_PRESUPUESTO_SEG = config('ML_BUSQUEDA_PRESUPUESTO_SEG', default=120, cast=int)
+# Procesos de la búsqueda; -1 = todos los núcleos
+ML_BUSQUEDA_PROCESOS = config('ML_BUSQUEDA_PROCESOS', default=-1, cast=int)
+# Recurso que crece en cada ronda: 'arboles' o 'datos'
+ML_BUSQUEDA_RECURSO = 'arboles'
+ML_BUSQUEDA_CANDIDATOS = 27
+# En cada ronda sigue 1 de cada ML_BUSQUEDA_FACTOR candidatos
+ML_BUSQUEDA_FACTOR = 3
+# Diferencia de R² de validación dentro de la cual se prefiere el candidato más rápido
+ML_BUSQUEDA_TOLERANCIA_R2 = 0.01
+
+# Entrenamiento con tiempo objetivo (segundos de calibración + ajuste; 0 = sin límite)
+ML_TIEMPO_OBJETIVO_SEG = config('ML_TIEMPO_OBJETIVO_SEG', default=0, cast=int)
+# Filas de la muestra de calibración y mínimos que no se recortan
+ML_PRESUPUESTO_FILAS_CALIBRACION = 20000
+ML_PRESUPUESTO_MIN_FILAS = 2000
+ML_PRESUPUESTO_MIN_ARBOLES = 20
+ML_PRESUPUESTO_MIN_PROFUNDIDAD = 6
+
+# Entrenamiento del bosque repartido en fragmentos (1 = un solo proceso)
+ML_FRAGMENTOS = config('ML_FRAGMENTOS', default=1, cast=int)
+# Procesos locales que entrenan fragmentos; -1 = uno por fragmento, 0 = solo
+# workers de otras máquinas (manage.py entrenar_fragmentos)
+ML_FRAGMENTOS_PROCESOS = config('ML_FRAGMENTOS_PROCESOS', default=-1, cast=int)
+# Directorio compartido con los workers (instantánea de features, plan y fragmentos)
+ML_FRAGMENTOS_DIR = config('ML_FRAGMENTOS_DIR', default=os.path.join(ML_MODELS_DIR, 'fragmentos'))
+# Segundos máximos de espera por los fragmentos
+ML_FRAGMENTOS_ESPERA_SEG = config('ML_FRAGMENTOS_ESPERA_SEG', default=3600, cast=int)
+# Cada cuántos segundos el worker renueva el reclamo del fragmento que entrena,
+# y a partir de cuántos segundos sin renovar se considera que murió
+ML_FRAGMENTOS_LATIDO_SEG = config('ML_FRAGMENTOS_LATIDO_SEG', default=10, cast=int)
+ML_FRAGMENTOS_RECLAMO_VENCIDO_SEG = config('ML_FRAGMENTOS_RECLAMO_VENCIDO_SEG', default=60, cast=int)
+
+# Actualización incremental (manage.py actualizar_modelo): árboles nuevos,
+# periodos recientes con los que se entrenan y si se retiran los más antiguos
+ML_INCREMENTAL_ARBOLES = config('ML_INCREMENTAL_ARBOLES', default=20, cast=int)
+ML_INCREMENTAL_MESES = config('ML_INCREMENTAL_MESES', default=3, cast=int)
+ML_INCREMENTAL_RETIRAR = config('ML_INCREMENTAL_RETIRAR', default=True, cast=bool)
+
+# Filas del lote con el que se mide la latencia de predicción
+ML_LATENCIA_LOTE_FILAS = 256
@@ -0,0 +1,51 @@
+"""
+Módulo para guardar y cargar los arreglos del modelo como archivos .npy
+"""
+import os
+
+import numpy as np
+
+
+def guardar_arreglos(directorio, arreglos):
+    """
+    Guarda cada arreglo como un archivo .npy dentro del directorio
+
+    Cada archivo se escribe primero con otro nombre y luego se reemplaza con
+    os.replace: los procesos que ya tienen mapeado el archivo anterior siguen
+    leyendo su contenido original en lugar de ver un archivo a medio escribir.
+
+    Args:
+        directorio: Directorio destino (se crea si no existe)
+        arreglos: dict {nombre: np.ndarray}
+    """
+    os.makedirs(directorio, exist_ok=True)
+
+    for nombre, arreglo in arreglos.items():
+        ruta = os.path.join(directorio, f'{nombre}.npy')
+        temporal = f'{ruta}.tmp'
+        with open(temporal, 'wb') as archivo:
+            np.save(archivo, np.ascontiguousarray(arreglo))
+        os.replace(temporal, ruta)
+
+
+def cargar_arreglos(directorio, nombres, mmap=True):
+    """
+    Carga los arreglos de un directorio
+
+    Args:
+        directorio: Directorio con los archivos .npy
+        nombres: Nombres de los arreglos a cargar
+        mmap: Si True, mapea los archivos en memoria como solo lectura. Las
+            páginas se comparten entre todos los procesos que cargan los
+            mismos archivos (por ejemplo, los workers de gunicorn).
+
+    Returns:
+        dict {nombre: np.ndarray}
+    """
+    return {
+        nombre: np.load(
+            os.path.join(directorio, f'{nombre}.npy'),
+            mmap_mode='r' if mmap else None
+        )
+        for nombre in nombres
+    }
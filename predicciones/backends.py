@@ -0,0 +1,131 @@
+"""
+Módulo con los algoritmos de entrenamiento disponibles para el modelo de ventas
+"""
+from sklearn.ensemble import ExtraTreesRegressor, HistGradientBoostingRegressor, RandomForestRegressor
+
+from .gradiente import GradienteCuantiles
+
+
+# Espacio de búsqueda compartido por los bosques
+_ESPACIO_BOSQUES = {
+    'max_depth': [6, 8, 10, 12, 16, 20, None],
+    'min_samples_split': [2, 5, 10],
+    'min_samples_leaf': [1, 2, 4, 8],
+    'max_features': [1.0, 0.7, 0.5],
+}
+
+# Especificación de cada algoritmo:
+# - estimador: clase de sklearn
+# - bosque: si es un bosque de árboles independientes (admite el bosque
+#   compilado, los intervalos por árbol y las estadísticas por hoja)
+# - oob: si admite evaluación out-of-bag
+# - submuestreo: si admite max_samples (filas por árbol), que usa el
+#   entrenamiento con tiempo objetivo
+# - parametro_arboles: hiperparámetro con la cantidad de árboles
+# - hiperparametros: valores por defecto
+# - espacio_busqueda: candidatos para la búsqueda de hiperparámetros (la
+#   cantidad de árboles es el recurso de la búsqueda, no se busca)
+BACKENDS = {
+    'random_forest': {
+        'estimador': RandomForestRegressor,
+        'bosque': True,
+        'oob': True,
+        'submuestreo': True,
+        'parametro_arboles': 'n_estimators',
+        'hiperparametros': {
+            'n_estimators': 100,
+            'max_depth': 20,
+            'min_samples_split': 5,
+            'min_samples_leaf': 2,
+            'max_features': 1.0,
+        },
+        'espacio_busqueda': _ESPACIO_BOSQUES,
+    },
+    'extra_trees': {
+        'estimador': ExtraTreesRegressor,
+        'bosque': True,
+        # Sin bootstrap no hay filas fuera de la muestra de cada árbol
+        'oob': False,
+        'submuestreo': False,
+        'parametro_arboles': 'n_estimators',
+        'hiperparametros': {
+            'n_estimators': 100,
+            'max_depth': 20,
+            'min_samples_split': 5,
+            'min_samples_leaf': 2,
+            'max_features': 1.0,
+        },
+        'espacio_busqueda': _ESPACIO_BOSQUES,
+    },
+    'hist_gradient_boosting': {
+        'estimador': HistGradientBoostingRegressor,
+        'bosque': False,
+        'oob': False,
+        'submuestreo': False,
+        'parametro_arboles': 'max_iter',
+        'hiperparametros': {
+            'max_iter': 200,
+            'learning_rate': 0.1,
+            'max_leaf_nodes': 31,
+            'min_samples_leaf': 20,
+            'l2_regularization': 0.0,
+        },
+        'espacio_busqueda': {
+            'learning_rate': [0.03, 0.05, 0.1, 0.2],
+            'max_leaf_nodes': [7, 15, 31, 63],
+            'min_samples_leaf': [5, 10, 20, 40],
+            'l2_regularization': [0.0, 0.1, 1.0],
+        },
+    },
+}
+
+
+def validar_backend(backend):
+    """
+    Devuelve el backend si existe; si no, lanza ValueError
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend desconocido: {backend}")
+    return backend
+
+
+def es_bosque(backend):
+    return BACKENDS[backend]['bosque']
+
+
+def crear_estimador(backend, hiperparametros, random_state=42, n_jobs=1, oob_score=False):
+    """
+    Crea el estimador de sklearn del backend sin entrenar
+
+    Args:
+        backend: Nombre del backend (ver BACKENDS)
+        hiperparametros: Parámetros del estimador
+        n_jobs: Núcleos del ajuste (solo bosques; gradient boosting usa OpenMP)
+        oob_score: Calcular predicciones out-of-bag (solo random_forest)
+    """
+    especificacion = BACKENDS[backend]
+    parametros = dict(hiperparametros, random_state=random_state)
+    if especificacion['bosque']:
+        parametros['n_jobs'] = n_jobs
+    if oob_score:
+        parametros['oob_score'] = True
+    return especificacion['estimador'](**parametros)
+
+
+def entrenar_estimador(backend, hiperparametros, X, y, random_state=42, n_jobs=1,
+                       oob_score=False, percentiles=(5, 95)):
+    """
+    Entrena el modelo que se guarda y se sirve
+
+    Returns:
+        El estimador de sklearn entrenado para los bosques, o un
+        GradienteCuantiles (media e intervalo) para gradient boosting
+    """
+    if not es_bosque(backend):
+        return GradienteCuantiles.entrenar(
+            hiperparametros, X, y, percentiles=percentiles, random_state=random_state
+        )
+
+    modelo = crear_estimador(backend, hiperparametros, random_state, n_jobs, oob_score)
+    modelo.fit(X, y)
+    return modelo
@@ -0,0 +1,150 @@
+"""
+Módulo con una representación compilada del Random Forest para servir predicciones
+"""
+import numpy as np
+
+from .artefactos import cargar_arreglos, guardar_arreglos
+
+
+class BosqueCompilado:
+    """
+    Representación plana de un RandomForestRegressor entrenado
+
+    Todos los nodos de todos los árboles se guardan en tablas contiguas de
+    NumPy (feature, umbral, izquierdo, derecho y valor) con índices globales.
+    Los nodos se renumeran por niveles para que el hijo derecho quede siempre
+    junto al izquierdo (derecho = izquierdo + 1). Las hojas apuntan a sí
+    mismas con umbral infinito, así que el recorrido no necesita ramas.
+    """
+
+    CAMPOS = ('feature', 'umbral', 'izquierdo', 'derecho', 'valor', 'raices')
+
+    def __init__(self, feature, umbral, izquierdo, derecho, valor, raices, profundidad):
+        self.feature = feature
+        self.umbral = umbral
+        self.izquierdo = izquierdo
+        self.derecho = derecho
+        self.valor = valor
+        self.raices = raices
+        self.profundidad = int(profundidad)
+
+    @property
+    def n_arboles(self):
+        return len(self.raices)
+
+    @classmethod
+    def desde_modelo(cls, modelo):
+        """
+        Convierte un bosque de sklearn en tablas de nodos empaquetadas
+        """
+        features, umbrales, izquierdos, valores, raices = [], [], [], [], []
+        desplazamiento = 0
+        profundidad = 0
+
+        for arbol in modelo.estimators_:
+            tree = arbol.tree_
+            hijos_izq = tree.children_left
+            hijos_der = tree.children_right
+
+            # Orden por niveles: los dos hijos de cada nodo quedan contiguos
+            orden = [0]
+            for nodo in orden:
+                if hijos_izq[nodo] != -1:
+                    orden.extend((hijos_izq[nodo], hijos_der[nodo]))
+            orden = np.array(orden)
+
+            nueva_posicion = np.empty(tree.node_count, dtype=np.int64)
+            nueva_posicion[orden] = np.arange(tree.node_count) + desplazamiento
+
+            es_hoja = hijos_izq[orden] == -1
+            features.append(np.where(es_hoja, 0, tree.feature[orden]))
+            umbrales.append(np.where(es_hoja, np.inf, tree.threshold[orden]))
+            izquierdos.append(np.where(
+                es_hoja,
+                nueva_posicion[orden],
+                nueva_posicion[np.where(es_hoja, 0, hijos_izq[orden])]
+            ))
+            valores.append(tree.value[orden, 0, 0])
+            raices.append(desplazamiento)
+
+            desplazamiento += tree.node_count
+            profundidad = max(profundidad, tree.max_depth)
+
+        izquierdo = np.concatenate(izquierdos).astype(np.int32)
+        es_hoja = izquierdo == np.arange(desplazamiento)
+
+        return cls(
+            feature=np.concatenate(features).astype(np.int32),
+            umbral=np.concatenate(umbrales).astype(np.float64),
+            izquierdo=izquierdo,
+            derecho=np.where(es_hoja, izquierdo, izquierdo + 1).astype(np.int32),
+            valor=np.concatenate(valores).astype(np.float64),
+            raices=np.array(raices, dtype=np.int32),
+            profundidad=profundidad
+        )
+
+    def guardar(self, directorio):
+        """
+        Guarda cada tabla como un archivo .npy dentro del directorio
+        """
+        arreglos = {campo: getattr(self, campo) for campo in self.CAMPOS}
+        arreglos['profundidad'] = np.array(self.profundidad)
+        guardar_arreglos(directorio, arreglos)
+
+    @classmethod
+    def cargar(cls, directorio, mmap=True):
+        """
+        Carga las tablas desde disco
+
+        Args:
+            directorio: Directorio con las tablas .npy
+            mmap: Si True, las tablas se mapean en memoria (solo lectura) y se
+                comparten entre procesos en lugar de copiarse en cada uno
+        """
+        datos = cargar_arreglos(directorio, cls.CAMPOS + ('profundidad',), mmap=mmap)
+        # np.memmap guarda los escalares como arreglos de un elemento
+        datos['profundidad'] = datos['profundidad'].item()
+        return cls(**datos)
+
+    def aplicar(self, X):
+        """
+        Obtiene la hoja de cada árbol para cada fila
+
+        Recorre todos los árboles para todas las filas a la vez: cada
+        iteración baja un nivel en todos los pares (árbol, fila), por lo que
+        el número de iteraciones es la profundidad máxima del bosque.
+
+        Args:
+            X: Matriz de features ya escalada (n_filas × n_features)
+
+        Returns:
+            np.ndarray de forma (n_arboles × n_filas) con índices globales de hoja
+        """
+        # sklearn compara las features en float32 contra umbrales en float64
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_filas, n_features = X.shape
+        X_plano = X.ravel()
+
+        nodos = np.repeat(self.raices, n_filas)
+        base_filas = np.tile(np.arange(n_filas) * n_features, self.n_arboles)
+
+        for _ in range(self.profundidad):
+            valores_x = X_plano[base_filas + self.feature[nodos]]
+            nodos = self.izquierdo[nodos] + (valores_x > self.umbral[nodos])
+
+        return nodos.reshape(self.n_arboles, n_filas)
+
+    def predicciones_arboles(self, X):
+        """
+        Obtiene la predicción de cada árbol para cada fila
+
+        Returns:
+            np.ndarray de forma (n_arboles × n_filas)
+        """
+        return self.valor[self.aplicar(X)]
+
+    def predict(self, X):
+        """
+        Predicción puntual: promedio de todos los árboles
+        """
+        return self.predicciones_arboles(X).mean(axis=0)
@@ -0,0 +1,258 @@
+"""
+Módulo para buscar los hiperparámetros del modelo con successive halving
+"""
+import math
+import multiprocessing
+import os
+import time
+
+import numpy as np
+from django.conf import settings
+from sklearn.metrics import r2_score
+from sklearn.model_selection import ParameterSampler, train_test_split
+
+from .backends import BACKENDS, crear_estimador, es_bosque
+from .bosque_compilado import BosqueCompilado
+
+
+# Recursos que crecen ronda a ronda: 'arboles' (n_estimators o max_iter) o 'datos' (filas)
+RECURSOS = ('arboles', 'datos')
+
+# Mínimo del recurso en la primera ronda
+_RECURSO_MINIMO = {'arboles': 10, 'datos': 200}
+
+# Datos de ajuste y validación de cada proceso de la búsqueda
+_datos = None
+
+
+def medir_latencia(bosque, X, filas, repeticiones=3):
+    """
+    Milisegundos que tarda el bosque compilado en predecir un lote
+
+    Args:
+        bosque: BosqueCompilado o cualquier modelo con predict()
+        X: Filas ya escaladas (se repiten si hay menos de las pedidas)
+        filas: Filas del lote
+        repeticiones: Se toma el mejor de varios intentos
+
+    Returns:
+        float con la latencia del lote en milisegundos
+    """
+    lote = np.resize(np.asarray(X), (filas, X.shape[1]))
+    mejor = float('inf')
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        bosque.predict(lote)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor * 1000
+
+
+def _inicializar_proceso(X_ajuste, y_ajuste, X_validacion, y_validacion):
+    """
+    Recibe los datos una sola vez por proceso en lugar de en cada candidato
+    """
+    global _datos
+    _datos = (X_ajuste, y_ajuste, X_validacion, y_validacion)
+
+
+def _evaluar_candidato(parametros, recurso, cantidad, backend, base, random_state, filas_latencia):
+    """
+    Entrena y mide un candidato con el recurso de la ronda (en un proceso de la búsqueda)
+
+    Returns:
+        dict con los parámetros, el R² de validación y las latencias de ajuste y predicción
+    """
+    X_ajuste, y_ajuste, X_validacion, y_validacion = _datos
+
+    hiperparametros = {**base, **parametros}
+    if recurso == 'arboles':
+        hiperparametros[BACKENDS[backend]['parametro_arboles']] = cantidad
+    else:
+        # Las filas ya vienen mezcladas por train_test_split
+        X_ajuste, y_ajuste = X_ajuste[:cantidad], y_ajuste[:cantidad]
+
+    modelo = crear_estimador(backend, hiperparametros, random_state=random_state)
+    inicio = time.perf_counter()
+    modelo.fit(X_ajuste, y_ajuste)
+    ajuste = time.perf_counter() - inicio
+
+    # La latencia se mide con el formato con el que se sirven las predicciones
+    if es_bosque(backend):
+        modelo = BosqueCompilado.desde_modelo(modelo)
+
+    return {
+        'parametros': parametros,
+        'cantidad': cantidad,
+        'r2_validacion': float(r2_score(y_validacion, modelo.predict(X_validacion))),
+        'ajuste_seg': ajuste,
+        'latencia_ms': medir_latencia(modelo, X_validacion, filas_latencia),
+        'profundidad': getattr(modelo, 'profundidad', None)
+    }
+
+
+def ordenar_candidatos(resultados, tolerancia_r2):
+    """
+    Ordena los candidatos por precisión y latencia
+
+    Los candidatos cuyo R² de validación queda a menos de tolerancia_r2 del
+    mejor se consideran equivalentes en precisión y se ordenan por latencia
+    de predicción; el resto va después, ordenado por R².
+    """
+    mejor_r2 = max(resultado['r2_validacion'] for resultado in resultados)
+
+    def clave(resultado):
+        if resultado['r2_validacion'] >= mejor_r2 - tolerancia_r2:
+            return (0, resultado['latencia_ms'])
+        return (1, -resultado['r2_validacion'])
+
+    return sorted(resultados, key=clave)
+
+
+def buscar_hiperparametros(X, y, backend, base, random_state=42, presupuesto_seg=None,
+                           procesos=None, recurso=None):
+    """
+    Busca hiperparámetros con successive halving en un pool de procesos
+
+    Cada ronda entrena a los candidatos que siguen en carrera con más recurso
+    (árboles o filas) y conserva solo 1/ML_BUSQUEDA_FACTOR de ellos. La
+    última ronda usa el recurso completo. Cuando se agota el presupuesto se
+    cortan los ajustes en curso y se elige entre lo ya evaluado.
+
+    Args:
+        X: Features de entrenamiento ya escaladas (se separa una parte para validar)
+        y: Valores objetivo
+        backend: Algoritmo del modelo (ver backends.BACKENDS)
+        base: Hiperparámetros por defecto (la cantidad de árboles es el máximo del recurso)
+        presupuesto_seg: Tiempo máximo de la búsqueda (por defecto ML_BUSQUEDA_PRESUPUESTO_SEG)
+        procesos: Procesos del pool (por defecto ML_BUSQUEDA_PROCESOS)
+        recurso: 'arboles' o 'datos' (por defecto ML_BUSQUEDA_RECURSO)
+
+    Returns:
+        dict con los hiperparámetros elegidos y el resumen de la búsqueda, o
+        None si el presupuesto no alcanzó para evaluar ningún candidato
+    """
+    presupuesto_seg = presupuesto_seg or settings.ML_BUSQUEDA_PRESUPUESTO_SEG
+    recurso = recurso or settings.ML_BUSQUEDA_RECURSO
+    if recurso not in RECURSOS:
+        raise ValueError(f"Recurso de búsqueda desconocido: {recurso}")
+    procesos = procesos or settings.ML_BUSQUEDA_PROCESOS
+    if procesos < 1:
+        procesos = os.cpu_count() or 1
+    factor = settings.ML_BUSQUEDA_FACTOR
+    tolerancia_r2 = settings.ML_BUSQUEDA_TOLERANCIA_R2
+
+    inicio = time.perf_counter()
+    limite = inicio + presupuesto_seg
+
+    X_ajuste, X_validacion, y_ajuste, y_validacion = train_test_split(
+        np.asarray(X), np.asarray(y), test_size=0.2, random_state=random_state
+    )
+
+    # La configuración por defecto siempre compite
+    espacio = BACKENDS[backend]['espacio_busqueda']
+    candidatos = [{clave: base[clave] for clave in espacio}]
+    for parametros in ParameterSampler(
+        espacio, settings.ML_BUSQUEDA_CANDIDATOS, random_state=random_state
+    ):
+        if parametros not in candidatos:
+            candidatos.append(parametros)
+
+    # Recurso de cada ronda: crece por el factor hasta el máximo en la última
+    if recurso == 'arboles':
+        maximo = base[BACKENDS[backend]['parametro_arboles']]
+    else:
+        maximo = len(X_ajuste)
+    minimo = min(maximo, _RECURSO_MINIMO[recurso])
+    n_rondas = max(1, min(
+        math.ceil(math.log(len(candidatos), factor)),
+        1 + math.floor(math.log(maximo / minimo, factor))
+    ))
+    cantidades = [
+        min(maximo, max(minimo, round(maximo / factor ** (n_rondas - 1 - ronda))))
+        for ronda in range(n_rondas)
+    ]
+
+    print(f"🔍 Búsqueda de hiperparámetros ({backend}): {len(candidatos)} candidatos, "
+          f"{n_rondas} rondas de {recurso} {cantidades}, {procesos} procesos, "
+          f"presupuesto {presupuesto_seg}s")
+
+    rondas = []
+    ordenados = None
+    agotado = False
+    costo_anterior = None
+
+    # multiprocessing.Pool en lugar de ProcessPoolExecutor: terminate() corta
+    # los ajustes en curso cuando se agota el presupuesto
+    pool = multiprocessing.get_context('spawn').Pool(
+        processes=procesos,
+        initializer=_inicializar_proceso,
+        initargs=(X_ajuste, y_ajuste, X_validacion, y_validacion)
+    )
+    try:
+        for ronda, cantidad in enumerate(cantidades):
+            # Se estima la ronda con el costo de la anterior escalado por el recurso
+            if costo_anterior is not None:
+                proyectado = (costo_anterior * (cantidad / cantidades[ronda - 1])
+                              * len(candidatos) / rondas[-1]['completados'] / procesos)
+                if time.perf_counter() + proyectado > limite:
+                    agotado = True
+                    break
+
+            inicio_ronda = time.perf_counter()
+            tareas = [
+                pool.apply_async(_evaluar_candidato, (
+                    parametros, recurso, cantidad, backend, base, random_state,
+                    settings.ML_LATENCIA_LOTE_FILAS
+                ))
+                for parametros in candidatos
+            ]
+            for tarea in tareas:
+                tarea.wait(max(0.0, limite - time.perf_counter()))
+            resultados = [tarea.get() for tarea in tareas if tarea.ready()]
+
+            rondas.append({
+                'cantidad': cantidad,
+                'candidatos': len(candidatos),
+                'completados': len(resultados),
+                'duracion_seg': round(time.perf_counter() - inicio_ronda, 3)
+            })
+            if resultados:
+                ordenados = ordenar_candidatos(resultados, tolerancia_r2)
+                print(f"   Ronda {ronda + 1}: {len(resultados)}/{len(candidatos)} candidatos "
+                      f"con {cantidad} {recurso}, mejor R² {max(r['r2_validacion'] for r in resultados):.4f}")
+
+            if len(resultados) < len(tareas):
+                agotado = True
+                break
+
+            costo_anterior = sum(r['ajuste_seg'] + r['latencia_ms'] / 1000 for r in resultados)
+            candidatos = [r['parametros'] for r in ordenados[:max(1, len(ordenados) // factor)]]
+    finally:
+        pool.terminate()
+        pool.join()
+
+    duracion = time.perf_counter() - inicio
+    if ordenados is None:
+        print(f"⚠️ El presupuesto de {presupuesto_seg}s no alcanzó para evaluar candidatos")
+        return None
+
+    mejor = ordenados[0]
+    print(f"✅ Hiperparámetros elegidos en {duracion:.1f}s: {mejor['parametros']} "
+          f"(R² validación {mejor['r2_validacion']:.4f}, {mejor['latencia_ms']:.2f} ms por lote)")
+
+    return {
+        'hiperparametros': {**base, **mejor['parametros']},
+        'recurso': recurso,
+        'presupuesto_seg': presupuesto_seg,
+        'duracion_seg': round(duracion, 3),
+        'agotado': agotado,
+        'procesos': procesos,
+        'rondas': rondas,
+        'mejor': {
+            'cantidad': mejor['cantidad'],
+            'r2_validacion': round(mejor['r2_validacion'], 4),
+            'ajuste_seg': round(mejor['ajuste_seg'], 3),
+            'latencia_ms': round(mejor['latencia_ms'], 3),
+            'profundidad': mejor['profundidad']
+        }
+    }
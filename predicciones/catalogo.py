@@ -0,0 +1,159 @@
+"""
+Módulo con una copia en memoria del catálogo de productos para inferencia
+"""
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Count, Max
+
+from .models import Categoria, Marca, Producto
+
+
+class SnapshotCatalogo:
+    """
+    Copia inmutable del catálogo de productos en arreglos de NumPy, ordenada por ID
+    """
+
+    def __init__(self, filas=()):
+        columnas = list(zip(*filas)) if filas else [()] * 8
+
+        self.ids = np.array(columnas[0], dtype=np.int64)
+        self.precios = np.array([float(precio) for precio in columnas[1]], dtype=np.float64)
+        self.stocks = np.array(columnas[2], dtype=np.int64)
+        self.categoria_ids = np.array([c or 0 for c in columnas[3]], dtype=np.int64)
+        self.marca_ids = np.array([m or 0 for m in columnas[4]], dtype=np.int64)
+        self.nombres = list(columnas[5])
+        self.categoria_nombres = list(columnas[6])
+        self.marca_nombres = list(columnas[7])
+
+    def __len__(self):
+        return len(self.ids)
+
+    def posiciones(self, productos_ids):
+        """
+        Obtiene la posición de cada producto en los arreglos (-1 si no existe)
+        """
+        productos_ids = np.asarray(productos_ids, dtype=np.int64)
+        if len(self.ids) == 0:
+            return np.full(productos_ids.shape, -1, dtype=np.int64)
+
+        posiciones = np.minimum(np.searchsorted(self.ids, productos_ids), len(self.ids) - 1)
+        return np.where(self.ids[posiciones] == productos_ids, posiciones, -1)
+
+    def filtrar(self, productos_ids=None, categoria_id=None, marca_id=None, con_stock=False):
+        """
+        Obtiene los IDs de productos que cumplen los filtros, ordenados por ID
+        """
+        mascara = np.ones(len(self.ids), dtype=bool)
+        if productos_ids is not None:
+            mascara &= np.isin(self.ids, np.asarray(list(productos_ids), dtype=np.int64))
+        if categoria_id is not None:
+            mascara &= self.categoria_ids == categoria_id
+        if marca_id is not None:
+            mascara &= self.marca_ids == marca_id
+        if con_stock:
+            mascara &= self.stocks > 0
+        return self.ids[mascara]
+
+    def info_producto(self, posicion):
+        """
+        Datos del producto en el formato de las respuestas de predicción
+        """
+        return {
+            'id': int(self.ids[posicion]),
+            'nombre': self.nombres[posicion],
+            'precio': float(self.precios[posicion]),
+            'categoria': self.categoria_nombres[posicion],
+            'marca': self.marca_nombres[posicion]
+        }
+
+
+class CatalogoProductos:
+    """
+    Mantiene el snapshot del catálogo del proceso
+
+    El catálogo se carga con una sola consulta y solo se recarga cuando cambia
+    su firma (cantidad de productos y último updated_at de productos,
+    categorías y marcas). La firma se revisa como máximo una vez cada
+    ML_CATALOGO_REVISION_SEG segundos. Cada recarga crea un snapshot nuevo,
+    así que quien ya tiene uno nunca ve datos a medio actualizar.
+    """
+
+    def __init__(self):
+        self.snapshot = None
+        self._firma = None
+        self._ultima_revision = 0.0
+        self._lock = threading.Lock()
+
+    def _calcular_firma(self):
+        productos = Producto.objects.aggregate(total=Count('id'), ultimo=Max('updated_at'))
+        return (
+            productos['total'],
+            productos['ultimo'],
+            Categoria.objects.aggregate(ultimo=Max('updated_at'))['ultimo'],
+            Marca.objects.aggregate(ultimo=Max('updated_at'))['ultimo'],
+        )
+
+    def _cargar(self, firma):
+        filas = list(Producto.objects.order_by('id').values_list(
+            'id', 'precio', 'stock', 'categoria_id', 'marca_id',
+            'nombre', 'categoria__nombre', 'marca__nombre'
+        ))
+        self.snapshot = SnapshotCatalogo(filas)
+        self._firma = firma
+
+    def actual(self, forzar=False):
+        """
+        Obtiene el snapshot vigente, recargándolo si el catálogo cambió
+
+        Args:
+            forzar: Si True, revisa la firma aunque no haya pasado el intervalo
+        """
+        ahora = time.monotonic()
+        if (
+            self.snapshot is not None
+            and not forzar
+            and ahora - self._ultima_revision < settings.ML_CATALOGO_REVISION_SEG
+        ):
+            return self.snapshot
+
+        with self._lock:
+            firma = self._calcular_firma()
+            if self.snapshot is None or firma != self._firma:
+                self._cargar(firma)
+            self._ultima_revision = ahora
+
+        return self.snapshot
+
+    def buscar(self, productos_ids):
+        """
+        Obtiene el snapshot y las posiciones de los productos pedidos
+
+        Si algún producto no está en el snapshot pero sí en la base de datos
+        (creado después de la última carga), fuerza una recarga.
+
+        Returns:
+            tuple (snapshot, posiciones) con -1 para productos inexistentes
+        """
+        snapshot = self.actual()
+        posiciones = snapshot.posiciones(productos_ids)
+
+        faltantes = [int(p) for p, pos in zip(productos_ids, posiciones) if pos < 0]
+        if faltantes and Producto.objects.filter(id__in=faltantes).exists():
+            snapshot = self.actual(forzar=True)
+            posiciones = snapshot.posiciones(productos_ids)
+
+        return snapshot, posiciones
+
+
+# Instancia global del proceso
+_catalogo_instance = CatalogoProductos()
+
+
+def obtener_catalogo():
+    """
+    Obtiene el catálogo de productos del proceso
+    """
+    return _catalogo_instance
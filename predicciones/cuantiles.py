@@ -0,0 +1,184 @@
+"""
+Módulo para estimar cuantiles de ventas con estadísticas precalculadas por hoja
+(Quantile Regression Forest)
+"""
+import os
+
+import numpy as np
+
+from .artefactos import cargar_arreglos, guardar_arreglos
+
+
+class EstadisticasHojas:
+    """
+    Distribución de los valores de entrenamiento que cayeron en cada hoja
+
+    Los valores objetivo se discretizan en una grilla común de valores y de
+    cada hoja del BosqueCompilado se guarda solo la masa de probabilidad de
+    las posiciones de la grilla que ocupan sus valores, en formato disperso:
+    las entradas de la hoja h son posicion[inicio[h]:inicio[h + 1]] y
+    masa[inicio[h]:inicio[h + 1]]. Una hoja con pocas filas ocupa pocas
+    entradas en lugar de una fila completa de la grilla.
+
+    La CDF condicional del Quantile Regression Forest es el promedio de las
+    distribuciones de las hojas alcanzadas en cada árbol, así que cualquier
+    cuantil se obtiene con una búsqueda de hojas y una suma por árbol.
+    """
+
+    CAMPOS = ('indice_hoja', 'inicio', 'posicion', 'masa', 'grilla')
+
+    def __init__(self, indice_hoja, inicio, posicion, masa, grilla):
+        # Hoja de cada nodo global (-1 en nodos internos)
+        self.indice_hoja = indice_hoja
+        self.inicio = inicio
+        self.posicion = posicion
+        self.masa = masa
+        self.grilla = grilla
+
+    @classmethod
+    def desde_entrenamiento(cls, bosque_compilado, X_scaled, y, max_valores=64):
+        """
+        Calcula la distribución de cada hoja con los datos de entrenamiento
+
+        Args:
+            bosque_compilado: BosqueCompilado del modelo entrenado
+            X_scaled: Features de entrenamiento ya escaladas
+            y: Valores objetivo de entrenamiento
+            max_valores: Tamaño máximo de la grilla de valores
+        """
+        y = np.asarray(y, dtype=np.float64)
+
+        # Grilla exacta si hay pocos valores distintos, si no por cuantiles
+        grilla = np.unique(y)
+        if len(grilla) > max_valores:
+            grilla = np.unique(np.quantile(y, np.linspace(0, 1, max_valores)))
+
+        n_nodos = len(bosque_compilado.izquierdo)
+        es_hoja = bosque_compilado.izquierdo == np.arange(n_nodos)
+        n_hojas = int(es_hoja.sum())
+        indice_hoja = np.full(n_nodos, -1, dtype=np.int32)
+        indice_hoja[es_hoja] = np.arange(n_hojas)
+
+        # Posición en la grilla del primer valor >= y
+        posiciones = np.minimum(np.searchsorted(grilla, y, side='left'), len(grilla) - 1)
+
+        # Pares (hoja, posición) presentes, ordenados por hoja y posición
+        hojas = indice_hoja[bosque_compilado.aplicar(X_scaled)].astype(np.int64)
+        claves, conteos = np.unique(
+            (hojas * len(grilla) + posiciones[np.newaxis, :]).ravel(), return_counts=True
+        )
+        hoja_entrada = claves // len(grilla)
+        totales = np.bincount(hoja_entrada, weights=conteos, minlength=n_hojas)
+
+        return cls(
+            indice_hoja=indice_hoja,
+            inicio=np.searchsorted(hoja_entrada, np.arange(n_hojas + 1)).astype(np.int64),
+            posicion=(claves % len(grilla)).astype(np.uint16),
+            masa=conteos / totales[hoja_entrada],
+            grilla=grilla
+        )
+
+    def guardar(self, directorio):
+        """
+        Guarda cada arreglo como un archivo .npy dentro del directorio
+        """
+        guardar_arreglos(directorio, {campo: getattr(self, campo) for campo in self.CAMPOS})
+
+    @classmethod
+    def cargar(cls, directorio, mmap=True):
+        """
+        Carga las estadísticas desde disco (mapeadas en memoria si mmap es True)
+
+        Las versiones guardadas con la CDF densa por hoja (cdf.npy) se
+        convierten al formato disperso al cargar.
+        """
+        if os.path.exists(os.path.join(directorio, 'cdf.npy')):
+            datos = cargar_arreglos(directorio, ('indice_hoja', 'cdf', 'grilla'), mmap=False)
+            masas = np.diff(datos['cdf'].astype(np.float64), axis=1, prepend=0)
+            hoja_entrada, posicion = np.nonzero(masas)
+            return cls(
+                indice_hoja=datos['indice_hoja'],
+                inicio=np.searchsorted(hoja_entrada, np.arange(len(masas) + 1)).astype(np.int64),
+                posicion=posicion.astype(np.uint16),
+                masa=masas[hoja_entrada, posicion],
+                grilla=datos['grilla']
+            )
+        return cls(**cargar_arreglos(directorio, cls.CAMPOS, mmap=mmap))
+
+    def _masas_condicionales(self, hojas):
+        """
+        Promedia las distribuciones de las hojas alcanzadas por cada fila
+
+        Args:
+            hojas: Índices globales de hoja (n_arboles × n_filas)
+
+        Returns:
+            np.ndarray de forma (n_filas × tamaño de la grilla) con la masa de
+            probabilidad de cada posición de la grilla
+        """
+        n_filas = hojas.shape[1]
+        n_grilla = len(self.grilla)
+        base_filas = np.arange(n_filas) * n_grilla
+        masas = np.zeros(n_filas * n_grilla, dtype=np.float64)
+
+        for filas_arbol in self.indice_hoja[hojas]:
+            inicios = self.inicio[filas_arbol]
+            largos = self.inicio[filas_arbol + 1] - inicios
+            # Índices de las entradas de cada hoja, uno detrás de otro
+            entradas = np.arange(largos.sum()) + np.repeat(inicios - (np.cumsum(largos) - largos), largos)
+            masas += np.bincount(
+                np.repeat(base_filas, largos) + self.posicion[entradas],
+                weights=self.masa[entradas],
+                minlength=n_filas * n_grilla
+            )
+
+        return masas.reshape(n_filas, n_grilla) / hojas.shape[0]
+
+    def cdf_condicional(self, hojas):
+        """
+        Promedia las CDF de las hojas alcanzadas por cada fila
+
+        Args:
+            hojas: Índices globales de hoja (n_arboles × n_filas)
+
+        Returns:
+            np.ndarray de forma (n_filas × tamaño de la grilla)
+        """
+        return np.cumsum(self._masas_condicionales(hojas), axis=1)
+
+    def cuantiles(self, hojas, qs):
+        """
+        Calcula cuantiles arbitrarios para cada fila
+
+        Args:
+            hojas: Índices globales de hoja (n_arboles × n_filas)
+            qs: Cuantiles entre 0 y 1
+
+        Returns:
+            np.ndarray de forma (len(qs) × n_filas)
+        """
+        cdf = self.cdf_condicional(hojas)
+        return self._invertir(cdf, qs)
+
+    def resumen(self, hojas, qs):
+        """
+        Calcula cuantiles y desviación estándar de la distribución condicional
+
+        Returns:
+            tuple (cuantiles de forma len(qs) × n_filas, std por fila)
+        """
+        probabilidades = self._masas_condicionales(hojas)
+        cdf = np.cumsum(probabilidades, axis=1)
+
+        media = probabilidades @ self.grilla
+        varianza = probabilidades @ self.grilla ** 2 - media ** 2
+
+        return self._invertir(cdf, qs), np.sqrt(np.maximum(varianza, 0))
+
+    def _invertir(self, cdf, qs):
+        """
+        Primer valor de la grilla cuya probabilidad acumulada alcanza q
+        """
+        qs = np.asarray(qs, dtype=np.float64)
+        posiciones = (cdf[np.newaxis, :, :] < qs[:, np.newaxis, np.newaxis] - 1e-9).sum(axis=2)
+        return self.grilla[np.minimum(posiciones, len(self.grilla) - 1)]
@@ -0,0 +1,213 @@
+"""
+Módulo con el almacén local de features de ventas para entrenamiento incremental
+"""
+import json
+import os
+import shutil
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db.models import Max, Q
+
+from .artefactos import cargar_arreglos, guardar_arreglos
+from .catalogo import obtener_catalogo
+from .models import Detalle_Venta, NotaVenta
+
+
+class AlmacenFeatures:
+    """
+    Agregados mensuales de ventas por producto guardados en disco
+
+    Los agregados (cantidad, subtotal, trimestre y día de la semana más
+    frecuente de cada grupo producto, mes, anio) se guardan en
+    ML_MODELS_DIR/features_ventas/, en una partición por año. Cada
+    actualización solo lee las ventas cuyo nota_venta.updated_at o
+    detalle.updated_at supera la marca de agua de la extracción anterior y
+    vuelve a agregar completos los grupos que tocan. El resto de las
+    particiones no se vuelve a leer de la base de datos.
+
+    Los atributos del producto (precio, categoría, marca) no se guardan: se
+    toman del catálogo al leer, igual que en una extracción completa.
+
+    Los detalles eliminados físicamente no cambian ningún updated_at; para
+    reflejarlos hay que reconstruir el almacén (reconstruir=True).
+    """
+
+    COLUMNAS = ('producto_id', 'mes', 'anio', 'cantidad_vendida', 'subtotal_venta',
+                'trimestre', 'dia_semana')
+
+    def __init__(self, predictor, directorio=None):
+        self.predictor = predictor
+        self.directorio = directorio or os.path.join(settings.ML_MODELS_DIR, 'features_ventas')
+        self.estado_path = os.path.join(self.directorio, 'estado.json')
+
+    def _leer_estado(self):
+        try:
+            with open(self.estado_path) as archivo:
+                return json.load(archivo)
+        except FileNotFoundError:
+            return None
+
+    def _guardar_estado(self, estado):
+        temporal = f'{self.estado_path}.tmp'
+        with open(temporal, 'w') as archivo:
+            json.dump(estado, archivo)
+        os.replace(temporal, self.estado_path)
+
+    def _calcular_marca_agua(self):
+        """
+        Último updated_at de notas de venta y detalles
+        """
+        return max(
+            (
+                fecha for fecha in (
+                    NotaVenta.objects.aggregate(ultimo=Max('updated_at'))['ultimo'],
+                    Detalle_Venta.objects.aggregate(ultimo=Max('updated_at'))['ultimo'],
+                )
+                if fecha is not None
+            ),
+            default=None
+        )
+
+    def _leer_particion(self, anio):
+        ruta = os.path.join(self.directorio, str(anio))
+        if not os.path.isdir(ruta):
+            return pd.DataFrame(columns=self.COLUMNAS)
+        return pd.DataFrame(cargar_arreglos(ruta, self.COLUMNAS, mmap=False))
+
+    def _guardar_particion(self, anio, df):
+        ruta = os.path.join(self.directorio, str(anio))
+        if df.empty:
+            shutil.rmtree(ruta, ignore_errors=True)
+            return
+        guardar_arreglos(ruta, {
+            columna: df[columna].to_numpy(dtype=np.float64 if columna == 'subtotal_venta' else np.int64)
+            for columna in self.COLUMNAS
+        })
+
+    def _agregar(self, **filtros):
+        """
+        Agrega las ventas pagadas y se queda con las columnas que se guardan
+        """
+        return self.predictor.extraer_agregados(**filtros)[list(self.COLUMNAS)]
+
+    def _grupos_tocados(self, desde):
+        """
+        Grupos (producto_id, mes, anio) con ventas creadas o modificadas desde una fecha
+        """
+        filas = Detalle_Venta.objects.filter(
+            Q(nota_venta__updated_at__gt=desde) | Q(updated_at__gt=desde)
+        ).values_list('producto_id', 'nota_venta__created_at')
+
+        df = pd.DataFrame(list(filas), columns=['producto_id', 'fecha'])
+        if df.empty:
+            return pd.DataFrame(columns=['producto_id', 'mes', 'anio'])
+
+        fechas = pd.to_datetime(df['fecha'])
+        return pd.DataFrame({
+            'producto_id': df['producto_id'],
+            'mes': fechas.dt.month,
+            'anio': fechas.dt.year,
+        }).drop_duplicates()
+
+    def _reagregar(self, tocados):
+        """
+        Vuelve a agregar desde la base de datos los grupos tocados
+
+        Returns:
+            DataFrame con los agregados de los grupos que siguen teniendo ventas
+        """
+        # Rango de meses que cubre a todos los grupos tocados
+        indices = tocados['anio'].astype(int) * 12 + tocados['mes'].astype(int) - 1
+        primero, ultimo = int(indices.min()), int(indices.max()) + 1
+        inicio = datetime(primero // 12, primero % 12 + 1, 1, tzinfo=timezone.utc)
+        fin = datetime(ultimo // 12, ultimo % 12 + 1, 1, tzinfo=timezone.utc)
+        agregados = self._agregar(
+            producto_id__in=tocados['producto_id'].unique().tolist(),
+            nota_venta__created_at__gte=inicio,
+            nota_venta__created_at__lt=fin
+        )
+        return agregados.merge(tocados, on=['producto_id', 'mes', 'anio'])
+
+    def actualizar(self, reconstruir=False):
+        """
+        Incorpora al almacén las ventas nuevas o modificadas y devuelve las features
+
+        Args:
+            reconstruir: Si True, descarta el almacén y vuelve a extraer todo
+
+        Returns:
+            DataFrame con las mismas columnas que VentasPredictor.extraer_agregados
+        """
+        estado = None if reconstruir else self._leer_estado()
+
+        # La marca se calcula antes de leer: lo que cambie durante la
+        # extracción se vuelve a leer en la próxima actualización
+        marca_agua = self._calcular_marca_agua()
+
+        if estado is None or estado['marca_agua'] is None:
+            print("🔄 Construyendo almacén de features desde cero...")
+            shutil.rmtree(self.directorio, ignore_errors=True)
+            os.makedirs(self.directorio)
+            agregados = self._agregar()
+            for anio, particion in agregados.groupby('anio'):
+                self._guardar_particion(anio, particion)
+        else:
+            # Margen para filas confirmadas tarde con un updated_at anterior a la marca
+            desde = datetime.fromisoformat(estado['marca_agua']) - timedelta(
+                seconds=settings.ML_FEATURE_STORE_MARGEN_SEG
+            )
+            tocados = self._grupos_tocados(desde)
+            print(f"🔄 Actualizando almacén de features: {len(tocados)} grupos modificados")
+
+            if not tocados.empty:
+                nuevos = self._reagregar(tocados)
+                for anio, tocados_anio in tocados.groupby('anio'):
+                    particion = self._leer_particion(anio)
+                    claves = pd.MultiIndex.from_frame(particion[['producto_id', 'mes', 'anio']])
+                    reemplazados = claves.isin(pd.MultiIndex.from_frame(tocados_anio))
+                    self._guardar_particion(anio, pd.concat([
+                        particion[~reemplazados],
+                        nuevos[nuevos['anio'] == anio]
+                    ]))
+
+        self._guardar_estado({
+            'marca_agua': marca_agua.isoformat() if marca_agua is not None else None,
+            'actualizado': datetime.now().isoformat()
+        })
+
+        features = self.leer()
+        if features.empty:
+            raise ValueError("No hay datos de ventas disponibles para entrenar el modelo")
+        return features
+
+    def leer(self):
+        """
+        Lee todas las particiones y agrega los atributos actuales de cada producto
+
+        Returns:
+            DataFrame ordenado por producto_id, mes y anio
+        """
+        from .ml_model import COLUMNAS_FEATURES
+
+        anios = sorted(
+            int(nombre) for nombre in os.listdir(self.directorio) if nombre.isdigit()
+        ) if os.path.isdir(self.directorio) else []
+        particiones = [self._leer_particion(anio) for anio in anios]
+        if not particiones:
+            return pd.DataFrame(columns=COLUMNAS_FEATURES)
+
+        df = pd.concat(particiones, ignore_index=True)
+
+        snapshot = obtener_catalogo().actual(forzar=True)
+        posiciones = snapshot.posiciones(df['producto_id'].to_numpy())
+        df = df[posiciones >= 0].copy()
+        posiciones = posiciones[posiciones >= 0]
+
+        df['producto_precio'] = snapshot.precios[posiciones]
+        df['producto_categoria_id'] = snapshot.categoria_ids[posiciones]
+        df['producto_marca_id'] = snapshot.marca_ids[posiciones]
+
+        return df.sort_values(['producto_id', 'mes', 'anio'])[COLUMNAS_FEATURES].reset_index(drop=True)
@@ -0,0 +1,343 @@
+"""
+Módulo para entrenar el bosque repartido en fragmentos (procesos o máquinas)
+"""
+import json
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+import uuid
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+from django.conf import settings
+from sklearn.metrics import r2_score
+
+from .artefactos import cargar_arreglos, guardar_arreglos
+from .backends import crear_estimador
+
+
+def _ruta_plan(directorio):
+    return os.path.join(directorio, 'plan.json')
+
+
+def _ruta_fragmento(directorio, indice):
+    return os.path.join(directorio, f'fragmento_{indice}.pkl')
+
+
+def _ruta_reclamo(directorio, indice, intento):
+    return os.path.join(directorio, f'fragmento_{indice}.reclamado.{intento}')
+
+
+def _estado_fragmento(directorio, indice):
+    """
+    Estado de un fragmento: 'terminado', 'reclamado' o 'libre'
+
+    Cada reclamo es un archivo fragmento_<i>.reclamado.<intento> al que el
+    worker le actualiza la fecha de modificación mientras entrena. Si el
+    último reclamo lleva más de ML_FRAGMENTOS_RECLAMO_VENCIDO_SEG sin latido
+    (el worker murió), el fragmento vuelve a quedar libre con el intento
+    siguiente: dos workers que lo vean vencido compiten por el mismo archivo
+    y solo uno lo crea.
+
+    Returns:
+        tuple (estado, intento con el que se puede reclamar o None)
+    """
+    if os.path.exists(_ruta_fragmento(directorio, indice)):
+        return 'terminado', None
+
+    prefijo = f'fragmento_{indice}.reclamado.'
+    intentos = [
+        int(nombre[len(prefijo):]) for nombre in os.listdir(directorio)
+        if nombre.startswith(prefijo) and nombre[len(prefijo):].isdigit()
+    ]
+    if not intentos:
+        return 'libre', 0
+
+    ultimo = max(intentos)
+    try:
+        sin_latido = time.time() - os.path.getmtime(_ruta_reclamo(directorio, indice, ultimo))
+    except FileNotFoundError:
+        return 'reclamado', None
+    if sin_latido > settings.ML_FRAGMENTOS_RECLAMO_VENCIDO_SEG:
+        return 'libre', ultimo + 1
+    return 'reclamado', None
+
+
+def _latir(ruta, detener):
+    """
+    Actualiza la fecha del reclamo hasta que termina el entrenamiento del fragmento
+    """
+    while not detener.wait(settings.ML_FRAGMENTOS_LATIDO_SEG):
+        try:
+            os.utime(ruta)
+        except FileNotFoundError:
+            return
+
+
+def repartir_arboles(n_arboles, n_fragmentos, random_state=42):
+    """
+    Árboles y semilla de cada fragmento
+
+    Las semillas salen de una SeedSequence con random_state, así que el
+    bosque combinado es el mismo sin importar qué proceso o máquina
+    entrene cada fragmento ni en qué orden terminen.
+
+    Returns:
+        list de dicts con 'indice', 'arboles' y 'semilla'
+    """
+    base, resto = divmod(n_arboles, n_fragmentos)
+    semillas = np.random.SeedSequence(random_state).generate_state(n_fragmentos)
+    return [
+        {
+            'indice': indice,
+            'arboles': base + (1 if indice < resto else 0),
+            'semilla': int(semillas[indice])
+        }
+        for indice in range(n_fragmentos)
+        if base + (1 if indice < resto else 0) > 0
+    ]
+
+
+def entrenar_fragmento(directorio, indice):
+    """
+    Entrena un fragmento del plan y lo guarda en el directorio compartido
+
+    Returns:
+        Ruta del archivo del fragmento
+    """
+    with open(_ruta_plan(directorio)) as archivo:
+        plan = json.load(archivo)
+    fragmento = plan['fragmentos'][indice]
+
+    # Todos los fragmentos leen la misma instantánea de features
+    datos = cargar_arreglos(directorio, ('X', 'y'))
+    modelo = crear_estimador(
+        plan['backend'],
+        {**plan['hiperparametros'], 'n_estimators': fragmento['arboles']},
+        random_state=fragmento['semilla'],
+        n_jobs=plan['n_jobs'],
+        oob_score=plan['oob_score']
+    )
+    with warnings.catch_warnings():
+        # Con pocos árboles por fragmento algunas filas quedan sin predicción
+        # out-of-bag; el bosque combinado sí las cubre
+        warnings.filterwarnings('ignore', message='Some inputs do not have OOB scores')
+        modelo.fit(datos['X'], datos['y'])
+
+    ruta = _ruta_fragmento(directorio, indice)
+    temporal = f'{ruta}.tmp'
+    joblib.dump(modelo, temporal)
+    os.replace(temporal, ruta)
+    return ruta
+
+
+def procesar_pendientes(directorio):
+    """
+    Reclama y entrena los fragmentos del plan que nadie tomó todavía
+
+    El reclamo es la creación exclusiva de un archivo de reclamo (ver
+    _estado_fragmento), así que varios procesos o máquinas pueden recorrer el
+    mismo plan sin entrenar dos veces un fragmento, y los fragmentos de un
+    worker que murió se vuelven a entrenar.
+
+    Returns:
+        int con la cantidad de fragmentos entrenados por este proceso
+    """
+    entrenados = 0
+    try:
+        with open(_ruta_plan(directorio)) as archivo:
+            plan = json.load(archivo)
+    except FileNotFoundError:
+        # El coordinador ya combinó el bosque y borró el directorio
+        return entrenados
+
+    for fragmento in plan['fragmentos']:
+        try:
+            estado, intento = _estado_fragmento(directorio, fragmento['indice'])
+            if estado != 'libre':
+                continue
+            ruta = _ruta_reclamo(directorio, fragmento['indice'], intento)
+            descriptor = os.open(ruta, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            continue
+        except FileNotFoundError:
+            break
+        with os.fdopen(descriptor, 'w') as archivo:
+            archivo.write(f'{os.uname().nodename}:{os.getpid()}')
+
+        detener = threading.Event()
+        latido = threading.Thread(target=_latir, args=(ruta, detener), daemon=True)
+        latido.start()
+        try:
+            entrenar_fragmento(directorio, fragmento['indice'])
+        finally:
+            detener.set()
+            latido.join()
+        entrenados += 1
+    return entrenados
+
+
+def planes_pendientes(raiz=None):
+    """
+    Directorios de entrenamientos con fragmentos sin reclamar o con reclamos vencidos
+    """
+    raiz = raiz or settings.ML_FRAGMENTOS_DIR
+    if not os.path.isdir(raiz):
+        return []
+
+    pendientes = []
+    for nombre in sorted(os.listdir(raiz)):
+        directorio = os.path.join(raiz, nombre)
+        try:
+            with open(_ruta_plan(directorio)) as archivo:
+                plan = json.load(archivo)
+            if any(
+                _estado_fragmento(directorio, fragmento['indice'])[0] == 'libre'
+                for fragmento in plan['fragmentos']
+            ):
+                pendientes.append(directorio)
+        except (FileNotFoundError, NotADirectoryError, ValueError):
+            continue
+    return pendientes
+
+
+def contar_oob(modelo):
+    """
+    Cantidad de árboles del bosque que dejaron afuera de su muestra a cada fila
+    """
+    n_filas = len(modelo.oob_prediction_)
+    conteo = np.zeros(n_filas, dtype=np.int64)
+    for muestra in modelo.estimators_samples_:
+        conteo += np.bincount(muestra, minlength=n_filas) == 0
+    return conteo
+
+
+def combinar_bosques(modelos):
+    """
+    Une los árboles de varios bosques en un solo estimador de sklearn
+
+    La predicción out-of-bag de cada fila es el promedio de las predicciones
+    de los árboles que no la usaron, igual que en un bosque entrenado de una
+    vez: la de cada fragmento se pondera por cuántos de sus árboles dejaron
+    afuera a esa fila. Las filas que ningún árbol dejó afuera quedan en NaN.
+    """
+    combinado = modelos[0]
+
+    if hasattr(combinado, 'oob_prediction_'):
+        suma = np.zeros(len(combinado.oob_prediction_))
+        conteo_total = np.zeros(len(combinado.oob_prediction_), dtype=np.int64)
+        for modelo in modelos:
+            conteo = contar_oob(modelo)
+            # sklearn deja en 0 la predicción de las filas sin árboles out-of-bag
+            suma += modelo.oob_prediction_ * conteo
+            conteo_total += conteo
+        with np.errstate(invalid='ignore', divide='ignore'):
+            combinado.oob_prediction_ = suma / conteo_total
+
+    combinado.estimators_ = [arbol for modelo in modelos for arbol in modelo.estimators_]
+    combinado.n_estimators = len(combinado.estimators_)
+    return combinado
+
+
+def entrenar_fragmentado(backend, hiperparametros, X, y, n_fragmentos, random_state=42,
+                         n_jobs=1, oob_score=False, procesos=None):
+    """
+    Entrena un bosque repartido en fragmentos y lo combina en un solo estimador
+
+    Guarda la instantánea de features y el plan en un directorio dentro de
+    ML_FRAGMENTOS_DIR. Los procesos locales y los workers de otras máquinas
+    que comparten ese directorio (manage.py entrenar_fragmentos) reclaman
+    los fragmentos, los entrenan y dejan el resultado en el mismo directorio.
+
+    Args:
+        backend: Bosque de backends.BACKENDS
+        hiperparametros: Hiperparámetros del bosque completo
+        X: Features de entrenamiento ya escaladas
+        y: Valores objetivo
+        n_fragmentos: Fragmentos en los que se reparten los árboles
+        n_jobs: Núcleos de cada fragmento
+        procesos: Procesos locales (por defecto ML_FRAGMENTOS_PROCESOS; 0 =
+            solo workers remotos; -1 = uno por fragmento)
+
+    Returns:
+        El estimador combinado
+    """
+    if procesos is None:
+        procesos = settings.ML_FRAGMENTOS_PROCESOS
+    fragmentos = repartir_arboles(hiperparametros['n_estimators'], n_fragmentos, random_state)
+    if procesos < 0:
+        procesos = len(fragmentos)
+
+    directorio = os.path.join(
+        settings.ML_FRAGMENTOS_DIR, f"{time.strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:8]}"
+    )
+    guardar_arreglos(directorio, {
+        'X': np.asarray(X, dtype=np.float64),
+        'y': np.asarray(y, dtype=np.float64)
+    })
+    # El plan se escribe al final: los workers solo ven instantáneas completas
+    temporal = f'{_ruta_plan(directorio)}.tmp'
+    with open(temporal, 'w') as archivo:
+        json.dump({
+            'backend': backend,
+            'hiperparametros': hiperparametros,
+            'n_jobs': n_jobs,
+            'oob_score': oob_score,
+            'fragmentos': fragmentos
+        }, archivo)
+    os.replace(temporal, _ruta_plan(directorio))
+
+    print(f"🧩 Entrenamiento en {len(fragmentos)} fragmentos "
+          f"({procesos} procesos locales) en {directorio}")
+
+    ejecutor = None
+    try:
+        if procesos:
+            ejecutor = ProcessPoolExecutor(
+                max_workers=procesos,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+            tareas = [ejecutor.submit(procesar_pendientes, directorio) for _ in range(procesos)]
+
+        # Espera a que estén todos los fragmentos (locales o remotos)
+        limite = time.monotonic() + settings.ML_FRAGMENTOS_ESPERA_SEG
+        rutas = [_ruta_fragmento(directorio, fragmento['indice']) for fragmento in fragmentos]
+        while not all(os.path.exists(ruta) for ruta in rutas):
+            if ejecutor is not None:
+                for tarea in tareas:
+                    if tarea.done() and tarea.exception() is not None:
+                        raise tarea.exception()
+                # Los procesos locales ya recorrieron el plan: si quedaron
+                # fragmentos con reclamos vencidos, otro proceso los retoma
+                if all(tarea.done() for tarea in tareas) and any(
+                    _estado_fragmento(directorio, fragmento['indice'])[0] == 'libre'
+                    for fragmento in fragmentos
+                ):
+                    tareas.append(ejecutor.submit(procesar_pendientes, directorio))
+            if time.monotonic() > limite:
+                faltantes = [ruta for ruta in rutas if not os.path.exists(ruta)]
+                raise TimeoutError(
+                    f"Fragmentos sin terminar después de {settings.ML_FRAGMENTOS_ESPERA_SEG}s: "
+                    f"{[os.path.basename(ruta) for ruta in faltantes]}"
+                )
+            time.sleep(0.2)
+
+        if ejecutor is not None:
+            ejecutor.shutdown()
+
+        # Orden fijo por índice: el resultado no depende de quién terminó primero
+        modelo = combinar_bosques([joblib.load(ruta) for ruta in rutas])
+        if oob_score:
+            validas = np.isfinite(modelo.oob_prediction_)
+            modelo.oob_score_ = r2_score(np.asarray(y)[validas], modelo.oob_prediction_[validas])
+    finally:
+        if ejecutor is not None:
+            ejecutor.shutdown(wait=False, cancel_futures=True)
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    print(f"🧩 Bosque combinado: {modelo.n_estimators} árboles")
+    return modelo
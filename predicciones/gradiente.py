@@ -0,0 +1,101 @@
+"""
+Módulo con el modelo de gradient boosting por histogramas y sus intervalos por cuantiles
+"""
+import numpy as np
+from scipy.stats import norm
+from sklearn.ensemble import HistGradientBoostingRegressor
+
+
+class GradienteCuantiles:
+    """
+    HistGradientBoostingRegressor con intervalos de confianza
+
+    Gradient boosting no tiene árboles independientes de los que sacar una
+    dispersión, así que el intervalo se obtiene con dos modelos más
+    entrenados con pérdida cuantílica, uno por cada percentil del intervalo.
+    La predicción puntual es la del modelo de pérdida cuadrática.
+
+    Expone la misma interfaz que usa MotorIntervalos con los bosques:
+    predict() para la predicción puntual y calcular() para el intervalo.
+    """
+
+    def __init__(self, modelo, inferior, superior, percentiles):
+        self.modelo = modelo
+        self.inferior = inferior
+        self.superior = superior
+        self.percentiles = tuple(percentiles)
+
+    @classmethod
+    def entrenar(cls, hiperparametros, X, y, percentiles=(5, 95), random_state=42):
+        """
+        Entrena el modelo de la media y los de los percentiles del intervalo
+
+        Args:
+            hiperparametros: Parámetros de HistGradientBoostingRegressor
+            X: Features ya escaladas
+            y: Valores objetivo
+            percentiles: Percentiles (inferior, superior) del intervalo
+        """
+        modelos = [
+            HistGradientBoostingRegressor(**hiperparametros, random_state=random_state)
+        ] + [
+            HistGradientBoostingRegressor(
+                **hiperparametros, loss='quantile', quantile=percentil / 100,
+                random_state=random_state
+            )
+            for percentil in percentiles
+        ]
+        for modelo in modelos:
+            modelo.fit(X, y)
+        return cls(*modelos, percentiles=percentiles)
+
+    @property
+    def n_iteraciones(self):
+        return self.modelo.n_iter_
+
+    def predict(self, X):
+        """
+        Predicción puntual
+        """
+        return self.modelo.predict(X)
+
+    def calcular(self, X):
+        """
+        Calcula la predicción puntual y el intervalo de confianza por fila
+
+        Returns:
+            dict con arreglos 'prediccion', 'inferior', 'superior' y 'std'
+        """
+        prediccion = self.modelo.predict(X)
+        # Los modelos cuantílicos se entrenan por separado y pueden cruzarse
+        inferior = np.minimum(self.inferior.predict(X), prediccion)
+        superior = np.maximum(self.superior.predict(X), prediccion)
+
+        # Desviación de una normal con esos percentiles
+        z = norm.ppf(self.percentiles[1] / 100) - norm.ppf(self.percentiles[0] / 100)
+
+        return {
+            'prediccion': prediccion,
+            'inferior': inferior,
+            'superior': superior,
+            'std': (superior - inferior) / z
+        }
+
+    def cuantiles(self, X, qs):
+        """
+        Cuantiles de las ventas para cada fila (solo los percentiles entrenados)
+
+        Returns:
+            np.ndarray de forma (len(qs) × n_filas)
+        """
+        resultado = self.calcular(X)
+        por_cuantil = {
+            self.percentiles[0] / 100: resultado['inferior'],
+            self.percentiles[1] / 100: resultado['superior'],
+        }
+        faltantes = [q for q in qs if q not in por_cuantil]
+        if faltantes:
+            raise ValueError(
+                f"El modelo de gradient boosting solo tiene los cuantiles {sorted(por_cuantil)}"
+            )
+        return np.array([por_cuantil[q] for q in qs])
@@ -3,12 +3,29 @@ Módulo para realizar predicciones con el modelo entrenado
 """
 import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import datetime
+from django.conf import settings
 from django.core.cache import cache
 import os
+import threading
+import time
 
 from .ml_model import VentasPredictor
-from .models import Producto
+from .registro import escribir_metadata, leer_metadata, leer_version_actual, ruta_version
+from .intervalos import MotorIntervalos
+from .catalogo import obtener_catalogo
+from .models import PronosticoMaterializado
+
+
+def periodos_consecutivos(mes, anio, cantidad):
+    """
+    Genera (mes, anio) para `cantidad` meses calendario consecutivos
+    """
+    periodos = []
+    for i in range(cantidad):
+        indice = (mes - 1) + i
+        periodos.append((indice % 12 + 1, anio + indice // 12))
+    return periodos
 
 
 class PrediccionVentas:
@@ -18,6 +35,10 @@ class PrediccionVentas:
     
     def __init__(self):
         self.predictor = VentasPredictor()
+        self.catalogo = obtener_catalogo()
+        # Periodos materializados de la versión cargada (ver _periodos_materializados)
+        self._materializados = frozenset()
+        self._revision_materializados = None
         self._cargar_modelo_si_existe()
     
     def _cargar_modelo_si_existe(self):
@@ -25,12 +46,52 @@ class PrediccionVentas:
         Intenta cargar el modelo si existe
         """
         try:
-            self.predictor.cargar_modelo()
+            self.predictor.cargar_modelo(usar_compilado=True)
+            self.motor_intervalos = MotorIntervalos(
+                self.predictor.bosque_compilado or self.predictor.model,
+                percentiles=settings.ML_INTERVALO_PERCENTILES,
+                estadisticas_hojas=self.predictor.estadisticas_hojas
+            )
             self.modelo_cargado = True
         except FileNotFoundError:
             self.modelo_cargado = False
             print("⚠️ Modelo no encontrado. Necesitas entrenar el modelo primero.")
     
+    def _clave_cache(self, prefijo, *partes):
+        """
+        Clave de caché ligada a la versión del modelo, para que al cambiar de
+        versión nunca se sirvan resultados calculados con el modelo anterior
+        """
+        version = self.predictor.version or 'sin_version'
+        return '_'.join(str(parte) for parte in (prefijo, version) + partes)
+    
+    def calentar(self, filas=None):
+        """
+        Ejecuta un lote de prueba para que la primera petición real no pague
+        la inicialización (páginas del modelo, caches internas de NumPy/sklearn)
+        
+        Args:
+            filas: Filas del lote de prueba (por defecto ML_CALENTAMIENTO_FILAS)
+        
+        Returns:
+            Segundos que tomó el calentamiento, o None si no hay modelo
+        """
+        if not self.modelo_cargado:
+            return None
+        
+        filas = filas or settings.ML_CALENTAMIENTO_FILAS
+        inicio = time.perf_counter()
+        
+        X = pd.DataFrame(
+            np.zeros((filas, len(self.predictor.feature_names))),
+            columns=self.predictor.feature_names
+        )
+        self._puntuar_matriz(X)
+        
+        duracion = time.perf_counter() - inicio
+        print(f"🔥 Modelo calentado con {filas} filas en {duracion:.3f}s")
+        return duracion
+    
     def predecir_ventas_producto(self, producto_id, mes=None, anio=None, dias_futuro=30, usar_cache=True):
         """
         Predice las ventas de un producto específico
@@ -45,9 +106,6 @@ class PrediccionVentas:
         Returns:
             dict con la predicción y metadatos
         """
-        if not self.modelo_cargado:
-            raise ValueError("El modelo no está cargado. Entrena el modelo primero.")
-        
         # Calcular fecha
         fecha_actual = datetime.now()
         if mes is None:
@@ -55,94 +113,298 @@ class PrediccionVentas:
         if anio is None:
             anio = fecha_actual.year
         
-        # Intentar obtener de caché
-        if usar_cache:
-            from django.core.cache import cache
-            cache_key = f"pred_{producto_id}_{mes}_{anio}"
-            cached = cache.get(cache_key)
-            if cached:
-                return cached
-        
-        # Obtener información del producto
-        try:
-            producto = Producto.objects.select_related('categoria', 'marca').get(id=producto_id)
-        except Producto.DoesNotExist:
+        resultados = self.predecir_lote(
+            [producto_id], [(mes, anio)], dias_futuro=dias_futuro, usar_cache=usar_cache
+        )
+        if not resultados:
             raise ValueError(f"Producto con ID {producto_id} no existe")
         
-        # Calcular fecha de predicción
+        return resultados[0]
+    
+    def predecir_multiples_productos(self, productos_ids, mes=None, anio=None):
+        """
+        Predice ventas para múltiples productos
+        """
         fecha_actual = datetime.now()
-        if mes is None:
-            mes = fecha_actual.month
-        if anio is None:
-            anio = fecha_actual.year
+        periodo = (mes or fecha_actual.month, anio or fecha_actual.year)
         
-        fecha_prediccion = datetime(anio, mes, 1)
+        return self.predecir_lote(productos_ids, periodos=[periodo])
+    
+    def predecir_lote(self, productos_ids, periodos, dias_futuro=30, usar_cache=True,
+                      usar_materializados=True):
+        """
+        Predice ventas para N productos × M periodos en un solo lote
         
-        # Preparar features
-        features = self._preparar_features_prediccion(
-            producto=producto,
-            mes=mes,
-            anio=anio,
-            fecha_prediccion=fecha_prediccion
-        )
+        Construye una única matriz de features, la escala y la evalúa con una
+        sola llamada a predict en lugar de una llamada por producto y mes.
         
-        # Realizar predicción
-        X = pd.DataFrame([features])[self.predictor.feature_names]
-        X_scaled = self.predictor.scaler.transform(X)
+        Args:
+            productos_ids: Lista de IDs de productos
+            periodos: Lista de tuplas (mes, anio)
+            dias_futuro: Días hacia el futuro para predicción
+            usar_cache: Si True, reutiliza y guarda resultados individuales en caché
+            usar_materializados: Si True, usa PronosticoMaterializado antes de evaluar el modelo
         
-        # Predicción puntual
-        prediccion = self.predictor.model.predict(X_scaled)[0]
+        Returns:
+            list de dicts con el mismo formato que predecir_ventas_producto,
+            ordenados por producto y luego por periodo
+        """
+        if not self.modelo_cargado:
+            raise ValueError("El modelo no está cargado. Entrena el modelo primero.")
         
-        # Calcular intervalo de confianza usando predicciones de árboles individuales
-        predicciones_arboles = np.array([
-            arbol.predict(X_scaled)[0] 
-            for arbol in self.predictor.model.estimators_
-        ])
+        claves = [
+            (producto_id, mes, anio)
+            for producto_id in productos_ids
+            for mes, anio in periodos
+        ]
+        
+        # Resultados ya calculados en caché (una sola consulta)
+        cacheados = {}
+        if usar_cache and claves:
+            cacheados = cache.get_many([self._clave_cache('pred', *clave) for clave in claves])
+        
+        pendientes = [
+            clave for clave in claves
+            if self._clave_cache('pred', *clave) not in cacheados
+        ]
+        
+        # Datos de los productos desde el catálogo en memoria (sin consultas por producto)
+        snapshot, posiciones = self.catalogo.buscar([producto_id for producto_id, _, _ in pendientes])
+        
+        for producto_id in {clave[0] for clave, pos in zip(pendientes, posiciones) if pos < 0}:
+            print(f"Error prediciendo producto {producto_id}: Producto con ID {producto_id} no existe")
+        
+        existentes = posiciones >= 0
+        pendientes = [clave for clave, existe in zip(pendientes, existentes) if existe]
+        posiciones = posiciones[existentes]
+        
+        materializados = {}
+        if usar_materializados and pendientes:
+            materializados = self._buscar_materializados(pendientes)
+        
+        nuevos = {}
+        if pendientes:
+            X = self._matriz_features(
+                snapshot,
+                posiciones,
+                np.array([mes for _, mes, _ in pendientes]),
+                np.array([anio for _, _, anio in pendientes])
+            )
+            filas = X.to_dict('records')
+            
+            # Solo se evalúan con el modelo las filas sin pronóstico precalculado
+            sin_materializar = [
+                i for i, clave in enumerate(pendientes) if clave not in materializados
+            ]
+            predicciones = {}
+            if sin_materializar:
+                valores, intervalos = self._puntuar_matriz(X.iloc[sin_materializar])
+                for j, i in enumerate(sin_materializar):
+                    predicciones[pendientes[i]] = (valores[j], intervalos[j])
+            
+            for i, clave in enumerate(pendientes):
+                producto_id, mes, anio = clave
+                prediccion, intervalo_confianza = materializados.get(clave) or predicciones[clave]
+                nuevos[self._clave_cache('pred', *clave)] = {
+                    'prediccion': float(max(0, prediccion)),  # No puede ser negativo
+                    'intervalo_confianza': intervalo_confianza,
+                    'features_utilizados': filas[i],
+                    'fecha_prediccion': datetime(anio, mes, 1),
+                    'producto': snapshot.info_producto(posiciones[i]),
+                    'dias_futuro': dias_futuro
+                }
+            
+            # Guardar en caché (5 minutos)
+            if usar_cache:
+                cache.set_many(nuevos, 300)
+        
+        resultados = []
+        for producto_id, mes, anio in claves:
+            cache_key = self._clave_cache('pred', producto_id, mes, anio)
+            resultado = cacheados.get(cache_key) or nuevos.get(cache_key)
+            if resultado is not None:
+                resultados.append(resultado)
+        
+        return resultados
+    
+    def predecir_lote_iterativo(self, productos_ids, periodos, max_filas=None,
+                                usar_materializados=True):
+        """
+        Predice un lote grande por partes, devolviendo resultados a medida que se calculan
         
-        intervalo_confianza = {
-            'inferior': float(np.percentile(predicciones_arboles, 5)),
-            'superior': float(np.percentile(predicciones_arboles, 95)),
-            'std': float(np.std(predicciones_arboles))
-        }
+        Args:
+            productos_ids: Lista de IDs de productos
+            periodos: Lista de tuplas (mes, anio)
+            max_filas: Máximo de filas (producto × periodo) por llamada al modelo
+            usar_materializados: Si True, usa PronosticoMaterializado antes de evaluar el modelo
         
-        resultado = {
-            'prediccion': float(max(0, prediccion)),  # No puede ser negativo
-            'intervalo_confianza': intervalo_confianza,
-            'features_utilizados': features,
-            'fecha_prediccion': fecha_prediccion,
-            'producto': {
-                'id': producto.id,
-                'nombre': producto.nombre,
-                'precio': float(producto.precio),
-                'categoria': producto.categoria.nombre if producto.categoria else None,
-                'marca': producto.marca.nombre if producto.marca else None
-            },
-            'dias_futuro': dias_futuro
+        Yields:
+            dicts con el mismo formato que predecir_ventas_producto
+        """
+        max_filas = max_filas or settings.ML_LOTE_MAX_FILAS
+        productos_por_parte = max(1, max_filas // max(1, len(periodos)))
+        
+        for inicio in range(0, len(productos_ids), productos_por_parte):
+            parte = productos_ids[inicio:inicio + productos_por_parte]
+            yield from self.predecir_lote(
+                parte, periodos, usar_cache=False, usar_materializados=usar_materializados
+            )
+    
+    def _periodos_materializados(self):
+        """
+        Periodos (mes, anio) con pronósticos materializados de la versión cargada
+        
+        Se leen del metadata.json de la versión, que materializar_pronosticos
+        completa al terminar, así que sin materialización (ML_MATERIALIZAR_MESES=0)
+        no se consulta PronosticoMaterializado. Como la materialización termina
+        después de publicar la versión, mientras no haya periodos el metadata
+        se vuelve a leer como máximo cada ML_RECARGA_REVISION_SEG segundos.
+        """
+        if self._materializados or not self.predictor.version:
+            return self._materializados
+        
+        ahora = time.monotonic()
+        if (
+            self._revision_materializados is not None
+            and ahora - self._revision_materializados < settings.ML_RECARGA_REVISION_SEG
+        ):
+            return self._materializados
+        
+        self._revision_materializados = ahora
+        metadata = leer_metadata(self.predictor.version) or {}
+        self._materializados = frozenset(
+            (mes, anio)
+            for mes, anio in metadata.get('pronosticos_materializados', {}).get('periodos', [])
+        )
+        return self._materializados
+    
+    def _buscar_materializados(self, claves):
+        """
+        Busca pronósticos precalculados de la versión actual del modelo
+        
+        Args:
+            claves: Lista de tuplas (producto_id, mes, anio)
+        
+        Returns:
+            dict {(producto_id, mes, anio): (prediccion, intervalo_confianza)}
+        """
+        periodos = self._periodos_materializados()
+        buscadas = {clave for clave in claves if (clave[1], clave[2]) in periodos}
+        if not buscadas:
+            return {}
+        
+        filas = PronosticoMaterializado.objects.filter(
+            version_modelo=self.predictor.version,
+            producto_id__in={producto_id for producto_id, _, _ in buscadas},
+            mes__in={mes for _, mes, _ in buscadas},
+            anio__in={anio for _, _, anio in buscadas}
+        ).values_list(
+            'producto_id', 'mes', 'anio', 'prediccion',
+            'intervalo_inferior', 'intervalo_superior', 'intervalo_std'
+        )
+        
+        return {
+            (producto_id, mes, anio): (prediccion, {
+                'inferior': inferior,
+                'superior': superior,
+                'std': std
+            })
+            for producto_id, mes, anio, prediccion, inferior, superior, std in filas
+            if (producto_id, mes, anio) in buscadas
         }
+    
+    def materializar_pronosticos(self, meses_futuro):
+        """
+        Precalcula las predicciones de todos los productos para los próximos
+        N meses y las guarda en PronosticoMaterializado con la versión del modelo
         
-        # Guardar en caché (5 minutos)
-        if usar_cache:
-            from django.core.cache import cache
-            cache_key = f"pred_{producto_id}_{mes}_{anio}"
-            cache.set(cache_key, resultado, 300)
+        Returns:
+            int con la cantidad de pronósticos guardados
+        """
+        if not self.modelo_cargado or not self.predictor.version:
+            raise ValueError("El modelo no está cargado. Entrena el modelo primero.")
         
-        return resultado
+        version = self.predictor.version
+        fecha_actual = datetime.now()
+        periodos = periodos_consecutivos(fecha_actual.month, fecha_actual.year, meses_futuro)
+        productos_ids = self.catalogo.actual().ids.tolist()
+        
+        print(f"🗂️ Materializando {len(productos_ids)} productos × {meses_futuro} meses...")
+        
+        self._registrar_materializados(version, [], 0)
+        PronosticoMaterializado.objects.filter(version_modelo=version).delete()
+        
+        total = 0
+        pendientes = []
+        for pred in self.predecir_lote_iterativo(productos_ids, periodos, usar_materializados=False):
+            pendientes.append(PronosticoMaterializado(
+                version_modelo=version,
+                producto_id=pred['producto']['id'],
+                mes=pred['features_utilizados']['mes'],
+                anio=pred['features_utilizados']['anio'],
+                prediccion=pred['prediccion'],
+                intervalo_inferior=pred['intervalo_confianza']['inferior'],
+                intervalo_superior=pred['intervalo_confianza']['superior'],
+                intervalo_std=pred['intervalo_confianza']['std']
+            ))
+            if len(pendientes) >= 1000:
+                PronosticoMaterializado.objects.bulk_create(pendientes)
+                total += len(pendientes)
+                pendientes = []
+        
+        if pendientes:
+            PronosticoMaterializado.objects.bulk_create(pendientes)
+            total += len(pendientes)
+        
+        # Los pronósticos de versiones anteriores ya no se usan
+        PronosticoMaterializado.objects.exclude(version_modelo=version).delete()
+        
+        self._registrar_materializados(version, periodos, total)
+        print(f"✅ {total} pronósticos materializados (versión {version})")
+        return total
     
-    def predecir_multiples_productos(self, productos_ids, mes=None, anio=None):
+    def _registrar_materializados(self, version, periodos, total):
         """
-        Predice ventas para múltiples productos
+        Anota en el metadata.json de la versión los periodos materializados
+        """
+        metadata = leer_metadata(version)
+        if metadata is None:
+            return
+        metadata['pronosticos_materializados'] = {
+            'periodos': [list(periodo) for periodo in periodos],
+            'total': total
+        }
+        escribir_metadata(ruta_version(version), metadata)
+    
+    def _puntuar_matriz(self, X):
+        """
+        Evalúa una matriz de features con el modelo
+        
+        Args:
+            X: DataFrame con las columnas de feature_names
+        
+        Returns:
+            tuple (predicciones, intervalos) con un elemento por fila de X
         """
-        predicciones = []
+        X_scaled = self.predictor.scaler.transform(X)
         
-        for producto_id in productos_ids:
-            try:
-                pred = self.predecir_ventas_producto(producto_id, mes, anio)
-                predicciones.append(pred)
-            except Exception as e:
-                print(f"Error prediciendo producto {producto_id}: {str(e)}")
-                continue
+        # Predicciones de todos los árboles para todo el lote en una sola pasada
+        resultado = self.motor_intervalos.calcular(X_scaled)
+        predicciones = resultado['prediccion']
+        inferiores = resultado['inferior']
+        superiores = resultado['superior']
+        desviaciones = resultado['std']
+        
+        intervalos = [
+            {
+                'inferior': float(inferiores[i]),
+                'superior': float(superiores[i]),
+                'std': float(desviaciones[i])
+            }
+            for i in range(len(predicciones))
+        ]
         
-        return predicciones
+        return predicciones, intervalos
     
     def predecir_tendencia_producto(self, producto_id, meses_futuro=6):
         """
@@ -151,32 +413,26 @@ class PrediccionVentas:
         from django.core.cache import cache
         
         # Intentar caché
-        cache_key = f"tendencia_{producto_id}_{meses_futuro}"
+        cache_key = self._clave_cache('tendencia', producto_id, meses_futuro)
         cached = cache.get(cache_key)
         if cached:
             return cached
         
         fecha_actual = datetime.now()
-        predicciones_tendencia = []
-        
-        for i in range(meses_futuro):
-            fecha_pred = fecha_actual + timedelta(days=30*i)
-            try:
-                pred = self.predecir_ventas_producto(
-                    producto_id=producto_id,
-                    mes=fecha_pred.month,
-                    anio=fecha_pred.year,
-                    usar_cache=True
-                )
-                predicciones_tendencia.append({
-                    'mes': fecha_pred.month,
-                    'anio': fecha_pred.year,
-                    'prediccion': pred['prediccion'],
-                    'intervalo_confianza': pred['intervalo_confianza']
-                })
-            except Exception as e:
-                print(f"Error en tendencia mes {i}: {str(e)}")
-                continue
+        
+        # Todos los meses del horizonte en un solo lote (meses calendario consecutivos)
+        periodos = periodos_consecutivos(fecha_actual.month, fecha_actual.year, meses_futuro)
+        predicciones = self.predecir_lote([producto_id], periodos, usar_cache=False)
+        
+        predicciones_tendencia = [
+            {
+                'mes': pred['features_utilizados']['mes'],
+                'anio': pred['features_utilizados']['anio'],
+                'prediccion': pred['prediccion'],
+                'intervalo_confianza': pred['intervalo_confianza']
+            }
+            for pred in predicciones
+        ]
         
         resultado = {
             'producto_id': producto_id,
@@ -185,32 +441,40 @@ class PrediccionVentas:
             'meses_proyectados': meses_futuro
         }
         
-        # Guardar en caché (10 minutos)
-        from django.core.cache import cache
-        cache_key = f"tendencia_{producto_id}_{meses_futuro}"
+        # Guardar en caché (10 minutos) como una sola entrada
         cache.set(cache_key, resultado, 600)
         
         return resultado
     
-    def _preparar_features_prediccion(self, producto, mes, anio, fecha_prediccion):
-        """
-        Prepara los features para predicción
+    def _matriz_features(self, snapshot, posiciones, meses, anios):
         """
-        trimestre = (mes - 1) // 3 + 1
-        dia_semana = fecha_prediccion.weekday()
+        Construye la matriz de features para predicción a partir del catálogo
         
-        features = {
-            'producto_id': producto.id,
-            'mes': mes,
-            'anio': anio,
-            'trimestre': trimestre,
-            'producto_precio': float(producto.precio),
-            'producto_categoria_id': producto.categoria_id if producto.categoria_id else 0,
-            'producto_marca_id': producto.marca_id if producto.marca_id else 0,
+        Args:
+            snapshot: SnapshotCatalogo con los datos de los productos
+            posiciones: Posición de cada fila en el snapshot
+            meses, anios: Mes y año de cada fila
+        
+        Returns:
+            DataFrame con las columnas de feature_names
+        """
+        dia_semana = np.array([
+            datetime(int(anio), int(mes), 1).weekday()
+            for mes, anio in zip(meses, anios)
+        ], dtype=np.int64)
+        
+        X = pd.DataFrame({
+            'producto_id': snapshot.ids[posiciones],
+            'mes': meses.astype(np.int64),
+            'anio': anios.astype(np.int64),
+            'trimestre': (meses.astype(np.int64) - 1) // 3 + 1,
+            'producto_precio': snapshot.precios[posiciones],
+            'producto_categoria_id': snapshot.categoria_ids[posiciones],
+            'producto_marca_id': snapshot.marca_ids[posiciones],
             'dia_semana': dia_semana
-        }
+        })
         
-        return features
+        return X[self.predictor.feature_names]
     
     def obtener_productos_top_prediccion(self, top_n=10, mes=None, anio=None):
         """
@@ -219,118 +483,221 @@ class PrediccionVentas:
         from django.core.cache import cache
         
         # Intentar caché
-        cache_key = f"top_prod_{top_n}_{mes}_{anio}"
+        cache_key = self._clave_cache('top_prod', top_n, mes, anio)
         cached = cache.get(cache_key)
         if cached:
             return cached
         
-        # Limitar a productos con stock (máximo 100 para no saturar)
-        productos = Producto.objects.filter(stock__gt=0).select_related(
-            'categoria', 'marca'
-        ).values('id', 'nombre', 'precio')[:100]
-        
-        predicciones = []
-        for producto in productos:
-            try:
-                pred = self.predecir_ventas_producto(
-                    producto['id'], mes, anio, usar_cache=True
-                )
-                predicciones.append({
-                    'producto_id': producto['id'],
-                    'producto_nombre': producto['nombre'],
-                    'prediccion': pred['prediccion'],
-                    'precio': float(producto['precio'])
-                })
-            except Exception:
-                continue
-        
-        # Ordenar por predicción
-        predicciones_ordenadas = sorted(
-            predicciones, 
-            key=lambda x: x['prediccion'], 
-            reverse=True
-        )[:top_n]
+        fecha_actual = datetime.now()
+        periodo = (mes or fecha_actual.month, anio or fecha_actual.year)
+        
+        snapshot = self.catalogo.actual()
+        posiciones = np.flatnonzero(snapshot.stocks > 0)
+        
+        # Ranking directo desde los pronósticos materializados (consulta indexada),
+        # solo si cubren todo el catálogo con stock: los productos creados
+        # después de materializar no tienen fila y nunca aparecerían
+        if periodo in self._periodos_materializados():
+            consulta = PronosticoMaterializado.objects.filter(
+                version_modelo=self.predictor.version,
+                mes=periodo[0],
+                anio=periodo[1],
+                producto__stock__gt=0
+            )
+            materializados = []
+            if consulta.count() == len(posiciones):
+                # A igual predicción, menor ID primero (igual que _ranking_posiciones)
+                materializados = list(consulta.order_by('-prediccion', 'producto_id').values(
+                    'producto_id', 'producto__nombre', 'producto__precio', 'prediccion'
+                )[:top_n])
+            if materializados:
+                predicciones_ordenadas = [
+                    {
+                        'producto_id': fila['producto_id'],
+                        'producto_nombre': fila['producto__nombre'],
+                        'prediccion': max(0.0, fila['prediccion']),
+                        'precio': float(fila['producto__precio'])
+                    }
+                    for fila in materializados
+                ]
+                cache.set(cache_key, predicciones_ordenadas, 600)
+                return predicciones_ordenadas
+        
+        # Ranking sobre todo el catálogo con stock
+        mejores, predicciones = self._ranking_posiciones(snapshot, posiciones, periodo, top_n)
+        
+        predicciones_ordenadas = [
+            {
+                'producto_id': int(snapshot.ids[pos]),
+                'producto_nombre': snapshot.nombres[pos],
+                'prediccion': float(prediccion),
+                'precio': float(snapshot.precios[pos])
+            }
+            for pos, prediccion in zip(mejores, predicciones)
+        ]
         
         # Guardar en caché (10 minutos)
         cache.set(cache_key, predicciones_ordenadas, 600)
         
         return predicciones_ordenadas
     
+    def _ranking_posiciones(self, snapshot, posiciones, periodo, top_n):
+        """
+        Selecciona los top N productos por predicción evaluando por partes
+        
+        Cada parte de ML_LOTE_MAX_FILAS productos se evalúa en una sola llamada
+        y solo se conservan los mejores N candidatos entre partes, así que la
+        memoria no crece con el tamaño del catálogo.
+        
+        Returns:
+            tuple (posiciones, predicciones) de los top N, de mayor a menor
+        """
+        if not self.modelo_cargado:
+            raise ValueError("El modelo no está cargado. Entrena el modelo primero.")
+        
+        mejores_pos = np.empty(0, dtype=np.int64)
+        mejores_pred = np.empty(0, dtype=np.float64)
+        if top_n <= 0:
+            return mejores_pos, mejores_pred
+        
+        mes, anio = periodo
+        tamano = settings.ML_LOTE_MAX_FILAS
+        for inicio in range(0, len(posiciones), tamano):
+            parte = posiciones[inicio:inicio + tamano]
+            predicciones = self._predecir_puntual(
+                snapshot, parte, np.array([mes]), np.array([anio])
+            )[:, 0]
+            
+            mejores_pos = np.concatenate([mejores_pos, parte])
+            mejores_pred = np.concatenate([mejores_pred, predicciones])
+            # Mayor predicción primero; a igual predicción, menor ID primero (el
+            # snapshot está ordenado por ID). El desempate también decide qué
+            # candidatos empatados en el corte siguen en carrera
+            orden = np.lexsort((mejores_pos, -mejores_pred))[:top_n]
+            mejores_pos = mejores_pos[orden]
+            mejores_pred = mejores_pred[orden]
+        
+        return mejores_pos, mejores_pred
+    
+    def _predecir_puntual(self, snapshot, posiciones, meses, anios):
+        """
+        Predicción puntual para cada producto × mes, sin intervalos
+        
+        Usa los pronósticos materializados de la versión actual cuando existen
+        y evalúa el resto con una sola llamada al modelo.
+        
+        Returns:
+            np.ndarray de forma (productos × meses)
+        """
+        filas_pos = np.repeat(posiciones, len(meses))
+        filas_mes = np.tile(meses, len(posiciones))
+        filas_anio = np.tile(anios, len(posiciones))
+        
+        predicciones = np.full(len(filas_pos), np.nan)
+        
+        if self._periodos_materializados() and len(filas_pos):
+            claves = list(zip(snapshot.ids[filas_pos].tolist(), filas_mes.tolist(), filas_anio.tolist()))
+            materializados = self._buscar_materializados(claves)
+            if materializados:
+                for i, clave in enumerate(claves):
+                    if clave in materializados:
+                        predicciones[i] = materializados[clave][0]
+        
+        faltantes = np.isnan(predicciones)
+        if faltantes.any():
+            X = self._matriz_features(
+                snapshot, filas_pos[faltantes], filas_mes[faltantes], filas_anio[faltantes]
+            )
+            predicciones[faltantes] = self.motor_intervalos.predecir(
+                self.predictor.scaler.transform(X)
+            )
+        
+        return np.maximum(predicciones, 0).reshape(len(posiciones), len(meses))
+    
+    def _productos_por_parte(self, n_meses):
+        """
+        Cantidad de productos por parte para que una parte de productos × meses
+        respete ML_AGREGADA_MEMORIA_MB durante la inferencia
+        """
+        # Estimación de bytes por fila: features (original, escalada, float32)
+        # más los arreglos de recorrido por árbol (nodo, fila, valores)
+        n_features = len(self.predictor.feature_names)
+        bytes_por_fila = 24 * n_features + 40 * self.motor_intervalos.n_arboles
+        filas = settings.ML_AGREGADA_MEMORIA_MB * 1024 * 1024 // bytes_por_fila
+        return max(1, int(filas) // max(1, n_meses))
+    
     def predecir_ventas_totales_agregadas(self, meses_futuro=12, incluir_top_productos=5):
         """
         Predice ventas totales agregadas para graficar tendencia general
         Incluye también top N productos para comparación
         """
-        from collections import defaultdict
         from django.core.cache import cache
         
         # Intentar caché
-        cache_key = f"pred_agregada_{meses_futuro}_{incluir_top_productos}"
+        cache_key = self._clave_cache('pred_agregada', meses_futuro, incluir_top_productos)
         cached = cache.get(cache_key)
         if cached:
             return cached
         
-        fecha_actual = datetime.now()
-        
-        # Limitar productos para Render gratuito (max 10 productos para evitar OOM)
-        productos = Producto.objects.filter(stock__gt=0).select_related(
-            'categoria', 'marca'
-        ).values('id', 'nombre', 'precio')[:10]
-        
-        # Almacenar predicciones por mes
-        predicciones_por_mes = defaultdict(lambda: {
-            'cantidad_total': 0,
-            'ingresos_estimados': 0,
-            'productos_detalle': []
-        })
+        if not self.modelo_cargado:
+            raise ValueError("El modelo no está cargado. Entrena el modelo primero.")
         
-        for i in range(meses_futuro):
-            fecha_pred = fecha_actual + timedelta(days=30*i)
-            mes = fecha_pred.month
-            anio = fecha_pred.year
-            mes_label = f"{anio}-{mes:02d}"
+        fecha_actual = datetime.now()
+        periodos = periodos_consecutivos(fecha_actual.month, fecha_actual.year, meses_futuro)
+        meses = np.array([mes for mes, _ in periodos], dtype=np.int64)
+        anios = np.array([anio for _, anio in periodos], dtype=np.int64)
+        
+        # Todo el catálogo con stock, procesado por partes de tamaño fijo
+        snapshot = self.catalogo.actual()
+        posiciones = np.flatnonzero(snapshot.stocks > 0)
+        
+        # Acumuladores por mes y top productos de cada mes (tamaño acotado)
+        cantidad_total = np.zeros(len(periodos))
+        ingresos_total = np.zeros(len(periodos))
+        top_posiciones = np.empty((len(periodos), 0), dtype=np.int64)
+        top_cantidades = np.empty((len(periodos), 0))
+        
+        productos_por_parte = self._productos_por_parte(len(periodos))
+        for inicio in range(0, len(posiciones), productos_por_parte):
+            parte = posiciones[inicio:inicio + productos_por_parte]
+            
+            # (productos de la parte × meses)
+            cantidades = self._predecir_puntual(snapshot, parte, meses, anios)
+            cantidad_total += cantidades.sum(axis=0)
+            ingresos_total += (cantidades * snapshot.precios[parte, np.newaxis]).sum(axis=0)
             
-            for producto in productos:
-                try:
-                    pred = self.predecir_ventas_producto(
-                        producto_id=producto['id'],
-                        mes=mes,
-                        anio=anio,
-                        usar_cache=True
-                    )
-                    
-                    cantidad = pred['prediccion']
-                    precio = float(producto['precio'])
-                    ingresos = cantidad * precio
-                    
-                    predicciones_por_mes[mes_label]['cantidad_total'] += cantidad
-                    predicciones_por_mes[mes_label]['ingresos_estimados'] += ingresos
-                    predicciones_por_mes[mes_label]['productos_detalle'].append({
-                        'producto_id': producto['id'],
-                        'nombre': producto['nombre'],
-                        'cantidad': round(cantidad, 2),
-                        'ingresos': round(ingresos, 2)
-                    })
-                    
-                except Exception:
-                    continue
+            if incluir_top_productos > 0:
+                top_posiciones = np.concatenate(
+                    [top_posiciones, np.broadcast_to(parte, (len(periodos), len(parte)))], axis=1
+                )
+                top_cantidades = np.concatenate([top_cantidades, cantidades.T], axis=1)
+                if top_cantidades.shape[1] > incluir_top_productos:
+                    seleccion = np.argpartition(
+                        -top_cantidades, incluir_top_productos - 1, axis=1
+                    )[:, :incluir_top_productos]
+                    top_posiciones = np.take_along_axis(top_posiciones, seleccion, axis=1)
+                    top_cantidades = np.take_along_axis(top_cantidades, seleccion, axis=1)
         
         # Formatear para gráficas
         series_temporal = []
-        for mes_label in sorted(predicciones_por_mes.keys()):
-            data = predicciones_por_mes[mes_label]
-            
-            # Top productos del mes
-            top_productos = sorted(
-                data['productos_detalle'],
-                key=lambda x: x['cantidad'],
-                reverse=True
-            )[:incluir_top_productos]
+        for i, (mes, anio) in enumerate(periodos):
+            orden = np.lexsort((top_posiciones[i], -top_cantidades[i]))
+            top_productos = [
+                {
+                    'producto_id': int(snapshot.ids[top_posiciones[i, j]]),
+                    'nombre': snapshot.nombres[top_posiciones[i, j]],
+                    'cantidad': round(float(top_cantidades[i, j]), 2),
+                    'ingresos': round(float(
+                        top_cantidades[i, j] * snapshot.precios[top_posiciones[i, j]]
+                    ), 2)
+                }
+                for j in orden
+            ]
             
             series_temporal.append({
-                'periodo': mes_label,
-                'cantidad_total': round(data['cantidad_total'], 2),
-                'ingresos_estimados': round(data['ingresos_estimados'], 2),
+                'periodo': f"{anio}-{mes:02d}",
+                'cantidad_total': round(float(cantidad_total[i]), 2),
+                'ingresos_estimados': round(float(ingresos_total[i]), 2),
                 'top_productos': top_productos
             })
         
@@ -352,12 +719,103 @@ class PrediccionVentas:
 
 # Instancia global para reutilizar
 _prediccion_instance = None
+_prediccion_lock = threading.Lock()
+
+# Estado de la revisión de nuevas versiones del modelo
+_ultima_revision_version = 0.0
+_recarga_en_curso = False
+# Última versión que no se pudo cargar: no se reintenta hasta que cambie el puntero
+_version_fallida = None
 
 def obtener_predictor():
     """
     Obtiene la instancia singleton del predictor
+    
+    La creación está protegida con un lock para que varias peticiones
+    concurrentes en un worker recién iniciado no carguen el modelo dos veces.
+    
+    Como máximo una vez cada ML_RECARGA_REVISION_SEG segundos se revisa el
+    puntero de versión del modelo; si cambió (por ejemplo, después de
+    reentrenar), la nueva versión se carga en segundo plano y reemplaza a la
+    instancia actual. Mientras tanto se sigue sirviendo la versión anterior.
     """
     global _prediccion_instance
     if _prediccion_instance is None:
-        _prediccion_instance = PrediccionVentas()
+        with _prediccion_lock:
+            if _prediccion_instance is None:
+                _prediccion_instance = PrediccionVentas()
+    
+    _revisar_version()
     return _prediccion_instance
+
+
+def _revisar_version():
+    """
+    Inicia la recarga en segundo plano si hay una versión nueva del modelo
+    """
+    global _ultima_revision_version, _recarga_en_curso
+    
+    ahora = time.monotonic()
+    if ahora - _ultima_revision_version < settings.ML_RECARGA_REVISION_SEG:
+        return
+    
+    with _prediccion_lock:
+        if _recarga_en_curso or ahora - _ultima_revision_version < settings.ML_RECARGA_REVISION_SEG:
+            return
+        _ultima_revision_version = ahora
+        
+        version = leer_version_actual()
+        if version in (None, _prediccion_instance.predictor.version, _version_fallida):
+            return
+        _recarga_en_curso = True
+    
+    threading.Thread(target=recargar_predictor, args=(version,), daemon=True).start()
+
+
+def recargar_predictor(version=None):
+    """
+    Carga la versión vigente del modelo en una instancia nueva y la publica
+    
+    Las peticiones en curso terminan con la instancia que ya obtuvieron; las
+    siguientes usan la nueva. La asignación de la instancia global es atómica.
+    
+    Args:
+        version: Versión del puntero que motivó la recarga. Si no se puede
+            cargar, queda registrada y las revisiones siguientes no la
+            reintentan hasta que el puntero apunte a otra versión
+    """
+    global _prediccion_instance, _recarga_en_curso, _version_fallida
+    
+    fallida = None
+    try:
+        nueva = PrediccionVentas()
+        if nueva.modelo_cargado:
+            nueva.calentar()
+            _prediccion_instance = nueva
+            print(f"🔄 Modelo recargado (versión {nueva.predictor.version})")
+        else:
+            print(f"❌ No se pudo cargar la versión {version}: se reintenta cuando cambie el puntero")
+            fallida = version
+    except Exception as e:
+        print(f"❌ Error recargando el modelo: {str(e)}")
+        fallida = version
+    finally:
+        with _prediccion_lock:
+            _version_fallida = fallida
+            _recarga_en_curso = False
+    
+    return _prediccion_instance
+
+
+def precargar_predictor():
+    """
+    Carga y calienta el predictor al iniciar el proceso
+    
+    Se llama desde mlproject/wsgi.py y mlproject/asgi.py cuando
+    ML_PRECARGAR_MODELO está activo. Con gunicorn --preload se ejecuta una
+    sola vez en el proceso maestro y los workers heredan el modelo ya cargado
+    (copy-on-write) en lugar de cargarlo en su primera petición.
+    """
+    prediccion = obtener_predictor()
+    prediccion.calentar()
+    return prediccion
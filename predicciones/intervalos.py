@@ -0,0 +1,130 @@
+"""
+Módulo para calcular intervalos de confianza a partir de los árboles del bosque
+"""
+import numpy as np
+
+from .bosque_compilado import BosqueCompilado
+from .gradiente import GradienteCuantiles
+
+
+class MotorIntervalos:
+    """
+    Calcula las predicciones de todos los árboles para un lote completo
+
+    Si recibe un BosqueCompilado usa su recorrido vectorizado. Con un modelo
+    de sklearn, en lugar de llamar a predict una vez por árbol, obtiene las
+    hojas de todas las filas con una sola llamada a apply() y lee sus valores
+    desde una tabla empaquetada con los valores de hoja de todos los árboles.
+
+    Con EstadisticasHojas (modo Quantile Regression Forest) el intervalo se
+    toma de la distribución de ventas de entrenamiento en las hojas
+    alcanzadas, en lugar de la dispersión de las medias de los árboles.
+
+    Con un GradienteCuantiles el intervalo sale de sus modelos cuantílicos
+    (no hay predicciones por árbol).
+    """
+
+    def __init__(self, modelo, percentiles=(5, 95), estadisticas_hojas=None):
+        self.modelo = modelo
+        self.percentiles = percentiles
+        self.estadisticas_hojas = estadisticas_hojas
+
+        if isinstance(modelo, (BosqueCompilado, GradienteCuantiles)):
+            return
+
+        # Valores de todos los nodos de todos los árboles en un solo arreglo
+        self.valores = np.concatenate([
+            arbol.tree_.value[:, 0, 0] for arbol in modelo.estimators_
+        ])
+
+        # Posición del primer nodo de cada árbol dentro de la tabla
+        nodos_por_arbol = [arbol.tree_.node_count for arbol in modelo.estimators_]
+        self.desplazamientos = np.concatenate([[0], np.cumsum(nodos_por_arbol)[:-1]])
+
+    @property
+    def n_arboles(self):
+        if isinstance(self.modelo, BosqueCompilado):
+            return self.modelo.n_arboles
+        if isinstance(self.modelo, GradienteCuantiles):
+            # Una sola predicción por fila, sin matriz por árbol
+            return 1
+        return len(self.modelo.estimators_)
+
+    def predicciones_arboles(self, X_scaled):
+        """
+        Obtiene la predicción de cada árbol para cada fila
+
+        Args:
+            X_scaled: Matriz de features ya escalada (n_filas × n_features)
+
+        Returns:
+            np.ndarray de forma (n_arboles × n_filas)
+        """
+        if isinstance(self.modelo, BosqueCompilado):
+            return self.modelo.predicciones_arboles(X_scaled)
+
+        hojas = self.modelo.apply(X_scaled)
+        return self.valores[hojas.T + self.desplazamientos[:, np.newaxis]]
+
+    def predecir(self, X_scaled):
+        """
+        Predicción puntual (promedio de los árboles), sin calcular intervalos
+        """
+        return self.modelo.predict(X_scaled)
+
+    def calcular(self, X_scaled):
+        """
+        Calcula la predicción puntual y el intervalo de confianza por fila
+
+        Returns:
+            dict con arreglos 'prediccion', 'inferior', 'superior' y 'std'
+        """
+        if isinstance(self.modelo, GradienteCuantiles):
+            return self.modelo.calcular(X_scaled)
+
+        if self._usa_cuantiles():
+            hojas = self.modelo.aplicar(X_scaled)
+            (inferior, superior), std = self.estadisticas_hojas.resumen(
+                hojas, np.asarray(self.percentiles) / 100
+            )
+            return {
+                'prediccion': self.modelo.valor[hojas].mean(axis=0),
+                'inferior': inferior,
+                'superior': superior,
+                'std': std
+            }
+
+        predicciones_arboles = self.predicciones_arboles(X_scaled)
+        inferior, superior = np.percentile(predicciones_arboles, self.percentiles, axis=0)
+
+        return {
+            'prediccion': predicciones_arboles.mean(axis=0),
+            'inferior': inferior,
+            'superior': superior,
+            'std': predicciones_arboles.std(axis=0)
+        }
+
+    def cuantiles(self, X_scaled, qs):
+        """
+        Calcula cuantiles arbitrarios de las ventas para cada fila
+
+        Args:
+            X_scaled: Matriz de features ya escalada
+            qs: Cuantiles entre 0 y 1
+
+        Returns:
+            np.ndarray de forma (len(qs) × n_filas)
+        """
+        if isinstance(self.modelo, GradienteCuantiles):
+            return self.modelo.cuantiles(X_scaled, qs)
+
+        if self._usa_cuantiles():
+            return self.estadisticas_hojas.cuantiles(self.modelo.aplicar(X_scaled), qs)
+
+        return np.quantile(self.predicciones_arboles(X_scaled), qs, axis=0)
+
+    def _usa_cuantiles(self):
+        return (
+            self.estadisticas_hojas is not None
+            and isinstance(self.modelo, BosqueCompilado)
+        )
@@ -0,0 +1,90 @@
+"""
+Comando Django para actualizar el modelo vigente con árboles nuevos (sin entrenar desde cero)
+Uso: python manage.py actualizar_modelo [--arboles K] [--sin-retirar] [--meses M]
+                                        [--comparar] [--materializar-meses N]
+"""
+from django.core.management.base import BaseCommand, CommandError
+from predicciones.ml_model import actualizar_y_guardar_modelo
+
+
+class Command(BaseCommand):
+    help = 'Agrega árboles entrenados con las ventas recientes al modelo vigente'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--arboles',
+            type=int,
+            default=None,
+            help='Árboles nuevos (por defecto ML_INCREMENTAL_ARBOLES)'
+        )
+        parser.add_argument(
+            '--sin-retirar',
+            action='store_true',
+            help='Conserva los árboles más antiguos (el bosque crece en cada actualización)'
+        )
+        parser.add_argument(
+            '--meses',
+            type=int,
+            default=None,
+            help='Periodos recientes con los que se entrenan los árboles nuevos '
+                 '(por defecto ML_INCREMENTAL_MESES)'
+        )
+        parser.add_argument(
+            '--comparar',
+            action='store_true',
+            help='Entrena también un bosque desde cero y compara métricas y tiempos'
+        )
+        parser.add_argument(
+            '--materializar-meses',
+            type=int,
+            default=None,
+            help='Meses futuros a precalcular en PronosticoMaterializado (0 = no precalcular)'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            resultado = actualizar_y_guardar_modelo(
+                arboles=options['arboles'],
+                retirar=False if options['sin_retirar'] else None,
+                meses=options['meses'],
+                comparar=options['comparar'],
+                materializar_meses=options['materializar_meses']
+            )
+        except (FileNotFoundError, ValueError) as e:
+            raise CommandError(str(e))
+
+        incremental = resultado['incremental']
+        self.stdout.write(self.style.SUCCESS(
+            f"\n✅ Versión {incremental['base']} actualizada como {resultado['version']}"
+        ))
+        self.stdout.write(
+            f"  Árboles: +{incremental['arboles_nuevos']} -{incremental['arboles_retirados']} "
+            f"(total {resultado['n_arboles']})"
+        )
+        self.stdout.write(
+            f"  Filas: {incremental['filas_entrenamiento']} de los últimos "
+            f"{incremental['meses']} periodos, {incremental['filas_nuevas']} nuevas"
+        )
+
+        self.stdout.write("\nMétricas:")
+        for nombre, valor in resultado['metricas'].items():
+            self.stdout.write(f"  {nombre}: {valor:.4f}")
+
+        self.stdout.write("\nTiempos:")
+        for fase, segundos in resultado['tiempos'].items():
+            self.stdout.write(f"  {fase}: {segundos:.2f}s")
+
+        comparacion = incremental['comparacion']
+        if comparacion is not None:
+            self.stdout.write(f"\nComparación ({comparacion['filas_evaluacion']} filas nuevas de evaluación):")
+            for nombre in ('incremental', 'completo'):
+                datos = comparacion[nombre]
+                self.stdout.write(
+                    f"  {nombre}: R² {datos['r2_test']:.4f}  RMSE {datos['rmse_test']:.4f}  "
+                    f"MAE {datos['mae_test']:.4f}  ajuste {datos['ajuste_seg']:.2f}s"
+                )
+
+        if resultado['pronosticos_materializados']:
+            self.stdout.write(
+                f"  Pronósticos materializados: {resultado['pronosticos_materializados']}"
+            )
@@ -0,0 +1,47 @@
+"""
+Comando Django para entrenar fragmentos del bosque desde otra máquina
+Uso: python manage.py entrenar_fragmentos [--directorio DIR] [--esperar SEG]
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from predicciones.fragmentos import planes_pendientes, procesar_pendientes
+
+
+class Command(BaseCommand):
+    help = 'Entrena los fragmentos pendientes de los entrenamientos repartidos en fragmentos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--directorio',
+            default=None,
+            help='Directorio compartido con el coordinador (por defecto ML_FRAGMENTOS_DIR)'
+        )
+        parser.add_argument(
+            '--esperar',
+            type=int,
+            default=0,
+            help='Segundos que se siguen buscando fragmentos nuevos después del último '
+                 '(0 = termina cuando no hay pendientes)'
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        limite = time.monotonic() + options['esperar']
+
+        while True:
+            entrenados = 0
+            for directorio in planes_pendientes(options['directorio']):
+                cantidad = procesar_pendientes(directorio)
+                self.stdout.write(f"🧩 {directorio}: {cantidad} fragmentos entrenados")
+                entrenados += cantidad
+            total += entrenados
+
+            if entrenados:
+                limite = time.monotonic() + options['esperar']
+            elif time.monotonic() >= limite:
+                break
+            else:
+                time.sleep(1)
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Fragmentos entrenados: {total}"))
@@ -1,15 +1,73 @@
 """
 Comando Django para entrenar el modelo desde manage.py
-Uso: python manage.py entrenar_modelo
+Uso: python manage.py entrenar_modelo [--materializar-meses N] [--reconstruir-features]
+                                      [--evaluacion oob|cv|holdout]
+                                      [--ajustar-hiperparametros] [--presupuesto-busqueda SEG]
+                                      [--backend random_forest|extra_trees|hist_gradient_boosting]
+                                      [--tiempo-objetivo SEG] [--fragmentos N]
 """
 from django.core.management.base import BaseCommand
-from predicciones.ml_model import entrenar_y_guardar_modelo
+from predicciones.backends import BACKENDS
+from predicciones.features import AlmacenFeatures
+from predicciones.ml_model import EVALUACIONES, VentasPredictor, entrenar_y_guardar_modelo
 from predicciones.models import Detalle_Venta
 
 
 class Command(BaseCommand):
     help = 'Entrena el modelo de Random Forest con los datos de ventas'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--materializar-meses',
+            type=int,
+            default=None,
+            help='Meses futuros a precalcular en PronosticoMaterializado (0 = no precalcular)'
+        )
+        parser.add_argument(
+            '--reconstruir-features',
+            action='store_true',
+            help='Vuelve a extraer todas las ventas en el almacén de features y entrena '
+                 'desde el almacén (aunque ML_FEATURE_STORE esté desactivado)'
+        )
+        parser.add_argument(
+            '--evaluacion',
+            choices=EVALUACIONES,
+            default=None,
+            help='Estrategia de evaluación (por defecto ML_EVALUACION)'
+        )
+        parser.add_argument(
+            '--backend',
+            choices=list(BACKENDS),
+            default=None,
+            help='Algoritmo del modelo (por defecto ML_BACKEND)'
+        )
+        parser.add_argument(
+            '--tiempo-objetivo',
+            type=int,
+            default=None,
+            help='Segundos objetivo del ajuste: elige filas por árbol, árboles y profundidad '
+                 '(por defecto ML_TIEMPO_OBJETIVO_SEG)'
+        )
+        parser.add_argument(
+            '--fragmentos',
+            type=int,
+            default=None,
+            help='Reparte los árboles en N fragmentos entrenados por procesos o máquinas '
+                 'distintas (por defecto ML_FRAGMENTOS)'
+        )
+        parser.add_argument(
+            '--ajustar-hiperparametros',
+            action='store_true',
+            default=None,
+            help='Busca los hiperparámetros con successive halving antes de entrenar'
+        )
+        parser.add_argument(
+            '--presupuesto-busqueda',
+            type=int,
+            default=None,
+            help='Segundos máximos de la búsqueda (por defecto ML_BUSQUEDA_PRESUPUESTO_SEG)'
+        )
+
     def handle(self, *args, **options):
         self.stdout.write("=" * 60)
         self.stdout.write("ENTRENAMIENTO DEL MODELO RANDOM FOREST")
@@ -29,15 +87,66 @@ class Command(BaseCommand):
         self.stdout.write("\nIniciando entrenamiento...\n")
         
         try:
-            resultado = entrenar_y_guardar_modelo()
+            if options['reconstruir_features']:
+                AlmacenFeatures(VentasPredictor()).actualizar(reconstruir=True)
+            
+            resultado = entrenar_y_guardar_modelo(
+                materializar_meses=options['materializar_meses'],
+                evaluacion=options['evaluacion'],
+                ajustar_hiperparametros=options['ajustar_hiperparametros'],
+                presupuesto_busqueda=options['presupuesto_busqueda'],
+                backend=options['backend'],
+                tiempo_objetivo=options['tiempo_objetivo'],
+                fragmentos=options['fragmentos'],
+                # El almacén recién reconstruido se usa aunque ML_FEATURE_STORE sea False
+                feature_store=True if options['reconstruir_features'] else None
+            )
             
             self.stdout.write(self.style.SUCCESS("\n✅ Entrenamiento completado\n"))
             self.stdout.write("Métricas:")
             self.stdout.write(f"  R² Test: {resultado['metricas']['r2_test']:.4f}")
             self.stdout.write(f"  RMSE Test: {resultado['metricas']['rmse_test']:.4f}")
             self.stdout.write(f"  MAE Test: {resultado['metricas']['mae_test']:.4f}")
+            if 'oob_r2' in resultado['metricas']:
+                self.stdout.write(f"  OOB R²: {resultado['metricas']['oob_r2']:.4f}")
+            if 'cv_r2_mean' in resultado['metricas']:
+                self.stdout.write(f"  CV R² Mean: {resultado['metricas']['cv_r2_mean']:.4f}")
+            
+            self.stdout.write(f"\nTiempos ({resultado['evaluacion']}):")
+            for fase, segundos in resultado['tiempos'].items():
+                self.stdout.write(f"  {fase}: {segundos:.2f}s")
+            
+            self.stdout.write(f"\nHiperparámetros ({resultado['backend']}):")
+            for nombre, valor in resultado['hiperparametros'].items():
+                self.stdout.write(f"  {nombre}: {valor}")
+            if resultado['busqueda'] is not None:
+                busqueda = resultado['busqueda']
+                self.stdout.write(
+                    f"  Búsqueda: {busqueda['duracion_seg']:.1f}s de {busqueda['presupuesto_seg']}s, "
+                    f"{len(busqueda['rondas'])} rondas"
+                    + (" (presupuesto agotado)" if busqueda['agotado'] else "")
+                )
+            if resultado['presupuesto'] is not None:
+                presupuesto = resultado['presupuesto']
+                self.stdout.write(
+                    f"  Tiempo objetivo: {presupuesto['objetivo_seg']}s, ajuste proyectado "
+                    f"{presupuesto['proyectado_seg']:.1f}s, real {presupuesto['real_seg']:.1f}s "
+                    f"(calibración {presupuesto['calibracion']['segundos']:.1f}s)"
+                )
+            if resultado['fragmentos'] > 1:
+                self.stdout.write(f"  Fragmentos: {resultado['fragmentos']}")
+            self.stdout.write(
+                f"  Latencia: ajuste {resultado['latencia']['ajuste_seg']:.2f}s, predicción "
+                f"{resultado['latencia']['prediccion_ms']:.2f} ms por lote de "
+                f"{resultado['latencia']['filas_lote']} filas"
+            )
+            
+            if resultado['pronosticos_materializados']:
+                self.stdout.write(
+                    f"  Pronósticos materializados: {resultado['pronosticos_materializados']}"
+                )
             
-            self.stdout.write("\nModelo guardado en predicciones/ml_models/")
+            self.stdout.write(f"\nModelo guardado como versión {resultado['version']} en predicciones/ml_models/versiones/")
             
         except Exception as e:
             self.stdout.write(self.style.ERROR(f"\n❌ Error: {str(e)}"))
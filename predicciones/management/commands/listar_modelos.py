@@ -0,0 +1,35 @@
+"""
+Comando Django para listar las versiones guardadas del modelo
+Uso: python manage.py listar_modelos
+"""
+from django.core.management.base import BaseCommand
+from predicciones.registro import listar_versiones
+
+
+class Command(BaseCommand):
+    help = 'Lista las versiones del modelo guardadas en el registro'
+
+    def handle(self, *args, **options):
+        versiones = listar_versiones()
+        if not versiones:
+            self.stdout.write(self.style.WARNING("⚠️ No hay versiones guardadas"))
+            return
+
+        for item in versiones:
+            metadata = item['metadata']
+            marca = '*' if item['vigente'] else ' '
+
+            if metadata is None:
+                self.stdout.write(f"{marca} {item['version']}  (sin metadata)")
+                continue
+
+            self.stdout.write(
+                f"{marca} {item['version']}  "
+                f"{metadata.get('backend', 'random_forest')}  "
+                f"R² Test: {metadata['metricas'].get('r2_test', float('nan')):.4f}  "
+                f"Registros: {metadata['num_registros']}  "
+                f"Tamaño: {metadata['tamano_bytes'] / 1024 / 1024:.2f} MB  "
+                f"Carga: {metadata['tiempo_carga_seg']:.3f}s"
+            )
+
+        self.stdout.write("\n* = versión vigente")
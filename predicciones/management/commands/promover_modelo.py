@@ -0,0 +1,26 @@
+"""
+Comando Django para publicar una versión guardada del modelo
+Uso: python manage.py promover_modelo <version> [--sin-verificar]
+"""
+from django.core.management.base import BaseCommand, CommandError
+from predicciones.registro import promover_version
+
+
+class Command(BaseCommand):
+    help = 'Publica una versión guardada del modelo como la vigente'
+
+    def add_arguments(self, parser):
+        parser.add_argument('version', help='Versión a publicar (ver listar_modelos)')
+        parser.add_argument(
+            '--sin-verificar',
+            action='store_true',
+            help='No comprobar los checksums de los artefactos antes de publicar'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            promover_version(options['version'], verificar=not options['sin_verificar'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Versión vigente: {options['version']}"))
@@ -0,0 +1,18 @@
+"""
+Comando Django para volver a la versión anterior del modelo
+Uso: python manage.py revertir_modelo
+"""
+from django.core.management.base import BaseCommand, CommandError
+from predicciones.registro import revertir_version
+
+
+class Command(BaseCommand):
+    help = 'Vuelve a publicar la versión del modelo anterior a la vigente'
+
+    def handle(self, *args, **options):
+        try:
+            version = revertir_version()
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Versión vigente: {version}"))
@@ -0,0 +1,81 @@
+"""
+Módulo para reportar el uso de memoria del proceso (worker)
+"""
+import os
+
+from django.conf import settings
+
+
+CAMPOS_SMAPS = ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty')
+
+
+def _leer_smaps(ruta):
+    """
+    Suma los campos de memoria de /proc/<pid>/smaps por archivo mapeado
+
+    Returns:
+        dict {ruta_archivo o '': {campo: kB}}
+    """
+    mapeos = {}
+    actual = None
+
+    with open(ruta) as archivo:
+        for linea in archivo:
+            partes = linea.split()
+            if not partes:
+                continue
+
+            if not partes[0].endswith(':'):
+                # Encabezado de un mapeo: "inicio-fin permisos offset dev inodo [ruta]"
+                ruta_mapeo = partes[5] if len(partes) > 5 else ''
+                actual = mapeos.setdefault(ruta_mapeo, dict.fromkeys(CAMPOS_SMAPS, 0))
+            elif actual is not None and partes[0][:-1] in CAMPOS_SMAPS:
+                actual[partes[0][:-1]] += int(partes[1])
+
+    return mapeos
+
+
+def _resumen(campos):
+    return {
+        'rss_mb': round(campos['Rss'] / 1024, 2),
+        'pss_mb': round(campos['Pss'] / 1024, 2),
+        'privada_mb': round((campos['Private_Clean'] + campos['Private_Dirty']) / 1024, 2),
+        'compartida_mb': round((campos['Shared_Clean'] + campos['Shared_Dirty']) / 1024, 2),
+    }
+
+
+def reporte_memoria():
+    """
+    Reporta la memoria única (privada) y compartida del proceso actual, y la
+    de los archivos del modelo mapeados en memoria
+
+    La memoria compartida de los archivos del modelo es la que se reparte
+    entre todos los workers del host; PSS asigna a cada proceso su parte.
+
+    Returns:
+        dict con el reporte, o None si el sistema no expone /proc/self/smaps
+    """
+    ruta_smaps = '/proc/self/smaps'
+    if not os.path.exists(ruta_smaps):
+        return None
+
+    mapeos = _leer_smaps(ruta_smaps)
+
+    total = dict.fromkeys(CAMPOS_SMAPS, 0)
+    modelo = dict.fromkeys(CAMPOS_SMAPS, 0)
+    archivos_modelo = 0
+    directorio_modelo = os.path.realpath(settings.ML_MODELS_DIR)
+
+    for ruta, campos in mapeos.items():
+        for campo, valor in campos.items():
+            total[campo] += valor
+        if ruta.startswith(directorio_modelo):
+            archivos_modelo += 1
+            for campo, valor in campos.items():
+                modelo[campo] += valor
+
+    return {
+        'pid': os.getpid(),
+        'proceso': _resumen(total),
+        'modelo': dict(_resumen(modelo), archivos_mapeados=archivos_modelo),
+    }
@@ -0,0 +1,168 @@
+# Generated by Django 5.2.8 on 2026-10-17 02:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Categoria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=100)),
+                ('descripcion', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'products_categoria',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Usuario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('correo', models.EmailField(max_length=255, unique=True)),
+                ('password', models.CharField(max_length=128)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('fcm_token', models.CharField(blank=True, max_length=255, null=True)),
+            ],
+            options={
+                'db_table': 'users_usuario',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Detalle_Venta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.PositiveIntegerField()),
+                ('precio_unitario', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('subtotal', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'sales_detalleventa',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Garantia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cobertura', models.IntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'products_garantia',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Marca',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'products_marca',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='MetodoPago',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=100)),
+                ('descripcion', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('estado', models.BooleanField(default=True)),
+            ],
+            options={
+                'db_table': 'sales_metodopago',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='NotaVenta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('pagada', 'Pagada'), ('fallida', 'Fallida'), ('cancelada', 'Cancelada'), ('reembolsada', 'Reembolsada')], default='pendiente', max_length=20)),
+                ('total', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('stripe_session_id', models.CharField(blank=True, max_length=255, null=True)),
+                ('stripe_payment_intent', models.CharField(blank=True, max_length=255, null=True)),
+            ],
+            options={
+                'db_table': 'sales_notaventa',
+                'ordering': ['-created_at'],
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Producto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=200)),
+                ('descripcion', models.TextField()),
+                ('precio', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('stock', models.IntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'products_producto',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Cliente',
+            fields=[
+                ('usuario', models.OneToOneField(db_column='id', on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='predicciones.usuario')),
+                ('apellidoMaterno', models.CharField(max_length=100)),
+                ('apellidoPaterno', models.CharField(max_length=100)),
+                ('nombres', models.CharField(max_length=100)),
+                ('ci', models.CharField(max_length=20)),
+                ('telefono', models.CharField(blank=True, max_length=20, null=True)),
+            ],
+            options={
+                'db_table': 'users_cliente',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='PronosticoMaterializado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version_modelo', models.CharField(max_length=32)),
+                ('mes', models.PositiveSmallIntegerField()),
+                ('anio', models.PositiveSmallIntegerField()),
+                ('prediccion', models.FloatField()),
+                ('intervalo_inferior', models.FloatField()),
+                ('intervalo_superior', models.FloatField()),
+                ('intervalo_std', models.FloatField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('producto', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='pronosticos', to='predicciones.producto')),
+            ],
+            options={
+                'db_table': 'predicciones_pronosticomaterializado',
+                'indexes': [models.Index(fields=['version_modelo', 'anio', 'mes', '-prediccion'], name='pronostico_top_idx')],
+                'constraints': [models.UniqueConstraint(fields=('version_modelo', 'producto', 'anio', 'mes'), name='pronostico_unico_por_version')],
+            },
+        ),
+    ]
@@ -1,19 +1,92 @@
 """
-Módulo para entrenar el modelo de Random Forest para predicción de ventas
+Módulo para entrenar el modelo de predicción de ventas (Random Forest por defecto)
 """
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestRegressor
 from sklearn.model_selection import train_test_split, cross_val_score
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_error
 import joblib
 import os
+import time
+from itertools import islice
 from django.conf import settings
 from django.db.models import Sum, Count, F
+from django.db.models.functions import ExtractIsoWeekDay, ExtractMonth, ExtractQuarter, ExtractYear
 from datetime import datetime
 
 from .models import NotaVenta, Detalle_Venta, Producto
+from .backends import BACKENDS, crear_estimador, entrenar_estimador, es_bosque, validar_backend
+from .bosque_compilado import BosqueCompilado
+from .busqueda import buscar_hiperparametros, medir_latencia
+from .fragmentos import entrenar_fragmentado
+from .presupuesto import planificar_ajuste
+from .cuantiles import EstadisticasHojas
+from .registro import (
+    calcular_checksums, eliminar_versiones_antiguas, escribir_metadata, leer_metadata,
+    leer_version_actual, publicar_version, ruta_temporal, ruta_version
+)
+
+
+# Estrategias de evaluación del modelo entrenado:
+# - 'oob': métricas out-of-bag del mismo bosque (sin entrenamientos extra)
+# - 'cv': validación cruzada de 5 particiones (entrena 5 bosques más)
+# - 'holdout': solo las métricas sobre el conjunto de prueba
+EVALUACIONES = ('oob', 'cv', 'holdout')
+
+# Columnas del DataFrame de features agregadas por producto y periodo
+COLUMNAS_FEATURES = [
+    'producto_id', 'mes', 'anio', 'cantidad_vendida', 'subtotal_venta',
+    'producto_precio', 'producto_categoria_id', 'producto_marca_id',
+    'trimestre', 'dia_semana'
+]
+
+
+def moda_por_grupo(grupos, valores, n_grupos, n_valores=7):
+    """
+    Valor más frecuente de cada grupo, con el menor valor en caso de empate
+    (la misma regla que Series.mode().iloc[0])
+    
+    Args:
+        grupos: Número de grupo de cada fila (0 .. n_grupos - 1)
+        valores: Valor de cada fila (0 .. n_valores - 1), p. ej. el día de la semana
+        n_grupos: Cantidad de grupos
+    
+    Returns:
+        np.ndarray con la moda de cada grupo
+    """
+    conteos = np.bincount(
+        grupos * n_valores + valores, minlength=n_grupos * n_valores
+    ).reshape(n_grupos, n_valores)
+    # argmax devuelve la primera posición máxima: el menor valor empatado
+    return conteos.argmax(axis=1)
+
+
+def indice_periodo(anio, mes):
+    """
+    Número de mes consecutivo de un periodo (anio, mes), para comparar y restar periodos
+    """
+    return anio * 12 + mes - 1
+
+
+def normalizar_features(df):
+    """
+    Deja las features agregadas con columnas y tipos fijos, sin importar el
+    modo de extracción (enteros int64 y montos float64)
+    """
+    df = df[COLUMNAS_FEATURES].copy()
+    df['producto_categoria_id'] = df['producto_categoria_id'].fillna(0)
+    df['producto_marca_id'] = df['producto_marca_id'].fillna(0)
+    
+    for columna in COLUMNAS_FEATURES:
+        tipo = np.float64 if columna in ('subtotal_venta', 'producto_precio') else np.int64
+        df[columna] = df[columna].astype(tipo)
+    
+    # Montos con dos decimales (DecimalField): la suma en float se redondea
+    # para que coincida con la suma exacta que hace la base de datos
+    df['subtotal_venta'] = df['subtotal_venta'].round(2)
+    
+    return df.reset_index(drop=True)
 
 
 class VentasPredictor:
@@ -21,46 +94,233 @@ class VentasPredictor:
     Clase para entrenar y gestionar el modelo de predicción de ventas
     """
     
-    def __init__(self):
+    def __init__(self, registrar_cuantiles=None, evaluacion=None,
+                 ajustar_hiperparametros=None, presupuesto_busqueda=None, backend=None,
+                 tiempo_objetivo=None, fragmentos=None, n_jobs=None, feature_store=None):
         self.model = None
+        self.bosque_compilado = None
+        self.estadisticas_hojas = None
+        # Si es True, guarda la distribución de ventas de cada hoja al entrenar
+        if registrar_cuantiles is None:
+            registrar_cuantiles = settings.ML_REGISTRAR_CUANTILES
+        self.registrar_cuantiles = registrar_cuantiles
+        # Estrategia de evaluación: 'oob', 'cv' o 'holdout' (ver EVALUACIONES)
+        evaluacion = evaluacion or settings.ML_EVALUACION
+        if evaluacion not in EVALUACIONES:
+            raise ValueError(f"Evaluación desconocida: {evaluacion}")
+        self.evaluacion = evaluacion
+        # Algoritmo de entrenamiento (ver backends.BACKENDS)
+        self.backend = validar_backend(backend or settings.ML_BACKEND)
+        # Si es True, elige los hiperparámetros con successive halving al entrenar
+        if ajustar_hiperparametros is None:
+            ajustar_hiperparametros = settings.ML_AJUSTAR_HIPERPARAMETROS
+        self.ajustar_hiperparametros = ajustar_hiperparametros
+        self.presupuesto_busqueda = presupuesto_busqueda
+        # Segundos objetivo del ajuste; elige filas por árbol, árboles y
+        # profundidad con una calibración (0 o None = sin límite)
+        if tiempo_objetivo is None:
+            tiempo_objetivo = settings.ML_TIEMPO_OBJETIVO_SEG
+        self.tiempo_objetivo = tiempo_objetivo
+        self.presupuesto = None
+        # Fragmentos en los que se reparten los árboles del bosque entre
+        # procesos o máquinas (1 = entrenamiento en un solo proceso)
+        self.fragmentos = fragmentos or settings.ML_FRAGMENTOS
+        # Núcleos del ajuste y de la validación cruzada (-1 = todos)
+        self.n_jobs = n_jobs or settings.ML_ENTRENAMIENTO_N_JOBS
+        # Si es True, las features de entrenamiento salen del almacén incremental
+        if feature_store is None:
+            feature_store = settings.ML_FEATURE_STORE
+        self.feature_store = feature_store
+        self.hiperparametros = dict(BACKENDS[self.backend]['hiperparametros'])
+        self.busqueda = None
+        self.latencia = None
+        # Último periodo (anio, mes) de los datos de entrenamiento
+        self.periodo_final = None
+        # Resumen de la actualización incremental (None si se entrenó desde cero)
+        self.incremental = None
+        self.tiempos = {}
         self.scaler = StandardScaler()
         self.feature_names = []
-        self.model_path = os.path.join(settings.ML_MODELS_DIR, 'modelo_rf.pkl')
-        self.scaler_path = os.path.join(settings.ML_MODELS_DIR, 'scaler.pkl')
+        self.version = None
+        self.metricas = None
+        self.num_registros = None
+        self._usar_directorio(settings.ML_MODELS_DIR)
+    
+    def _usar_directorio(self, directorio):
+        """
+        Apunta las rutas de los artefactos a un directorio de modelo
+        """
+        self.directorio = directorio
+        self.model_path = os.path.join(directorio, 'modelo_rf.pkl')
+        self.gradiente_path = os.path.join(directorio, 'modelo_gb.pkl')
+        self.scaler_path = os.path.join(directorio, 'scaler.pkl')
+        self.feature_names_path = os.path.join(directorio, 'feature_names.pkl')
+        self.compilado_path = os.path.join(directorio, 'modelo_rf_compilado')
+        self.cuantiles_path = os.path.join(directorio, 'cuantiles_hojas')
         
-    def extraer_features_ventas(self):
+    def extraer_features_ventas(self, incremental=None):
         """
         Extrae features de las ventas históricas desde la base de datos
+        
+        Args:
+            incremental: Si True, usa el almacén de features y solo lee de la
+                base de datos las ventas nuevas o modificadas desde la última
+                extracción. Si es None usa la opción del predictor
+                (ML_FEATURE_STORE por defecto)
+        """
+        if incremental is None:
+            incremental = self.feature_store
+        
+        if incremental:
+            from .features import AlmacenFeatures
+            return AlmacenFeatures(self).actualizar()
+        
+        features = self.extraer_agregados()
+        
+        if features.empty:
+            raise ValueError("No hay datos de ventas disponibles para entrenar el modelo")
+        
+        return features
+    
+    def extraer_agregados(self, modo=None, **filtros):
+        """
+        Agrega las ventas pagadas por producto y periodo (mes, anio)
+        
+        Args:
+            modo: 'sql' agrupa en la base de datos y solo trae filas agregadas;
+                'pandas' trae cada detalle y agrupa en Python. Si es None usa
+                ML_EXTRACCION_MODO. Ambos modos devuelven el mismo DataFrame
+            **filtros: Filtros adicionales del QuerySet de Detalle_Venta
+        """
+        modo = modo or settings.ML_EXTRACCION_MODO
+        
+        if modo == 'sql':
+            features = self.agregar_en_sql(**filtros)
+        elif modo == 'pandas':
+            features = self.agregar_features(self.consultar_detalles(**filtros))
+        else:
+            raise ValueError(f"Modo de extracción desconocido: {modo}")
+        
+        return normalizar_features(features)
+    
+    def agregar_en_sql(self, **filtros):
         """
-        from django.db.models import F
+        Agrega los detalles de ventas en la base de datos
         
-        # Obtener datos de ventas pagadas optimizado
-        detalles = Detalle_Venta.objects.filter(
-            nota_venta__estado='pagada'
-        ).select_related(
-            'producto', 
-            'producto__categoria', 
-            'producto__marca',
-            'nota_venta'
+        La consulta agrupa por producto, mes, anio y día de la semana, así que
+        devuelve como máximo 7 filas por grupo. La moda del día de la semana se
+        elige después con la misma regla que safe_mode: el día con más detalles
+        y, si hay empate, el menor.
+        """
+        fecha = 'nota_venta__created_at'
+        filas = Detalle_Venta.objects.filter(
+            nota_venta__estado='pagada', **filtros
+        ).annotate(
+            mes=ExtractMonth(fecha),
+            anio=ExtractYear(fecha),
+            trimestre=ExtractQuarter(fecha),
+            dia_iso=ExtractIsoWeekDay(fecha)
         ).values(
-            'producto_id',
-            'producto__nombre',
+            'producto_id', 'mes', 'anio', 'trimestre', 'dia_iso',
             producto_precio=F('producto__precio'),
             producto_categoria_id=F('producto__categoria_id'),
-            producto_marca_id=F('producto__marca_id'),
-            fecha_venta=F('nota_venta__created_at'),
-            cantidad_vendida=F('cantidad'),
-            subtotal_venta=F('subtotal')
-        )
+            producto_marca_id=F('producto__marca_id')
+        ).annotate(
+            cantidad_vendida=Sum('cantidad'),
+            subtotal_venta=Sum('subtotal'),
+            detalles=Count('id')
+        ).order_by()
+        
+        df = pd.DataFrame(list(filas))
+        if df.empty:
+            return pd.DataFrame(columns=COLUMNAS_FEATURES)
+        
+        # ISO: lunes = 1; pandas (dayofweek): lunes = 0
+        df['dia_semana'] = df['dia_iso'] - 1
+        
+        claves = ['producto_id', 'mes', 'anio']
+        features = df.groupby(claves).agg({
+            'cantidad_vendida': 'sum',
+            'subtotal_venta': 'sum',
+            'producto_precio': 'first',
+            'producto_categoria_id': 'first',
+            'producto_marca_id': 'first',
+            'trimestre': 'first'
+        }).reset_index()
+        
+        # Moda: más detalles primero y, en empate, el día menor
+        modas = df.sort_values(
+            claves + ['detalles', 'dia_semana'],
+            ascending=[True, True, True, False, True]
+        ).drop_duplicates(claves)[claves + ['dia_semana']]
+        
+        return features.merge(modas, on=claves)
+    
+    def consultar_detalles(self, **filtros):
+        """
+        Obtiene los detalles de ventas pagadas como DataFrame (una fila por detalle)
+        
+        Las filas se leen por partes de ML_EXTRACCION_CHUNK con un cursor del
+        lado del servidor y se copian a columnas de NumPy con tipo fijo,
+        reservadas de antemano con un COUNT. Nunca se arma la lista completa
+        de diccionarios, así que el pico de memoria es el de las columnas.
+        
+        Args:
+            **filtros: Filtros adicionales del QuerySet de Detalle_Venta
+        """
+        detalles = Detalle_Venta.objects.filter(nota_venta__estado='pagada', **filtros)
+        total = detalles.count()
         
-        # Convertir QuerySet a lista
-        ventas_data = list(detalles)
+        columnas = {
+            'producto_id': np.empty(total, dtype=np.int64),
+            'producto_precio': np.empty(total, dtype=np.float64),
+            'producto_categoria_id': np.empty(total, dtype=np.int64),
+            'producto_marca_id': np.empty(total, dtype=np.int64),
+            'fecha_venta': np.empty(total, dtype='datetime64[ns]'),
+            'cantidad_vendida': np.empty(total, dtype=np.int64),
+            'subtotal_venta': np.empty(total, dtype=np.float64),
+        }
+        
+        filas = detalles.values_list(
+            'producto_id', 'producto__precio', 'producto__categoria_id',
+            'producto__marca_id', 'nota_venta__created_at', 'cantidad', 'subtotal'
+        ).order_by().iterator(chunk_size=settings.ML_EXTRACCION_CHUNK)
         
-        # Convertir a DataFrame
-        df = pd.DataFrame(ventas_data)
+        inicio = 0
+        while True:
+            lote = list(islice(filas, settings.ML_EXTRACCION_CHUNK))
+            if not lote:
+                break
+            
+            fin = inicio + len(lote)
+            if fin > len(columnas['producto_id']):
+                # Llegaron ventas nuevas después del COUNT
+                capacidad = max(fin, 2 * len(columnas['producto_id']))
+                for nombre, columna in columnas.items():
+                    ampliada = np.empty(capacidad, dtype=columna.dtype)
+                    ampliada[:inicio] = columna[:inicio]
+                    columnas[nombre] = ampliada
+            
+            producto, precio, categoria, marca, fecha, cantidad, subtotal = zip(*lote)
+            columnas['producto_id'][inicio:fin] = producto
+            columnas['producto_precio'][inicio:fin] = np.array(precio, dtype=np.float64)
+            columnas['producto_categoria_id'][inicio:fin] = [c or 0 for c in categoria]
+            columnas['producto_marca_id'][inicio:fin] = [m or 0 for m in marca]
+            columnas['fecha_venta'][inicio:fin] = pd.to_datetime(list(fecha), utc=True).tz_localize(None)
+            columnas['cantidad_vendida'][inicio:fin] = cantidad
+            columnas['subtotal_venta'][inicio:fin] = np.array(subtotal, dtype=np.float64)
+            inicio = fin
         
+        df = pd.DataFrame({nombre: columna[:inicio] for nombre, columna in columnas.items()})
+        df['fecha_venta'] = df['fecha_venta'].dt.tz_localize('UTC')
+        return df
+    
+    def agregar_features(self, df):
+        """
+        Agrega los detalles de ventas por producto y periodo (mes, anio)
+        """
         if df.empty:
-            raise ValueError("No hay datos de ventas disponibles para entrenar el modelo")
+            return pd.DataFrame(columns=COLUMNAS_FEATURES)
         
         # Rellenar valores nulos
         df['producto_categoria_id'] = df['producto_categoria_id'].fillna(0)
@@ -74,24 +334,22 @@ class VentasPredictor:
         df['dia_mes'] = df['fecha'].dt.day
         df['trimestre'] = df['fecha'].dt.quarter
         
-        # Función auxiliar para obtener la moda de forma segura
-        def safe_mode(x):
-            if len(x) == 0:
-                return 0
-            mode_result = x.mode()
-            return mode_result.iloc[0] if len(mode_result) > 0 else x.iloc[0]
-        
         # Agregar por producto y periodo
-        features = df.groupby(['producto_id', 'mes', 'anio']).agg({
+        grupos = df.groupby(['producto_id', 'mes', 'anio'])
+        features = grupos.agg({
             'cantidad_vendida': 'sum',
             'subtotal_venta': 'sum',
             'producto_precio': 'first',
             'producto_categoria_id': 'first',
             'producto_marca_id': 'first',
-            'trimestre': 'first',
-            'dia_semana': safe_mode
+            'trimestre': 'first'
         }).reset_index()
         
+        # Día de la semana más frecuente de cada grupo
+        features['dia_semana'] = moda_por_grupo(
+            grupos.ngroup().to_numpy(), df['dia_semana'].to_numpy(), len(features)
+        )
+        
         return features
     
     def preparar_datos(self, df):
@@ -113,16 +371,39 @@ class VentasPredictor:
         
         return X, y
     
-    def entrenar_modelo(self, test_size=0.2, random_state=42):
+    def entrenar_modelo(self, test_size=0.2, random_state=42, reportar=None):
         """
         Entrena el modelo Random Forest
+        
+        Args:
+            reportar: Función opcional reportar(fase, progreso) para informar el
+                avance (progreso entre 0 y 1)
         """
+        reportar = reportar or _sin_reporte
+        self.tiempos = {}
+        inicio = time.perf_counter()
+        
+        if self.evaluacion == 'oob' and not BACKENDS[self.backend]['oob']:
+            print(f"⚠️ {self.backend} no admite evaluación out-of-bag: se usa 'holdout'")
+            self.evaluacion = 'holdout'
+        
+        if self.tiempo_objetivo and not BACKENDS[self.backend]['submuestreo']:
+            raise ValueError(f"{self.backend} no admite entrenamiento con tiempo objetivo")
+        
+        if self.fragmentos > 1 and not es_bosque(self.backend):
+            raise ValueError(f"{self.backend} no admite entrenamiento en fragmentos")
+        
+        reportar('extraccion', 0.05)
         print("🔄 Extrayendo datos de ventas...")
         df = self.extraer_features_ventas()
+        self.tiempos['extraccion'] = time.perf_counter() - inicio
         
         print(f"📊 Total de registros: {len(df)}")
+        self.num_registros = len(df)
+        self.periodo_final = self._periodo_final(df)
         
         # Preparar datos
+        reportar('preparacion', 0.15)
         X, y = self.preparar_datos(df)
         
         # Dividir en train y test
@@ -134,21 +415,89 @@ class VentasPredictor:
         X_train_scaled = self.scaler.fit_transform(X_train)
         X_test_scaled = self.scaler.transform(X_test)
         
-        print("🤖 Entrenando modelo Random Forest...")
+        # Búsqueda de hiperparámetros (solo con el conjunto de entrenamiento)
+        self.busqueda = None
+        if self.ajustar_hiperparametros:
+            reportar('busqueda', 0.2)
+            inicio_fase = time.perf_counter()
+            self.busqueda = buscar_hiperparametros(
+                X_train_scaled, y_train, self.backend, BACKENDS[self.backend]['hiperparametros'],
+                random_state=random_state,
+                presupuesto_seg=self.presupuesto_busqueda
+            )
+            if self.busqueda is not None:
+                self.hiperparametros = self.busqueda.pop('hiperparametros')
+            self.tiempos['busqueda'] = time.perf_counter() - inicio_fase
         
-        # Configurar y entrenar Random Forest
-        self.model = RandomForestRegressor(
-            n_estimators=100,
-            max_depth=20,
-            min_samples_split=5,
-            min_samples_leaf=2,
-            random_state=random_state,
-            n_jobs=-1
-        )
+        # Tamaño del bosque según el tiempo objetivo
+        self.presupuesto = None
+        if self.tiempo_objetivo:
+            reportar('calibracion', 0.4)
+            inicio_fase = time.perf_counter()
+            self.presupuesto = planificar_ajuste(
+                X_train_scaled, y_train, self.backend, self.hiperparametros,
+                self.tiempo_objetivo,
+                n_jobs=self.n_jobs,
+                random_state=random_state
+            )
+            self.hiperparametros = self.presupuesto.pop('hiperparametros')
+            self.tiempos['calibracion'] = time.perf_counter() - inicio_fase
+        
+        reportar('entrenamiento', 0.45 if self.ajustar_hiperparametros or self.tiempo_objetivo else 0.2)
+        print(f"🤖 Entrenando modelo ({self.backend})...")
+        inicio_fase = time.perf_counter()
+        
+        if self.fragmentos > 1:
+            self.model = entrenar_fragmentado(
+                self.backend, self.hiperparametros, X_train_scaled, y_train,
+                self.fragmentos,
+                random_state=random_state,
+                n_jobs=self.n_jobs,
+                oob_score=self.evaluacion == 'oob'
+            )
+        else:
+            self.model = entrenar_estimador(
+                self.backend, self.hiperparametros, X_train_scaled, y_train,
+                random_state=random_state,
+                n_jobs=self.n_jobs,
+                # Las predicciones out-of-bag se calculan durante el ajuste
+                oob_score=self.evaluacion == 'oob',
+                percentiles=settings.ML_INTERVALO_PERCENTILES
+            )
+        if self.presupuesto is not None:
+            self.presupuesto['real_seg'] = round(time.perf_counter() - inicio_fase, 3)
+            print(f"⏱️ Ajuste: proyectado {self.presupuesto['proyectado_seg']:.1f}s, "
+                  f"real {self.presupuesto['real_seg']:.1f}s "
+                  f"(objetivo {self.tiempo_objetivo}s con calibración)")
+        # El formato compilado y las estadísticas por hoja solo aplican a bosques
+        self.bosque_compilado = None
+        if es_bosque(self.backend):
+            self.bosque_compilado = BosqueCompilado.desde_modelo(self.model)
+        self.tiempos['ajuste'] = time.perf_counter() - inicio_fase
+        
+        # Latencia de predicción del modelo que se sirve con un lote de prueba
+        self.latencia = {
+            'ajuste_seg': round(self.tiempos['ajuste'], 3),
+            'prediccion_ms': round(medir_latencia(
+                self.bosque_compilado or self.model, X_test_scaled, settings.ML_LATENCIA_LOTE_FILAS
+            ), 3),
+            'filas_lote': settings.ML_LATENCIA_LOTE_FILAS,
+            'profundidad': self.bosque_compilado.profundidad if self.bosque_compilado else None
+        }
         
-        self.model.fit(X_train_scaled, y_train)
+        # Estadísticas por hoja para intervalos por cuantiles
+        self.estadisticas_hojas = None
+        if self.registrar_cuantiles and self.bosque_compilado is not None:
+            reportar('estadisticas_hojas', 0.55)
+            inicio_fase = time.perf_counter()
+            self.estadisticas_hojas = EstadisticasHojas.desde_entrenamiento(
+                self.bosque_compilado, X_train_scaled, y_train
+            )
+            self.tiempos['estadisticas_hojas'] = time.perf_counter() - inicio_fase
         
         # Evaluar modelo
+        reportar('evaluacion', 0.6)
+        inicio_fase = time.perf_counter()
         y_pred_train = self.model.predict(X_train_scaled)
         y_pred_test = self.model.predict(X_test_scaled)
         
@@ -161,70 +510,525 @@ class VentasPredictor:
             'mae_test': mean_absolute_error(y_test, y_pred_test),
         }
         
-        # Cross-validation
-        cv_scores = cross_val_score(
-            self.model, X_train_scaled, y_train, 
-            cv=5, scoring='r2', n_jobs=-1
-        )
-        metricas['cv_r2_mean'] = cv_scores.mean()
-        metricas['cv_r2_std'] = cv_scores.std()
+        if self.evaluacion == 'oob':
+            # Cada fila evaluada solo con los árboles que no la usaron: una
+            # estimación de generalización sin volver a entrenar
+            y_oob = self.model.oob_prediction_
+            validas = np.isfinite(y_oob)
+            metricas['oob_r2'] = r2_score(y_train[validas], y_oob[validas])
+            metricas['oob_rmse'] = np.sqrt(mean_squared_error(y_train[validas], y_oob[validas]))
+            metricas['oob_mae'] = mean_absolute_error(y_train[validas], y_oob[validas])
+        elif self.evaluacion == 'cv':
+            # Cross-validation (entrena 5 modelos más, sin los de los intervalos)
+            reportar('validacion_cruzada', 0.65)
+            cv_scores = cross_val_score(
+                crear_estimador(
+                    self.backend, self.hiperparametros,
+                    random_state=random_state, n_jobs=self.n_jobs
+                ),
+                X_train_scaled, y_train, 
+                cv=5, scoring='r2', n_jobs=self.n_jobs
+            )
+            metricas['cv_r2_mean'] = cv_scores.mean()
+            metricas['cv_r2_std'] = cv_scores.std()
+        
+        self.tiempos['evaluacion'] = time.perf_counter() - inicio_fase
+        self.tiempos['total'] = time.perf_counter() - inicio
         
         print(f"✅ Modelo entrenado!")
         print(f"   R² Test: {metricas['r2_test']:.4f}")
         print(f"   RMSE Test: {metricas['rmse_test']:.4f}")
         print(f"   MAE Test: {metricas['mae_test']:.4f}")
+        print(f"   Evaluación: {self.evaluacion} ({self.tiempos['evaluacion']:.2f}s, "
+              f"total {self.tiempos['total']:.2f}s)")
+        print(f"   Predicción: {self.latencia['prediccion_ms']:.2f} ms por lote de "
+              f"{self.latencia['filas_lote']} filas")
+        
+        self.metricas = metricas
+        return metricas
+    
+    @staticmethod
+    def _periodo_final(df):
+        """
+        Último periodo [anio, mes] de las features
+        """
+        periodo = int(indice_periodo(df['anio'], df['mes']).max())
+        return [periodo // 12, periodo % 12 + 1]
+    
+    def actualizar_modelo(self, arboles=None, retirar=None, meses=None, comparar=False,
+                          test_size=0.2, random_state=42, reportar=None):
+        """
+        Actualiza el modelo vigente con árboles nuevos en lugar de entrenarlo desde cero
+        
+        Carga el bosque vigente y le agrega `arboles` árboles con warm_start,
+        entrenados solo con las filas de los últimos `meses` periodos y las
+        filas nuevas desde el modelo anterior (las de su último periodo en
+        adelante). Si `retirar` es True, descarta la misma cantidad de árboles
+        más antiguos para que el bosque conserve su tamaño. Se reutiliza el
+        scaler del modelo vigente: los árboles viejos esperan la misma escala.
+        
+        Una parte de las filas nuevas se aparta para evaluar: ningún árbol las
+        vio, salvo las del último periodo del modelo anterior, que ya estaba
+        empezado cuando se entrenó.
+        
+        Args:
+            arboles: Árboles nuevos (por defecto ML_INCREMENTAL_ARBOLES)
+            retirar: Descartar los árboles más antiguos (por defecto ML_INCREMENTAL_RETIRAR)
+            meses: Periodos recientes con los que se entrenan los árboles nuevos
+                (por defecto ML_INCREMENTAL_MESES)
+            comparar: Si True, entrena también un bosque desde cero con las
+                mismas filas y compara las métricas y el tiempo de ajuste
+            reportar: Función opcional reportar(fase, progreso) para informar el avance
+        
+        Returns:
+            dict con las métricas del modelo actualizado
+        """
+        reportar = reportar or _sin_reporte
+        arboles = arboles or settings.ML_INCREMENTAL_ARBOLES
+        retirar = settings.ML_INCREMENTAL_RETIRAR if retirar is None else retirar
+        meses = meses or settings.ML_INCREMENTAL_MESES
+        self.tiempos = {}
+        inicio = time.perf_counter()
+        
+        reportar('carga', 0.05)
+        self.cargar_modelo()
+        base = leer_metadata(self.version) or {}
+        self.backend = base.get('backend', 'random_forest')
+        if not es_bosque(self.backend):
+            raise ValueError(f"{self.backend} no admite actualización incremental")
+        self.hiperparametros = base.get('hiperparametros') or {
+            nombre: self.model.get_params()[nombre]
+            for nombre in BACKENDS[self.backend]['hiperparametros']
+        }
+        anterior = base.get('incremental') or {}
+        periodo_base = base.get('periodo_final')
+        if periodo_base is None:
+            # Modelos guardados antes de registrar el periodo final
+            fecha = datetime.fromisoformat(base['fecha_entrenamiento']) if base else datetime.now()
+            periodo_base = [fecha.year, fecha.month]
+        self.tiempos['carga'] = time.perf_counter() - inicio
+        
+        reportar('extraccion', 0.1)
+        inicio_fase = time.perf_counter()
+        print("🔄 Extrayendo datos de ventas...")
+        df = self.extraer_features_ventas()
+        self.num_registros = len(df)
+        self.periodo_final = self._periodo_final(df)
+        self.tiempos['extraccion'] = time.perf_counter() - inicio_fase
         
+        X, y = self.preparar_datos(df)
+        X_scaled = self.scaler.transform(X)
+        periodos = indice_periodo(df['anio'], df['mes']).to_numpy()
+        nuevas = periodos >= indice_periodo(*periodo_base)
+        ventana = nuevas | (periodos > indice_periodo(*self.periodo_final) - meses)
+        
+        # Filas de evaluación: una parte de las nuevas
+        evaluacion = np.zeros(len(df), dtype=bool)
+        if nuevas.sum() >= 2:
+            _, indices_test = train_test_split(
+                np.flatnonzero(nuevas), test_size=test_size, random_state=random_state
+            )
+            evaluacion[indices_test] = True
+        else:
+            print(f"⚠️ No hay ventas nuevas desde el periodo {periodo_base[1]}/{periodo_base[0]} "
+                  f"del modelo {self.version}: se actualiza sin evaluación")
+        entrenamiento = ventana & ~evaluacion
+        if not entrenamiento.any():
+            raise ValueError("No hay filas recientes para entrenar los árboles nuevos")
+        
+        print(f"📊 {entrenamiento.sum()} filas de los últimos {meses} periodos para "
+              f"{arboles} árboles nuevos ({nuevas.sum()} filas nuevas, "
+              f"{evaluacion.sum()} de evaluación)")
+        
+        reportar('entrenamiento', 0.2)
+        print(f"🌱 Agregando {arboles} árboles al modelo {self.version} ({self.backend})...")
+        inicio_fase = time.perf_counter()
+        n_previos = len(self.model.estimators_)
+        max_samples_base = max_samples = self.model.max_samples
+        if isinstance(max_samples, int):
+            max_samples = min(max_samples, int(entrenamiento.sum()))
+        # Semilla distinta en cada actualización: con el mismo random_state
+        # warm_start repetiría las semillas de la actualización anterior
+        actualizaciones = anterior.get('actualizaciones', 0) + 1
+        semilla = int(np.random.SeedSequence([random_state, actualizaciones]).generate_state(1)[0])
+        self.model.set_params(
+            warm_start=True,
+            n_estimators=n_previos + arboles,
+            random_state=semilla,
+            max_samples=max_samples,
+            # Las predicciones out-of-bag de los árboles viejos no corresponden a estas filas
+            oob_score=False,
+            n_jobs=self.n_jobs
+        )
+        for atributo in ('oob_prediction_', 'oob_score_'):
+            if hasattr(self.model, atributo):
+                delattr(self.model, atributo)
+        self.model.fit(X_scaled[entrenamiento], y[entrenamiento])
+        
+        retirados = 0
+        if retirar:
+            # warm_start agrega los árboles al final: los más antiguos van primero
+            retirados = min(arboles, n_previos)
+            self.model.estimators_ = self.model.estimators_[retirados:]
+        self.model.set_params(
+            warm_start=False,
+            n_estimators=len(self.model.estimators_),
+            max_samples=max_samples_base
+        )
+        self.hiperparametros = dict(self.hiperparametros, n_estimators=self.model.n_estimators)
+        self.bosque_compilado = BosqueCompilado.desde_modelo(self.model)
+        self.tiempos['ajuste'] = time.perf_counter() - inicio_fase
+        
+        X_eval = X_scaled[evaluacion] if evaluacion.any() else X_scaled[entrenamiento]
+        self.latencia = {
+            'ajuste_seg': round(self.tiempos['ajuste'], 3),
+            'prediccion_ms': round(medir_latencia(
+                self.bosque_compilado, X_eval, settings.ML_LATENCIA_LOTE_FILAS
+            ), 3),
+            'filas_lote': settings.ML_LATENCIA_LOTE_FILAS,
+            'profundidad': self.bosque_compilado.profundidad
+        }
+        
+        # Estadísticas por hoja con todas las filas salvo las de evaluación:
+        # también las que entrenaron a los árboles viejos
+        self.estadisticas_hojas = None
+        if self.registrar_cuantiles:
+            reportar('estadisticas_hojas', 0.5)
+            inicio_fase = time.perf_counter()
+            self.estadisticas_hojas = EstadisticasHojas.desde_entrenamiento(
+                self.bosque_compilado, X_scaled[~evaluacion], y[~evaluacion]
+            )
+            self.tiempos['estadisticas_hojas'] = time.perf_counter() - inicio_fase
+        
+        reportar('evaluacion', 0.6)
+        inicio_fase = time.perf_counter()
+        y_pred_train = self.model.predict(X_scaled[entrenamiento])
+        metricas = {
+            'r2_train': r2_score(y[entrenamiento], y_pred_train),
+            'rmse_train': np.sqrt(mean_squared_error(y[entrenamiento], y_pred_train)),
+            'mae_train': mean_absolute_error(y[entrenamiento], y_pred_train),
+        }
+        if evaluacion.any():
+            y_pred_test = self.model.predict(X_scaled[evaluacion])
+            metricas.update({
+                'r2_test': r2_score(y[evaluacion], y_pred_test),
+                'rmse_test': np.sqrt(mean_squared_error(y[evaluacion], y_pred_test)),
+                'mae_test': mean_absolute_error(y[evaluacion], y_pred_test),
+            })
+        self.evaluacion = 'holdout'
+        self.tiempos['evaluacion'] = time.perf_counter() - inicio_fase
+        
+        comparacion = None
+        if comparar and evaluacion.any():
+            # Bosque del mismo tamaño entrenado desde cero con todas las filas
+            # que no son de evaluación
+            reportar('comparacion', 0.7)
+            print(f"⚖️ Entrenando desde cero para comparar ({self.model.n_estimators} árboles)...")
+            inicio_fase = time.perf_counter()
+            completo = entrenar_estimador(
+                self.backend, self.hiperparametros, X_scaled[~evaluacion], y[~evaluacion],
+                random_state=random_state,
+                n_jobs=self.n_jobs
+            )
+            ajuste_completo = time.perf_counter() - inicio_fase
+            y_pred_completo = completo.predict(X_scaled[evaluacion])
+            comparacion = {
+                'filas_evaluacion': int(evaluacion.sum()),
+                'incremental': {
+                    'r2_test': round(float(metricas['r2_test']), 4),
+                    'rmse_test': round(float(metricas['rmse_test']), 4),
+                    'mae_test': round(float(metricas['mae_test']), 4),
+                    'ajuste_seg': round(self.tiempos['ajuste'], 3)
+                },
+                'completo': {
+                    'r2_test': round(float(r2_score(y[evaluacion], y_pred_completo)), 4),
+                    'rmse_test': round(float(np.sqrt(mean_squared_error(y[evaluacion], y_pred_completo))), 4),
+                    'mae_test': round(float(mean_absolute_error(y[evaluacion], y_pred_completo)), 4),
+                    'ajuste_seg': round(ajuste_completo, 3)
+                }
+            }
+            self.tiempos['comparacion'] = time.perf_counter() - inicio_fase
+        elif comparar:
+            print("⚠️ Sin ventas nuevas no hay filas para comparar con un entrenamiento desde cero")
+        
+        self.busqueda = None
+        self.presupuesto = None
+        self.fragmentos = 1
+        self.incremental = {
+            'base': self.version,
+            'actualizaciones': actualizaciones,
+            'arboles_nuevos': arboles,
+            'arboles_retirados': retirados,
+            'meses': meses,
+            'periodo_base': periodo_base,
+            'filas_entrenamiento': int(entrenamiento.sum()),
+            'filas_nuevas': int(nuevas.sum()),
+            'comparacion': comparacion
+        }
+        self.tiempos['total'] = time.perf_counter() - inicio
+        
+        print(f"✅ Modelo actualizado en {self.tiempos['total']:.2f}s "
+              f"({self.model.n_estimators} árboles, {retirados} retirados)")
+        if 'r2_test' in metricas:
+            print(f"   R² Test (filas nuevas): {metricas['r2_test']:.4f}")
+        if comparacion is not None:
+            print(f"   Desde cero: R² Test {comparacion['completo']['r2_test']:.4f} "
+                  f"en {comparacion['completo']['ajuste_seg']:.2f}s "
+                  f"(incremental {comparacion['incremental']['ajuste_seg']:.2f}s)")
+        
+        self.metricas = metricas
         return metricas
     
     def guardar_modelo(self):
         """
         Guarda el modelo entrenado y el scaler
+        
+        Todos los artefactos se escriben en un directorio temporal junto con su
+        metadata.json, que luego se renombra a versiones/<version>/ (paquete
+        inmutable). Al final se actualiza el puntero version_modelo.txt con
+        os.replace. Un fallo a mitad de la escritura nunca deja una versión
+        vigente incompleta.
         """
         if self.model is None:
             raise ValueError("Primero debes entrenar el modelo")
         
-        os.makedirs(settings.ML_MODELS_DIR, exist_ok=True)
+        # Identificador de esta versión del modelo
+        self.version = datetime.now().strftime('%Y%m%d%H%M%S%f')
+        temporal = ruta_temporal(self.version)
+        self._usar_directorio(temporal)
+        os.makedirs(temporal, exist_ok=True)
         
-        joblib.dump(self.model, self.model_path)
         joblib.dump(self.scaler, self.scaler_path)
-        joblib.dump(self.feature_names, os.path.join(settings.ML_MODELS_DIR, 'feature_names.pkl'))
+        joblib.dump(self.feature_names, self.feature_names_path)
         
-        print(f"💾 Modelo guardado en: {self.model_path}")
+        if es_bosque(self.backend):
+            joblib.dump(self.model, self.model_path)
+            
+            # Formato compilado para servir predicciones
+            if self.bosque_compilado is None:
+                self.bosque_compilado = BosqueCompilado.desde_modelo(self.model)
+            self.bosque_compilado.guardar(self.compilado_path)
+            
+            if self.estadisticas_hojas is not None:
+                self.estadisticas_hojas.guardar(self.cuantiles_path)
+            n_arboles = self.bosque_compilado.n_arboles
+        else:
+            # Modelo de la media y de los percentiles del intervalo
+            joblib.dump(self.model, self.gradiente_path)
+            n_arboles = self.model.n_iteraciones
+        
+        # Tiempo de carga del paquete tal como lo cargan los workers
+        inicio = time.perf_counter()
+        prueba = VentasPredictor()
+        prueba._usar_directorio(temporal)
+        prueba._cargar_artefactos(usar_compilado=True)
+        tiempo_carga = time.perf_counter() - inicio
+        
+        artefactos = calcular_checksums(temporal)
+        escribir_metadata(temporal, {
+            'version': self.version,
+            'fecha_entrenamiento': datetime.now().isoformat(),
+            'metricas': {k: float(v) for k, v in (self.metricas or {}).items()},
+            'num_registros': self.num_registros,
+            'backend': self.backend,
+            'evaluacion': self.evaluacion,
+            'tiempos_entrenamiento': {k: round(v, 3) for k, v in self.tiempos.items()},
+            'n_arboles': n_arboles,
+            'hiperparametros': self.hiperparametros,
+            'latencia': self.latencia,
+            'busqueda': self.busqueda,
+            'presupuesto': self.presupuesto,
+            'fragmentos': self.fragmentos,
+            'periodo_final': self.periodo_final,
+            'incremental': self.incremental,
+            'feature_names': list(self.feature_names),
+            'tamano_bytes': sum(datos['bytes'] for datos in artefactos.values()),
+            'tiempo_carga_seg': round(tiempo_carga, 4),
+            'artefactos': artefactos
+        })
+        
+        # Publicar la versión
+        os.rename(temporal, ruta_version(self.version))
+        self._usar_directorio(ruta_version(self.version))
+        publicar_version(self.version)
+        
+        eliminar_versiones_antiguas()
+        
+        print(f"💾 Modelo guardado en: {self.directorio} (versión {self.version})")
     
-    def cargar_modelo(self):
+    def cargar_modelo(self, usar_compilado=False, version=None):
         """
         Carga el modelo entrenado desde disco
+        
+        Args:
+            usar_compilado: Si True y existe el bosque compilado, lo carga en
+                lugar del modelo de sklearn (menor memoria por proceso). Los
+                modelos de gradient boosting no tienen formato compilado
+            version: Versión a cargar. Si es None usa la de version_modelo.txt
         """
-        if not os.path.exists(self.model_path):
-            raise FileNotFoundError(f"No se encontró el modelo en {self.model_path}")
+        if version is None:
+            version = leer_version_actual()
         
-        self.model = joblib.load(self.model_path)
-        self.scaler = joblib.load(self.scaler_path)
-        self.feature_names = joblib.load(os.path.join(settings.ML_MODELS_DIR, 'feature_names.pkl'))
+        if version and os.path.isdir(ruta_version(version)):
+            self._usar_directorio(ruta_version(version))
+        else:
+            # Modelos guardados antes de versionar los artefactos
+            self._usar_directorio(settings.ML_MODELS_DIR)
+        
+        self._cargar_artefactos(usar_compilado)
+        self.version = version
         
         return True
     
+    def _cargar_artefactos(self, usar_compilado):
+        """
+        Carga los artefactos del directorio actual
+        """
+        if usar_compilado and os.path.exists(self.compilado_path):
+            # Tablas mapeadas en memoria: compartidas entre los workers del host
+            mmap = settings.ML_MMAP_MODELO
+            self.bosque_compilado = BosqueCompilado.cargar(self.compilado_path, mmap=mmap)
+            if os.path.exists(self.cuantiles_path):
+                self.estadisticas_hojas = EstadisticasHojas.cargar(self.cuantiles_path, mmap=mmap)
+        elif os.path.exists(self.gradiente_path):
+            self.model = joblib.load(self.gradiente_path)
+        elif not os.path.exists(self.model_path):
+            raise FileNotFoundError(f"No se encontró el modelo en {self.model_path}")
+        else:
+            self.model = joblib.load(self.model_path)
+        
+        self.scaler = joblib.load(self.scaler_path)
+        self.feature_names = joblib.load(self.feature_names_path)
+    
     def obtener_importancia_features(self):
         """
-        Obtiene la importancia de cada feature
+        Obtiene la importancia de cada feature (vacío si el algoritmo no la calcula)
         """
         if self.model is None:
             raise ValueError("Primero debes entrenar o cargar el modelo")
         
+        if not hasattr(self.model, 'feature_importances_'):
+            return {}
+        
         importancia = dict(zip(self.feature_names, self.model.feature_importances_))
         return dict(sorted(importancia.items(), key=lambda x: x[1], reverse=True))
 
 
-def entrenar_y_guardar_modelo():
+def _sin_reporte(fase, progreso):
+    pass
+
+
+def entrenar_y_guardar_modelo(materializar_meses=None, reportar=None, evaluacion=None,
+                              ajustar_hiperparametros=None, presupuesto_busqueda=None,
+                              backend=None, tiempo_objetivo=None, fragmentos=None,
+                              n_jobs=None, feature_store=None):
     """
     Función auxiliar para entrenar y guardar el modelo
+    
+    Args:
+        materializar_meses: Meses futuros a precalcular en PronosticoMaterializado
+            después de guardar. Si es None usa ML_MATERIALIZAR_MESES (0 = no precalcular)
+        reportar: Función opcional reportar(fase, progreso) para informar el avance
+        evaluacion: Estrategia de evaluación ('oob', 'cv' o 'holdout'). Si es
+            None usa ML_EVALUACION
+        ajustar_hiperparametros: Si True, busca los hiperparámetros con
+            successive halving. Si es None usa ML_AJUSTAR_HIPERPARAMETROS
+        presupuesto_busqueda: Segundos de la búsqueda (por defecto ML_BUSQUEDA_PRESUPUESTO_SEG)
+        backend: Algoritmo ('random_forest', 'extra_trees' o
+            'hist_gradient_boosting'). Si es None usa ML_BACKEND
+        tiempo_objetivo: Segundos objetivo del ajuste (solo random_forest). Si
+            es None usa ML_TIEMPO_OBJETIVO_SEG (0 = sin límite)
+        fragmentos: Fragmentos en los que se reparten los árboles (solo
+            bosques). Si es None usa ML_FRAGMENTOS (1 = un solo proceso)
+        n_jobs: Núcleos del entrenamiento. Si es None usa ML_ENTRENAMIENTO_N_JOBS
+        feature_store: Si True, extrae las features con el almacén incremental.
+            Si es None usa ML_FEATURE_STORE
     """
+    reportar = reportar or _sin_reporte
+    
+    predictor = VentasPredictor(
+        evaluacion=evaluacion,
+        ajustar_hiperparametros=ajustar_hiperparametros,
+        presupuesto_busqueda=presupuesto_busqueda,
+        backend=backend,
+        tiempo_objetivo=tiempo_objetivo,
+        fragmentos=fragmentos,
+        n_jobs=n_jobs,
+        feature_store=feature_store
+    )
+    metricas = predictor.entrenar_modelo(reportar=reportar)
+    
+    reportar('guardado', 0.85)
+    predictor.guardar_modelo()
+    
+    if materializar_meses is None:
+        materializar_meses = settings.ML_MATERIALIZAR_MESES
+    
+    pronosticos_materializados = 0
+    if materializar_meses:
+        reportar('materializacion', 0.9)
+        from .inference import PrediccionVentas
+        pronosticos_materializados = PrediccionVentas().materializar_pronosticos(materializar_meses)
+    
+    return {
+        'metricas': metricas,
+        'fecha_entrenamiento': datetime.now(),
+        'feature_importance': predictor.obtener_importancia_features(),
+        'version': predictor.version,
+        'num_registros': predictor.num_registros,
+        'backend': predictor.backend,
+        'evaluacion': predictor.evaluacion,
+        'tiempos': predictor.tiempos,
+        'hiperparametros': predictor.hiperparametros,
+        'latencia': predictor.latencia,
+        'busqueda': predictor.busqueda,
+        'presupuesto': predictor.presupuesto,
+        'fragmentos': predictor.fragmentos,
+        'pronosticos_materializados': pronosticos_materializados
+    }
+
+
+def actualizar_y_guardar_modelo(arboles=None, retirar=None, meses=None, comparar=False,
+                                materializar_meses=None, reportar=None):
+    """
+    Función auxiliar para actualizar el modelo vigente con árboles nuevos y guardarlo
+    
+    Args:
+        arboles: Árboles nuevos (por defecto ML_INCREMENTAL_ARBOLES)
+        retirar: Descartar los árboles más antiguos (por defecto ML_INCREMENTAL_RETIRAR)
+        meses: Periodos recientes de entrenamiento (por defecto ML_INCREMENTAL_MESES)
+        comparar: Si True, compara con un entrenamiento desde cero
+        materializar_meses: Ver entrenar_y_guardar_modelo
+        reportar: Función opcional reportar(fase, progreso) para informar el avance
+    """
+    reportar = reportar or _sin_reporte
+    
     predictor = VentasPredictor()
-    metricas = predictor.entrenar_modelo()
+    metricas = predictor.actualizar_modelo(
+        arboles=arboles, retirar=retirar, meses=meses, comparar=comparar, reportar=reportar
+    )
+    
+    reportar('guardado', 0.85)
     predictor.guardar_modelo()
     
+    if materializar_meses is None:
+        materializar_meses = settings.ML_MATERIALIZAR_MESES
+    
+    pronosticos_materializados = 0
+    if materializar_meses:
+        reportar('materializacion', 0.9)
+        from .inference import PrediccionVentas
+        pronosticos_materializados = PrediccionVentas().materializar_pronosticos(materializar_meses)
+    
     return {
         'metricas': metricas,
         'fecha_entrenamiento': datetime.now(),
-        'feature_importance': predictor.obtener_importancia_features()
+        'version': predictor.version,
+        'num_registros': predictor.num_registros,
+        'backend': predictor.backend,
+        'tiempos': predictor.tiempos,
+        'n_arboles': predictor.model.n_estimators,
+        'latencia': predictor.latencia,
+        'incremental': predictor.incremental,
+        'pronosticos_materializados': pronosticos_materializados
     }
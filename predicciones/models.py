@@ -1,6 +1,7 @@
 from django.db import models
 
-# Create your models here.
+# Los modelos con managed = False reflejan tablas del backend principal de
+# ventas; este servicio solo las lee y sus migraciones no las crean.
 
 class Categoria(models.Model):
     nombre = models.CharField(max_length=100)
@@ -10,6 +11,7 @@ class Categoria(models.Model):
 
     class Meta:
         db_table = 'products_categoria'
+        managed = False
 
     def __str__(self):
         return self.nombre
@@ -21,6 +23,7 @@ class Marca(models.Model):
 
     class Meta:
         db_table = 'products_marca'
+        managed = False
 
     def __str__(self):
         return self.nombre
@@ -34,6 +37,7 @@ class Garantia(models.Model):
 
     class Meta:
         db_table = 'products_garantia'
+        managed = False
 
     def __str__(self):
         return f"Garantía de {self.duracion_meses} meses para {self.producto.nombre}"
@@ -65,6 +69,7 @@ class Producto(models.Model):
 
     class Meta:
         db_table = 'products_producto'
+        managed = False
 
     def __str__(self):
         return self.nombre
@@ -87,6 +92,7 @@ class Usuario(models.Model):
 
     class Meta:
         db_table = 'users_usuario'
+        managed = False
 
     def __str__(self):
         return f"{self.correo}"
@@ -107,6 +113,7 @@ class Cliente(models.Model):
 
     class Meta:
         db_table = 'users_cliente'
+        managed = False
 
     def __str__(self):
         return f"Cliente: {self.nombres} {self.apellidoPaterno} {self.apellidoMaterno}"
@@ -121,6 +128,7 @@ class MetodoPago(models.Model):
 
     class Meta:
         db_table = 'sales_metodopago'
+        managed = False
 
     def __str__(self):
         return self.nombre
@@ -152,6 +160,7 @@ class NotaVenta(models.Model):
     
     class Meta:
         db_table = 'sales_notaventa'
+        managed = False
         ordering = ['-created_at']
 
     def __str__(self):
@@ -169,6 +178,7 @@ class Detalle_Venta(models.Model):
 
     class Meta:
         db_table = 'sales_detalleventa'
+        managed = False
     
     def save(self, *args, **kwargs):
         """Calcula automáticamente el subtotal antes de guardar"""
@@ -179,3 +189,39 @@ class Detalle_Venta(models.Model):
         return f"{self.producto.nombre} x{self.cantidad} - NotaVenta #{self.nota_venta.id}"
 
 
+class PronosticoMaterializado(models.Model):
+    """
+    Predicción precalculada de un producto para un mes, por versión del modelo
+    """
+    version_modelo = models.CharField(max_length=32)
+    producto = models.ForeignKey(
+        Producto,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='pronosticos'
+    )
+    mes = models.PositiveSmallIntegerField()
+    anio = models.PositiveSmallIntegerField()
+    prediccion = models.FloatField()
+    intervalo_inferior = models.FloatField()
+    intervalo_superior = models.FloatField()
+    intervalo_std = models.FloatField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'predicciones_pronosticomaterializado'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['version_modelo', 'producto', 'anio', 'mes'],
+                name='pronostico_unico_por_version'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['version_modelo', 'anio', 'mes', '-prediccion'],
+                name='pronostico_top_idx'
+            )
+        ]
+
+    def __str__(self):
+        return f"Pronóstico {self.producto_id} {self.anio}-{self.mes:02d} ({self.version_modelo})"
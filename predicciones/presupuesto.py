@@ -0,0 +1,155 @@
+"""
+Módulo para elegir el tamaño del bosque que se entrena dentro de un tiempo objetivo
+"""
+import math
+import os
+import time
+
+import numpy as np
+from django.conf import settings
+
+from .backends import crear_estimador
+
+
+# Árboles de cada ajuste de calibración
+_ARBOLES_CALIBRACION = 4
+
+# Límites del exponente de crecimiento del tiempo por árbol con las filas
+_EXPONENTE_MINIMO, _EXPONENTE_MAXIMO = 1.0, 2.0
+
+
+def _nucleos(n_jobs):
+    if n_jobs is None or n_jobs < 1:
+        return os.cpu_count() or 1
+    return n_jobs
+
+
+def _medir_arbol(backend, hiperparametros, X, y, filas, random_state):
+    """
+    Segundos por árbol y profundidad media de un bosque pequeño con `filas`
+    filas sorteadas por árbol (max_samples), igual que el ajuste final
+    """
+    modelo = crear_estimador(
+        backend,
+        {
+            **hiperparametros,
+            'n_estimators': _ARBOLES_CALIBRACION,
+            'max_samples': filas if filas < len(X) else None
+        },
+        random_state=random_state
+    )
+    inicio = time.perf_counter()
+    modelo.fit(X, y)
+    segundos = (time.perf_counter() - inicio) / _ARBOLES_CALIBRACION
+    profundidad = float(np.mean([arbol.tree_.max_depth for arbol in modelo.estimators_]))
+    return segundos, profundidad
+
+
+def planificar_ajuste(X, y, backend, hiperparametros, objetivo_seg, n_jobs=1, random_state=42):
+    """
+    Elige max_samples, n_estimators y max_depth para que el ajuste dure a lo
+    sumo objetivo_seg
+
+    Un ajuste de calibración con pocos árboles y m0 filas sorteadas por árbol
+    mide el tiempo por árbol y un segundo ajuste con m0 / 4 da el exponente b
+    con el que crece: t(m) = t0 × (m / m0)^b. La calibración sortea sobre
+    todas las filas, como el ajuste final: el costo depende de cuántas filas
+    distintas recibe cada árbol, no solo de cuántas se sortean.
+    Limitar la profundidad recorta niveles y cada nivel recorre todas las
+    filas, así que el tiempo se escala por la fracción de niveles que quedan.
+
+    Se reduce primero max_samples (filas por árbol, lo que menos afecta la
+    precisión con historiales grandes), después los árboles y por último la
+    profundidad, sin bajar de los mínimos ML_PRESUPUESTO_MIN_*.
+
+    Args:
+        X: Features de entrenamiento ya escaladas
+        y: Valores objetivo
+        backend: Algoritmo del modelo (debe admitir submuestreo, ver backends.BACKENDS)
+        hiperparametros: Hiperparámetros de partida
+        objetivo_seg: Segundos objetivo del ajuste (incluye la calibración)
+        n_jobs: Núcleos del ajuste final
+
+    Returns:
+        dict con los hiperparámetros elegidos, el tiempo proyectado y los datos
+        de la calibración
+    """
+    inicio = time.perf_counter()
+    X = np.asarray(X)
+    y = np.asarray(y)
+    n = len(X)
+    nucleos = _nucleos(n_jobs)
+    arboles = hiperparametros['n_estimators']
+    profundidad_max = hiperparametros['max_depth'] or math.inf
+
+    # Calibración
+    m0 = min(n, settings.ML_PRESUPUESTO_FILAS_CALIBRACION)
+    t0, d0 = _medir_arbol(backend, hiperparametros, X, y, m0, random_state)
+    m1 = m0 // 4
+    exponente = 1.2
+    if m1 >= 500:
+        t1, _ = _medir_arbol(backend, hiperparametros, X, y, m1, random_state)
+        exponente = float(np.clip(math.log(t0 / t1) / math.log(m0 / m1),
+                                  _EXPONENTE_MINIMO, _EXPONENTE_MAXIMO))
+    calibracion = time.perf_counter() - inicio
+    disponible = max(objetivo_seg - calibracion, 0.0)
+
+    def profundidad_libre(m):
+        # Cada vez que se duplican las filas el árbol crece un nivel más
+        return max(1.0, min(profundidad_max, d0 + math.log2(m / m0)))
+
+    def segundos_por_arbol(m, profundidad=None):
+        libre = profundidad_libre(m)
+        niveles = min(profundidad, libre) / libre if profundidad else 1.0
+        return t0 * (m / m0) ** exponente * niveles
+
+    def proyectar(m, n_arboles, profundidad=None):
+        return n_arboles * segundos_por_arbol(m, profundidad) / nucleos
+
+    min_filas = min(n, settings.ML_PRESUPUESTO_MIN_FILAS)
+    min_arboles = min(arboles, settings.ML_PRESUPUESTO_MIN_ARBOLES)
+    profundidad = None
+
+    # 1) Filas por árbol con todos los árboles
+    filas = m0 * (disponible * nucleos / (arboles * t0)) ** (1 / exponente)
+    filas = int(min(n, max(min_filas, filas)))
+
+    # 2) Menos árboles con el mínimo de filas
+    if proyectar(filas, arboles) > disponible:
+        arboles = int(max(min_arboles, disponible * nucleos // segundos_por_arbol(filas)))
+
+    # 3) Menos profundidad con el mínimo de árboles
+    if proyectar(filas, arboles) > disponible:
+        fraccion = disponible * nucleos / (arboles * segundos_por_arbol(filas))
+        profundidad = max(
+            settings.ML_PRESUPUESTO_MIN_PROFUNDIDAD,
+            int(fraccion * profundidad_libre(filas))
+        )
+
+    elegidos = dict(hiperparametros, n_estimators=arboles)
+    elegidos['max_samples'] = filas if filas < n else None
+    if profundidad is not None:
+        elegidos['max_depth'] = profundidad
+
+    proyectado = proyectar(filas, arboles, profundidad)
+    if proyectado > disponible:
+        print(f"⚠️ Ni con los mínimos se alcanza el objetivo de {objetivo_seg}s "
+              f"(proyectado {calibracion + proyectado:.1f}s)")
+
+    print(f"⏱️ Presupuesto de {objetivo_seg}s: {filas}/{n} filas por árbol, "
+          f"{arboles} árboles, profundidad {elegidos['max_depth']} "
+          f"(ajuste proyectado {proyectado:.1f}s, calibración {calibracion:.1f}s)")
+
+    return {
+        'hiperparametros': elegidos,
+        'objetivo_seg': objetivo_seg,
+        'proyectado_seg': round(proyectado, 3),
+        'nucleos': nucleos,
+        'calibracion': {
+            'filas': m0,
+            'segundos_por_arbol': round(t0, 5),
+            'exponente': round(exponente, 3),
+            'profundidad': round(d0, 1),
+            'segundos': round(calibracion, 3)
+        }
+    }
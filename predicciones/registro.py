@@ -0,0 +1,246 @@
+"""
+Módulo con el registro de versiones del modelo
+
+Cada entrenamiento se guarda como un paquete inmutable en
+ML_MODELS_DIR/versiones/<version>/ junto con un metadata.json (métricas,
+registros de entrenamiento, tamaño, checksums y tiempo de carga). El archivo
+version_modelo.txt apunta a la versión vigente. Promover o revertir una versión
+solo reescribe ese puntero, y los workers la recargan en caliente.
+"""
+import hashlib
+import json
+import os
+import shutil
+
+from django.conf import settings
+
+
+ARCHIVO_METADATA = 'metadata.json'
+
+
+def ruta_version_actual():
+    """
+    Ruta del puntero a la versión vigente del modelo
+    """
+    return os.path.join(settings.ML_MODELS_DIR, 'version_modelo.txt')
+
+
+def ruta_historial():
+    """
+    Ruta del historial de versiones publicadas (una por línea, la última es la vigente)
+    """
+    return os.path.join(settings.ML_MODELS_DIR, 'historial_versiones.txt')
+
+
+def ruta_versiones():
+    """
+    Directorio que contiene los paquetes de todas las versiones
+    """
+    return os.path.join(settings.ML_MODELS_DIR, 'versiones')
+
+
+def ruta_version(version):
+    """
+    Directorio con los artefactos de una versión del modelo
+    """
+    return os.path.join(ruta_versiones(), version)
+
+
+def ruta_temporal(version):
+    """
+    Directorio donde se escribe una versión antes de publicarla
+    """
+    return os.path.join(ruta_versiones(), f'.{version}.tmp')
+
+
+def _escribir_atomico(ruta, contenido):
+    temporal = f'{ruta}.tmp'
+    with open(temporal, 'w') as archivo:
+        archivo.write(contenido)
+    os.replace(temporal, ruta)
+
+
+def leer_version_actual():
+    """
+    Lee la versión vigente del modelo (None si nunca se guardó una)
+    """
+    try:
+        with open(ruta_version_actual()) as archivo:
+            return archivo.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _leer_historial():
+    try:
+        with open(ruta_historial()) as archivo:
+            return [linea.strip() for linea in archivo if linea.strip()]
+    except FileNotFoundError:
+        return []
+
+
+def publicar_version(version, registrar_historial=True):
+    """
+    Convierte una versión en la vigente reescribiendo el puntero con os.replace
+
+    Args:
+        version: Versión a publicar (debe existir en versiones/)
+        registrar_historial: Si True, la agrega al historial para poder revertirla
+    """
+    if not os.path.isdir(ruta_version(version)):
+        raise ValueError(f"La versión {version} no existe")
+
+    if registrar_historial:
+        historial = _leer_historial()
+        if not historial or historial[-1] != version:
+            historial.append(version)
+            _escribir_atomico(ruta_historial(), '\n'.join(historial) + '\n')
+
+    _escribir_atomico(ruta_version_actual(), version)
+
+
+def calcular_checksums(directorio):
+    """
+    Calcula tamaño y SHA-256 de cada artefacto de un paquete
+
+    Returns:
+        dict {ruta relativa: {'bytes': int, 'sha256': str}}
+    """
+    artefactos = {}
+    for raiz, _, archivos in os.walk(directorio):
+        for nombre in sorted(archivos):
+            ruta = os.path.join(raiz, nombre)
+            relativa = os.path.relpath(ruta, directorio)
+            if relativa == ARCHIVO_METADATA:
+                continue
+
+            sha256 = hashlib.sha256()
+            with open(ruta, 'rb') as archivo:
+                for bloque in iter(lambda: archivo.read(1024 * 1024), b''):
+                    sha256.update(bloque)
+
+            artefactos[relativa] = {
+                'bytes': os.path.getsize(ruta),
+                'sha256': sha256.hexdigest()
+            }
+    return artefactos
+
+
+def escribir_metadata(directorio, metadata):
+    """
+    Guarda el metadata.json de un paquete
+    """
+    _escribir_atomico(
+        os.path.join(directorio, ARCHIVO_METADATA),
+        json.dumps(metadata, indent=2, ensure_ascii=False, default=str)
+    )
+
+
+def leer_metadata(version):
+    """
+    Lee el metadata.json de una versión (None si no tiene)
+    """
+    try:
+        with open(os.path.join(ruta_version(version), ARCHIVO_METADATA)) as archivo:
+            return json.load(archivo)
+    except FileNotFoundError:
+        return None
+
+
+def listar_versiones():
+    """
+    Lista las versiones guardadas, de la más reciente a la más antigua
+
+    Returns:
+        list de dicts con 'version', 'vigente' y 'metadata'
+    """
+    if not os.path.isdir(ruta_versiones()):
+        return []
+
+    vigente = leer_version_actual()
+    versiones = sorted(
+        (nombre for nombre in os.listdir(ruta_versiones()) if not nombre.startswith('.')),
+        reverse=True
+    )
+    return [
+        {
+            'version': version,
+            'vigente': version == vigente,
+            'metadata': leer_metadata(version)
+        }
+        for version in versiones
+    ]
+
+
+def verificar_version(version):
+    """
+    Comprueba que los artefactos de una versión coincidan con sus checksums
+
+    Raises:
+        ValueError si la versión no existe o algún artefacto no coincide
+    """
+    metadata = leer_metadata(version)
+    if metadata is None:
+        raise ValueError(f"La versión {version} no existe o no tiene {ARCHIVO_METADATA}")
+
+    esperados = metadata['artefactos']
+    actuales = calcular_checksums(ruta_version(version))
+    for relativa, datos in esperados.items():
+        if actuales.get(relativa, {}).get('sha256') != datos['sha256']:
+            raise ValueError(f"El artefacto {relativa} de la versión {version} está dañado")
+
+
+def promover_version(version, verificar=True):
+    """
+    Publica una versión guardada como la vigente
+
+    Args:
+        version: Versión a publicar
+        verificar: Si True, comprueba los checksums antes de publicarla
+    """
+    if verificar:
+        verificar_version(version)
+    publicar_version(version)
+
+
+def revertir_version():
+    """
+    Vuelve a la versión publicada antes de la vigente
+
+    Returns:
+        La versión que quedó vigente
+
+    Raises:
+        ValueError si no hay una versión anterior disponible
+    """
+    historial = _leer_historial()
+    vigente = leer_version_actual()
+
+    if historial and historial[-1] == vigente:
+        historial.pop()
+
+    while historial and not os.path.isdir(ruta_version(historial[-1])):
+        historial.pop()
+
+    if not historial:
+        raise ValueError("No hay una versión anterior a la cual revertir")
+
+    anterior = historial[-1]
+    _escribir_atomico(ruta_historial(), '\n'.join(historial) + '\n')
+    publicar_version(anterior, registrar_historial=False)
+    return anterior
+
+
+def eliminar_versiones_antiguas():
+    """
+    Elimina las versiones más allá de las ML_VERSIONES_CONSERVAR más recientes
+    (nunca la vigente)
+
+    Los workers que todavía tienen mapeados archivos de una versión eliminada
+    siguen leyéndolos hasta recargar: el sistema libera el espacio al cerrarlos.
+    """
+    vigente = leer_version_actual()
+    versiones = [item['version'] for item in listar_versiones()]
+    for version in versiones[settings.ML_VERSIONES_CONSERVAR:]:
+        if version != vigente:
+            shutil.rmtree(ruta_version(version), ignore_errors=True)
@@ -1,5 +1,8 @@
+from django.conf import settings
 from rest_framework import serializers
 from .models import NotaVenta, Detalle_Venta, Producto
+from .ml_model import EVALUACIONES
+from .backends import BACKENDS
 
 
 class PrediccionVentasInputSerializer(serializers.Serializer):
@@ -15,6 +18,27 @@ class PrediccionVentasInputSerializer(serializers.Serializer):
     dias_futuro = serializers.IntegerField(min_value=1, max_value=365, default=30)
 
 
+class PrediccionLoteInputSerializer(PrediccionVentasInputSerializer):
+    """
+    Serializer para predicción por lotes: lista de productos o filtro por
+    categoría/marca, más un rango de meses a partir de mes/anio
+    """
+    productos_ids = serializers.ListField(
+        child=serializers.IntegerField(), required=False, allow_empty=False
+    )
+    meses = serializers.IntegerField(min_value=1, max_value=settings.ML_LOTE_MAX_MESES, default=1)
+
+    def validate(self, data):
+        if not any(
+            data.get(campo) is not None
+            for campo in ('productos_ids', 'producto_id', 'categoria_id', 'marca_id')
+        ):
+            raise serializers.ValidationError(
+                "Debes indicar productos_ids, producto_id, categoria_id o marca_id"
+            )
+        return data
+
+
 class PrediccionVentasOutputSerializer(serializers.Serializer):
     """
     Serializer para la respuesta de predicción
@@ -25,14 +49,15 @@ class PrediccionVentasOutputSerializer(serializers.Serializer):
     fecha_prediccion = serializers.DateTimeField()
 
 
-class EntrenamientoModeloSerializer(serializers.Serializer):
+class EntrenamientoInputSerializer(serializers.Serializer):
     """
-    Serializer para respuesta del entrenamiento del modelo
+    Serializer para las opciones del entrenamiento del modelo
     """
-    mensaje = serializers.CharField()
-    metricas = serializers.DictField()
-    fecha_entrenamiento = serializers.DateTimeField()
-    num_registros = serializers.IntegerField()
+    evaluacion = serializers.ChoiceField(choices=EVALUACIONES, required=False)
+    backend = serializers.ChoiceField(choices=list(BACKENDS), required=False)
+    tiempo_objetivo = serializers.IntegerField(min_value=1, required=False)
+    fragmentos = serializers.IntegerField(min_value=1, required=False)
+    ajustar_hiperparametros = serializers.BooleanField(required=False, allow_null=True, default=None)
 
 
 class ProductoVentasSerializer(serializers.ModelSerializer):
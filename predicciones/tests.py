@@ -1,3 +1,644 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import warnings
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from sklearn.ensemble import RandomForestRegressor
+
+from .bosque_compilado import BosqueCompilado
+from .cuantiles import EstadisticasHojas
+from .features import AlmacenFeatures
+from . import inference
+from .fragmentos import combinar_bosques
+from .ml_model import (
+    VentasPredictor, actualizar_y_guardar_modelo, entrenar_y_guardar_modelo, moda_por_grupo
+)
+from .registro import (
+    leer_metadata, leer_version_actual, listar_versiones, promover_version, publicar_version,
+    revertir_version, ruta_version
+)
+from .models import (
+    Categoria, Cliente, Detalle_Venta, Garantia, Marca, MetodoPago, NotaVenta, Producto, Usuario
+)
+
+
+def _datos_regresion(n_filas=300, n_features=6, semilla=0):
+    rng = np.random.RandomState(semilla)
+    X = rng.uniform(-5, 5, size=(n_filas, n_features))
+    y = X[:, 0] * 3 - X[:, 1] ** 2 + rng.normal(scale=0.5, size=n_filas)
+    return X, y
+
+
+class BosqueCompiladoTests(SimpleTestCase):
+
+    def setUp(self):
+        X, y = _datos_regresion()
+        self.X = X
+        self.modelo = RandomForestRegressor(n_estimators=15, max_depth=8, random_state=0).fit(X, y)
+        self.bosque = BosqueCompilado.desde_modelo(self.modelo)
+
+    def test_predict_igual_a_sklearn(self):
+        np.testing.assert_allclose(self.bosque.predict(self.X), self.modelo.predict(self.X))
+
+    def test_predicciones_por_arbol(self):
+        esperadas = np.array([arbol.predict(self.X.astype(np.float32)) for arbol in self.modelo.estimators_])
+        np.testing.assert_allclose(self.bosque.predicciones_arboles(self.X), esperadas)
+
+    def test_guardar_y_cargar(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            self.bosque.guardar(directorio)
+            cargado = BosqueCompilado.cargar(directorio, mmap=True)
+            np.testing.assert_allclose(cargado.predict(self.X), self.modelo.predict(self.X))
+
+
+
+class EstadisticasHojasTests(SimpleTestCase):
+
+    def setUp(self):
+        X, y = _datos_regresion(n_filas=200)
+        # Valores enteros: la grilla es exacta y la CDF se puede contar a mano
+        self.X, self.y = X, np.round(y)
+        modelo = RandomForestRegressor(n_estimators=10, min_samples_leaf=3, random_state=0).fit(self.X, self.y)
+        self.bosque = BosqueCompilado.desde_modelo(modelo)
+        self.estadisticas = EstadisticasHojas.desde_entrenamiento(self.bosque, self.X, self.y, max_valores=1000)
+        self.X_nuevas = _datos_regresion(n_filas=20, semilla=1)[0]
+
+    def test_cdf_igual_al_promedio_de_las_hojas(self):
+        hojas_entrenamiento = self.bosque.aplicar(self.X)
+        hojas = self.bosque.aplicar(self.X_nuevas)
+
+        esperada = np.zeros((len(self.X_nuevas), len(self.estadisticas.grilla)))
+        for arbol in range(self.bosque.n_arboles):
+            for fila, hoja in enumerate(hojas[arbol]):
+                valores = self.y[hojas_entrenamiento[arbol] == hoja]
+                esperada[fila] += (valores[:, np.newaxis] <= self.estadisticas.grilla).mean(axis=0)
+        esperada /= self.bosque.n_arboles
+
+        np.testing.assert_allclose(self.estadisticas.cdf_condicional(hojas), esperada, atol=1e-12)
+
+    def test_guardar_y_cargar(self):
+        hojas = self.bosque.aplicar(self.X_nuevas)
+        with tempfile.TemporaryDirectory() as directorio:
+            self.estadisticas.guardar(directorio)
+            cargadas = EstadisticasHojas.cargar(directorio, mmap=True)
+            np.testing.assert_array_equal(
+                cargadas.cuantiles(hojas, [0.05, 0.5, 0.95]),
+                self.estadisticas.cuantiles(hojas, [0.05, 0.5, 0.95])
+            )
+
+
+class ModaPorGrupoTests(SimpleTestCase):
+
+    def test_igual_a_mode_de_pandas(self):
+        # Grupos chicos con muchos días empatados
+        rng = np.random.RandomState(0)
+        grupos = rng.randint(0, 300, size=1500)
+        dias = rng.randint(0, 7, size=1500)
+
+        esperadas = pd.Series(dias).groupby(grupos).agg(lambda x: x.mode().iloc[0])
+
+        np.testing.assert_array_equal(
+            moda_por_grupo(grupos, dias, 300)[esperadas.index], esperadas.to_numpy()
+        )
+
+    def test_agregar_features_igual_a_mode(self):
+        rng = np.random.RandomState(1)
+        detalles = pd.DataFrame({
+            'producto_id': rng.randint(1, 20, size=800),
+            'producto_precio': 10.0,
+            'producto_categoria_id': 1,
+            'producto_marca_id': 1,
+            'fecha_venta': pd.to_datetime('2024-01-01', utc=True)
+            + pd.to_timedelta(rng.randint(0, 365, size=800), unit='D'),
+            'cantidad_vendida': 1,
+            'subtotal_venta': 10.0,
+        })
+
+        features = VentasPredictor().agregar_features(detalles.copy())
+
+        fechas = detalles['fecha_venta']
+        esperadas = detalles.assign(
+            mes=fechas.dt.month, anio=fechas.dt.year, dia=fechas.dt.dayofweek
+        ).groupby(['producto_id', 'mes', 'anio'])['dia'].agg(lambda x: x.mode().iloc[0])
+        np.testing.assert_array_equal(features['dia_semana'].to_numpy(), esperadas.to_numpy())
+
+class VentasTestCase(TestCase):
+    """
+    Base de los tests que leen ventas
+
+    Las tablas de ventas son del backend principal (managed = False): se
+    crean solo para estos tests. Cada test parte de 12 productos y 120 notas
+    de venta repartidas en 2023 y 2024.
+    """
+
+    MODELOS_VENTAS = (Categoria, Marca, Garantia, Producto, Usuario, Cliente,
+                      MetodoPago, NotaVenta, Detalle_Venta)
+
+    @classmethod
+    def setUpClass(cls):
+        with connection.schema_editor() as editor:
+            for modelo in cls.MODELOS_VENTAS:
+                editor.create_model(modelo)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        with connection.schema_editor() as editor:
+            for modelo in reversed(cls.MODELOS_VENTAS):
+                editor.delete_model(modelo)
+
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        categorias = [Categoria.objects.create(nombre=f'Categoría {i}') for i in range(3)]
+        marcas = [Marca.objects.create(nombre=f'Marca {i}') for i in range(3)]
+        self.productos = [
+            Producto.objects.create(
+                nombre=f'Producto {i}', descripcion='', precio=10 + i, stock=5,
+                categoria=categorias[i % 3], marca=marcas[i % 3]
+            )
+            for i in range(12)
+        ]
+        self.usuario = Usuario.objects.create(correo='cliente@ejemplo.com', password='x')
+        self.metodo_pago = MetodoPago.objects.create(nombre='Tarjeta')
+
+        for i in range(120):
+            fecha = datetime(2023 + i % 2, rng.randint(1, 13), rng.randint(1, 29), tzinfo=timezone.utc)
+            self._crear_venta(fecha, 'pagada' if i % 5 else 'pendiente', rng)
+
+    def _crear_venta(self, fecha, estado, rng, productos=None):
+        nota = NotaVenta.objects.create(
+            estado=estado, metodo_pago=self.metodo_pago, total=0, usuario=self.usuario
+        )
+        # created_at es auto_now_add: la fecha de la venta se fija después
+        NotaVenta.objects.filter(pk=nota.pk).update(created_at=fecha)
+        productos = productos or [
+            self.productos[rng.randint(len(self.productos))] for _ in range(rng.randint(1, 4))
+        ]
+        for producto in productos:
+            Detalle_Venta.objects.create(
+                nota_venta=nota, producto=producto, cantidad=rng.randint(1, 6),
+                precio_unitario=producto.precio, subtotal=0
+            )
+        return nota
+
+    def assertFeaturesIguales(self, obtenidas, esperadas):
+        pd.testing.assert_frame_equal(
+            obtenidas.reset_index(drop=True), esperadas.reset_index(drop=True),
+            check_dtype=False
+        )
+
+
+class AlmacenFeaturesTests(VentasTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directorio.cleanup)
+
+    def test_construccion_igual_a_extraccion_completa(self):
+        predictor = VentasPredictor()
+        almacen = AlmacenFeatures(predictor, directorio=self.directorio.name)
+
+        self.assertFeaturesIguales(
+            almacen.actualizar(reconstruir=True),
+            predictor.extraer_features_ventas(incremental=False)
+        )
+
+    # Sin margen: solo se vuelven a agregar los grupos modificados después de construir
+    @override_settings(ML_FEATURE_STORE_MARGEN_SEG=0)
+    def test_actualizacion_incremental_igual_a_extraccion_completa(self):
+        predictor = VentasPredictor()
+        almacen = AlmacenFeatures(predictor, directorio=self.directorio.name)
+        almacen.actualizar(reconstruir=True)
+
+        rng = np.random.RandomState(1)
+        # Venta nueva en un mes que ya estaba en el almacén y otra en un mes nuevo
+        self._crear_venta(datetime(2023, 6, 15, tzinfo=timezone.utc), 'pagada', rng)
+        self._crear_venta(datetime(2025, 2, 3, tzinfo=timezone.utc), 'pagada', rng)
+        # Venta pagada que se reembolsa y venta pendiente que se paga
+        reembolsada = NotaVenta.objects.filter(estado='pagada').order_by('id').first()
+        reembolsada.estado = 'reembolsada'
+        reembolsada.save()
+        pagada = NotaVenta.objects.filter(estado='pendiente').order_by('id').first()
+        pagada.estado = 'pagada'
+        pagada.save()
+        # Detalle con otra cantidad
+        detalle = Detalle_Venta.objects.filter(nota_venta__estado='pagada').order_by('id')[10]
+        detalle.cantidad += 7
+        detalle.save()
+
+        self.assertFeaturesIguales(
+            AlmacenFeatures(predictor, directorio=self.directorio.name).actualizar(),
+            predictor.extraer_features_ventas(incremental=False)
+        )
+
+
+class CombinarBosquesTests(SimpleTestCase):
+
+    def setUp(self):
+        self.X, self.y = _datos_regresion()
+        with warnings.catch_warnings():
+            # Con pocos árboles por fragmento algunas filas no tienen predicción out-of-bag
+            warnings.simplefilter('ignore', UserWarning)
+            self.modelos = [
+                RandomForestRegressor(n_estimators=8, oob_score=True, random_state=semilla).fit(self.X, self.y)
+                for semilla in (1, 2, 3)
+            ]
+        self.predicciones = [modelo.predict(self.X) for modelo in self.modelos]
+
+    def test_une_los_arboles(self):
+        combinado = combinar_bosques(self.modelos)
+
+        self.assertEqual(combinado.n_estimators, 24)
+        self.assertEqual(len(combinado.estimators_), 24)
+        np.testing.assert_allclose(combinado.predict(self.X), np.mean(self.predicciones, axis=0))
+
+    def test_oob_promedia_los_arboles_que_no_usaron_la_fila(self):
+        combinado = combinar_bosques(self.modelos)
+
+        X = self.X.astype(np.float32)
+        suma = np.zeros(len(X))
+        conteo = np.zeros(len(X))
+        for arbol, muestra in zip(combinado.estimators_, combinado.estimators_samples_):
+            afuera = np.bincount(muestra, minlength=len(X)) == 0
+            suma += np.where(afuera, arbol.predict(X), 0)
+            conteo += afuera
+
+        validas = conteo > 0
+        np.testing.assert_allclose(combinado.oob_prediction_[validas], suma[validas] / conteo[validas])
+        self.assertTrue(np.isnan(combinado.oob_prediction_[~validas]).all())
+
+
+class AgregacionSqlTests(VentasTestCase):
+
+    def test_sql_igual_a_pandas(self):
+        predictor = VentasPredictor()
+
+        self.assertFeaturesIguales(
+            predictor.extraer_agregados(modo='sql'),
+            predictor.extraer_agregados(modo='pandas')
+        )
+
+    def test_empate_de_dias_elige_el_menor(self):
+        # Un detalle el miércoles y otro el lunes del mismo mes: moda = lunes (0)
+        rng = np.random.RandomState(2)
+        producto = self.productos[0]
+        self._crear_venta(datetime(2025, 3, 12, tzinfo=timezone.utc), 'pagada', rng, [producto])
+        self._crear_venta(datetime(2025, 3, 10, tzinfo=timezone.utc), 'pagada', rng, [producto])
+
+        predictor = VentasPredictor()
+        for modo in ('sql', 'pandas'):
+            features = predictor.extraer_agregados(modo=modo, nota_venta__created_at__year=2025)
+            self.assertEqual(features['dia_semana'].tolist(), [0], modo)
+
+
+class ModeloTestCase(VentasTestCase):
+    """
+    Base de los tests que entrenan y sirven un modelo
+
+    Los artefactos se guardan en un directorio temporal y el predictor global
+    de inference se reinicia en cada test.
+    """
+
+    def setUp(self):
+        super().setUp()
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        configuracion = override_settings(
+            ML_MODELS_DIR=directorio.name,
+            ML_FRAGMENTOS_DIR=f'{directorio.name}/fragmentos',
+            ML_CATALOGO_REVISION_SEG=0
+        )
+        configuracion.enable()
+        self.addCleanup(configuracion.disable)
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self._reiniciar_predictor()
+        self.addCleanup(self._reiniciar_predictor)
+
+    def _reiniciar_predictor(self):
+        inference._prediccion_instance = None
+        inference._ultima_revision_version = 0.0
+        inference._recarga_en_curso = False
+        inference._version_fallida = None
+
+    def entrenar(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', UserWarning)
+            return entrenar_y_guardar_modelo(materializar_meses=0, evaluacion='holdout')
+
+
+class PrediccionLoteTests(ModeloTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.entrenar()
+        self.prediccion = inference.PrediccionVentas()
+        self.ids = [producto.id for producto in self.productos]
+        self.periodos = [(11, 2025), (12, 2025), (1, 2026)]
+
+    def test_lote_igual_a_prediccion_por_producto(self):
+        lote = self.prediccion.predecir_lote(self.ids, self.periodos, usar_cache=False)
+
+        individuales = [
+            self.prediccion.predecir_ventas_producto(producto_id, mes, anio, usar_cache=False)
+            for producto_id in self.ids
+            for mes, anio in self.periodos
+        ]
+        self.assertEqual(len(lote), len(individuales))
+        for obtenida, esperada in zip(lote, individuales):
+            self.assertEqual(obtenida['producto']['id'], esperada['producto']['id'])
+            self.assertEqual(obtenida['features_utilizados'], esperada['features_utilizados'])
+            self.assertAlmostEqual(obtenida['prediccion'], esperada['prediccion'])
+            for campo in ('inferior', 'superior', 'std'):
+                self.assertAlmostEqual(
+                    obtenida['intervalo_confianza'][campo], esperada['intervalo_confianza'][campo]
+                )
+
+    def test_intervalos_iguales_a_los_arboles_de_sklearn(self):
+        lote = self.prediccion.predecir_lote(self.ids, self.periodos, usar_cache=False)
+
+        # Cálculo original por producto: predict y percentiles sobre cada árbol
+        modelo = VentasPredictor()
+        modelo.cargar_modelo()
+        X = pd.DataFrame([pred['features_utilizados'] for pred in lote])[modelo.feature_names]
+        X_scaled = modelo.scaler.transform(X)
+        arboles = np.array([arbol.predict(X_scaled) for arbol in modelo.model.estimators_])
+        inferior, superior = np.percentile(arboles, (5, 95), axis=0)
+
+        np.testing.assert_allclose(
+            [pred['prediccion'] for pred in lote], np.maximum(modelo.model.predict(X_scaled), 0),
+            rtol=1e-6
+        )
+        for campo, esperados in (('inferior', inferior), ('superior', superior),
+                                 ('std', arboles.std(axis=0))):
+            np.testing.assert_allclose(
+                [pred['intervalo_confianza'][campo] for pred in lote], esperados,
+                rtol=1e-6, atol=1e-9
+            )
+
+    def test_productos_inexistentes_se_omiten(self):
+        lote = self.prediccion.predecir_lote([self.ids[0], 999999], self.periodos[:1], usar_cache=False)
+
+        self.assertEqual([pred['producto']['id'] for pred in lote], [self.ids[0]])
+
+
+class PrediccionLoteViewTests(ModeloTestCase):
+
+    URL = '/api/predicciones/predecir-lote/'
+
+    def _lineas(self, respuesta):
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta['Content-Type'], 'application/x-ndjson')
+        contenido = b''.join(respuesta.streaming_content).decode()
+        return [json.loads(linea) for linea in contenido.splitlines()]
+
+    def test_lineas_por_producto_y_mes(self):
+        self.entrenar()
+        ids = [self.productos[0].id, self.productos[1].id]
+
+        lineas = self._lineas(self.client.post(self.URL, {
+            'productos_ids': ids + [999999], 'mes': 12, 'anio': 2025, 'meses': 2
+        }, content_type='application/json'))
+
+        self.assertEqual(lineas[-1], {'no_encontrados': [999999]})
+        esperadas = inference.obtener_predictor().predecir_lote(ids, [(12, 2025), (1, 2026)])
+        self.assertEqual(len(lineas) - 1, len(esperadas))
+        for linea, esperada in zip(lineas, esperadas):
+            self.assertEqual(linea['producto_id'], esperada['producto']['id'])
+            self.assertEqual((linea['mes'], linea['anio']), (
+                esperada['features_utilizados']['mes'], esperada['features_utilizados']['anio']
+            ))
+            self.assertAlmostEqual(linea['prediccion'], esperada['prediccion'])
+
+    def test_filtro_por_categoria(self):
+        self.entrenar()
+        categoria = self.productos[0].categoria
+
+        lineas = self._lineas(self.client.post(
+            self.URL, {'categoria_id': categoria.id}, content_type='application/json'
+        ))
+
+        self.assertEqual(
+            sorted(linea['producto_id'] for linea in lineas),
+            sorted(producto.id for producto in self.productos if producto.categoria_id == categoria.id)
+        )
+        self.assertNotIn('no_encontrados', lineas[-1])
+
+    def test_entrada_invalida(self):
+        self.entrenar()
+        for datos in (
+            {'productos_ids': [self.productos[0].id], 'meses': settings.ML_LOTE_MAX_MESES + 1},
+            {'productos_ids': []},
+            {'meses': 3},
+        ):
+            respuesta = self.client.post(self.URL, datos, content_type='application/json')
+            self.assertEqual(respuesta.status_code, 400, datos)
+
+    def test_sin_modelo(self):
+        respuesta = self.client.post(
+            self.URL, {'productos_ids': [self.productos[0].id]}, content_type='application/json'
+        )
+
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertIn('error', respuesta.json())
+
+
+class TendenciaTests(ModeloTestCase):
+
+    def test_periodos_consecutivos_cruzan_el_anio(self):
+        self.assertEqual(
+            inference.periodos_consecutivos(11, 2025, 4),
+            [(11, 2025), (12, 2025), (1, 2026), (2, 2026)]
+        )
+        self.assertEqual(len(inference.periodos_consecutivos(1, 2025, 25)), 25)
+        self.assertEqual(inference.periodos_consecutivos(1, 2025, 25)[-1], (1, 2027))
+
+    def test_tendencia_avanza_por_mes_calendario(self):
+        self.entrenar()
+        prediccion = inference.PrediccionVentas()
+        producto_id = self.productos[0].id
+
+        resultado = prediccion.predecir_tendencia_producto(producto_id, meses_futuro=14)
+
+        inicio = resultado['fecha_inicio']
+        periodos = inference.periodos_consecutivos(inicio.month, inicio.year, 14)
+        self.assertEqual(
+            [(punto['mes'], punto['anio']) for punto in resultado['tendencia']], periodos
+        )
+        esperadas = prediccion.predecir_lote([producto_id], periodos, usar_cache=False)
+        for punto, esperada in zip(resultado['tendencia'], esperadas):
+            self.assertAlmostEqual(punto['prediccion'], esperada['prediccion'])
+            self.assertEqual(punto['intervalo_confianza'], esperada['intervalo_confianza'])
+
+
+@override_settings(ML_RECARGA_REVISION_SEG=0)
+class RecargaPredictorTests(ModeloTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # La recarga corre en el mismo hilo para poder revisar el resultado
+        self.recargas = []
+        def hilo(target, args=(), daemon=None):
+            return SimpleNamespace(start=lambda: (self.recargas.append(args[0]), target(*args)))
+        parche = mock.patch.object(inference, 'threading', SimpleNamespace(Thread=hilo))
+        parche.start()
+        self.addCleanup(parche.stop)
+
+    def test_version_nueva_reemplaza_a_la_instancia(self):
+        anterior = self.entrenar()['version']
+        instancia = inference.obtener_predictor()
+        self.assertEqual(instancia.predictor.version, anterior)
+
+        nueva = self.entrenar()['version']
+        recargada = inference.obtener_predictor()
+
+        self.assertEqual(self.recargas, [nueva])
+        self.assertEqual(recargada.predictor.version, nueva)
+        self.assertIs(inference.obtener_predictor(), recargada)
+        # Quien ya tenía la instancia anterior la sigue usando
+        self.assertEqual(instancia.predictor.version, anterior)
+        self.assertTrue(instancia.predecir_lote([self.productos[0].id], [(1, 2026)], usar_cache=False))
+
+    def test_version_fallida_no_se_reintenta(self):
+        vigente = self.entrenar()['version']
+        inference.obtener_predictor()
+
+        # Versión publicada sin artefactos: no se puede cargar
+        os.makedirs(ruta_version('20000101000000000000'))
+        publicar_version('20000101000000000000')
+        for _ in range(3):
+            instancia = inference.obtener_predictor()
+
+        self.assertEqual(self.recargas, ['20000101000000000000'])
+        self.assertEqual(instancia.predictor.version, vigente)
+        self.assertTrue(instancia.modelo_cargado)
+
+        # Cuando el puntero cambia de nuevo se vuelve a revisar
+        nueva = self.entrenar()['version']
+        self.assertEqual(inference.obtener_predictor().predictor.version, nueva)
+        self.assertEqual(self.recargas, ['20000101000000000000', nueva])
+
+
+class RegistroVersionesTests(ModeloTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.primera = self.entrenar()['version']
+        self.segunda = self.entrenar()['version']
+
+    def test_revertir_y_promover(self):
+        self.assertEqual(leer_version_actual(), self.segunda)
+        self.assertEqual(
+            [(item['version'], item['vigente']) for item in listar_versiones()],
+            [(self.segunda, True), (self.primera, False)]
+        )
+
+        self.assertEqual(revertir_version(), self.primera)
+        self.assertEqual(leer_version_actual(), self.primera)
+        predictor = VentasPredictor()
+        predictor.cargar_modelo()
+        self.assertEqual(predictor.version, self.primera)
+
+        promover_version(self.segunda)
+        self.assertEqual(leer_version_actual(), self.segunda)
+        self.assertEqual(revertir_version(), self.primera)
+
+        with self.assertRaises(ValueError):
+            revertir_version()
+        self.assertEqual(leer_version_actual(), self.primera)
+
+    def test_metadata_con_checksums(self):
+        metadata = leer_metadata(self.segunda)
+
+        self.assertEqual(metadata['version'], self.segunda)
+        self.assertIn('metricas', metadata)
+        self.assertTrue(metadata['artefactos'])
+
+    def test_no_promueve_una_version_dañada(self):
+        revertir_version()
+        artefacto = next(iter(leer_metadata(self.segunda)['artefactos']))
+        with open(os.path.join(ruta_version(self.segunda), artefacto), 'ab') as archivo:
+            archivo.write(b'x')
+
+        with self.assertRaises(ValueError):
+            promover_version(self.segunda)
+        self.assertEqual(leer_version_actual(), self.primera)
+
+    def test_no_publica_una_version_inexistente(self):
+        with self.assertRaises(ValueError):
+            promover_version('19990101000000000000', verificar=False)
+        self.assertEqual(leer_version_actual(), self.segunda)
+
+
+class ActualizacionIncrementalTests(ModeloTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.base = self.entrenar()['version']
+        self.anterior = VentasPredictor()
+        self.anterior.cargar_modelo()
+
+        # Ventas posteriores al último periodo del modelo base
+        rng = np.random.RandomState(3)
+        for i in range(30):
+            self._crear_venta(datetime(2025, 1 + i % 3, 1 + i % 28, tzinfo=timezone.utc), 'pagada', rng)
+
+    def actualizar(self, **opciones):
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', UserWarning)
+            return actualizar_y_guardar_modelo(arboles=5, meses=3, materializar_meses=0, **opciones)
+
+    def assertArbolesIguales(self, obtenidos, esperados):
+        self.assertEqual(len(obtenidos), len(esperados))
+        for obtenido, esperado in zip(obtenidos, esperados):
+            np.testing.assert_array_equal(obtenido.tree_.threshold, esperado.tree_.threshold)
+            np.testing.assert_array_equal(obtenido.tree_.value, esperado.tree_.value)
+
+    def test_agrega_arboles_y_retira_los_mas_antiguos(self):
+        resultado = self.actualizar(retirar=True)
+
+        n_previos = len(self.anterior.model.estimators_)
+        self.assertEqual(resultado['n_arboles'], n_previos)
+        self.assertNotEqual(resultado['version'], self.base)
+        self.assertEqual(leer_version_actual(), resultado['version'])
+
+        actualizado = VentasPredictor()
+        actualizado.cargar_modelo()
+        self.assertArbolesIguales(
+            actualizado.model.estimators_[:-5], self.anterior.model.estimators_[5:]
+        )
+        metadata = leer_metadata(resultado['version'])
+        self.assertEqual(metadata['incremental']['base'], self.base)
+        self.assertEqual(metadata['incremental']['actualizaciones'], 1)
+        self.assertEqual(metadata['incremental']['arboles_retirados'], 5)
+        self.assertGreater(metadata['incremental']['filas_nuevas'], 0)
+        self.assertIn('r2_test', resultado['metricas'])
+
+    def test_conserva_todos_los_arboles_sin_retirar(self):
+        resultado = self.actualizar(retirar=False)
+
+        actualizado = VentasPredictor()
+        actualizado.cargar_modelo()
+        self.assertEqual(resultado['n_arboles'], len(self.anterior.model.estimators_) + 5)
+        self.assertArbolesIguales(actualizado.model.estimators_[:-5], self.anterior.model.estimators_)
+
+    def test_actualizaciones_sucesivas_usan_semillas_distintas(self):
+        self.actualizar(retirar=False)
+        segunda = self.actualizar(retirar=False)
+
+        actualizado = VentasPredictor()
+        actualizado.cargar_modelo()
+        semillas = [arbol.random_state for arbol in actualizado.model.estimators_[-10:]]
+        self.assertEqual(len(set(semillas)), 10)
+        self.assertEqual(leer_metadata(segunda['version'])['incremental']['actualizaciones'], 2)
@@ -0,0 +1,342 @@
+"""
+Módulo para ejecutar el entrenamiento del modelo como trabajo en segundo plano
+"""
+import fcntl
+import json
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from django.conf import settings
+
+
+# Estados de un trabajo que todavía ocupa el turno de entrenamiento
+ESTADOS_ACTIVOS = ('pendiente', 'en_curso')
+
+
+def _directorio_trabajos():
+    return os.path.join(settings.ML_MODELS_DIR, 'trabajos')
+
+
+def _ruta_trabajo(job_id):
+    return os.path.join(_directorio_trabajos(), f'{job_id}.json')
+
+
+def _ruta_lock():
+    return os.path.join(settings.ML_MODELS_DIR, 'entrenamiento.lock')
+
+
+def _ruta_turno():
+    return os.path.join(settings.ML_MODELS_DIR, 'entrenamiento.trabajo')
+
+
+def _ruta_lock_turno():
+    return os.path.join(settings.ML_MODELS_DIR, 'entrenamiento_turno.lock')
+
+
+def _guardar_trabajo(trabajo):
+    """
+    Escribe el estado del trabajo (visible desde cualquier worker)
+    """
+    os.makedirs(_directorio_trabajos(), exist_ok=True)
+    ruta = _ruta_trabajo(trabajo['job_id'])
+    temporal = f'{ruta}.tmp'
+    with open(temporal, 'w') as archivo:
+        json.dump(trabajo, archivo, ensure_ascii=False, default=str)
+    os.replace(temporal, ruta)
+
+
+def obtener_trabajo(job_id):
+    """
+    Obtiene el estado de un trabajo de entrenamiento (None si no existe)
+    """
+    try:
+        with open(_ruta_trabajo(job_id)) as archivo:
+            return json.load(archivo)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _proceso_vivo(pid):
+    """
+    Si el proceso sigue existiendo en este host
+    """
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def trabajo_en_curso():
+    """
+    Obtiene el trabajo pendiente o en curso que tiene el turno de entrenamiento
+    (None si no hay)
+
+    Solo lee el archivo del turno y el estado del trabajo: no toma el lock de
+    entrenamiento, así que consultar nunca compite con el proceso que entrena.
+    Un trabajo activo cuyo proceso ya no existe (worker reiniciado o matado)
+    no ocupa el turno. El proceso solo se puede revisar desde el host que lo
+    registró: si ML_MODELS_DIR se comparte entre hosts, un trabajo de otro
+    host ocupa el turno hasta que su estado cambia.
+    """
+    try:
+        with open(_ruta_turno()) as archivo:
+            job_id = archivo.read().strip()
+    except FileNotFoundError:
+        return None
+
+    trabajo = obtener_trabajo(job_id)
+    if trabajo is None or trabajo['estado'] not in ESTADOS_ACTIVOS:
+        return None
+    if (
+        trabajo.get('pid') is not None
+        and trabajo.get('host', socket.gethostname()) == socket.gethostname()
+        and not _proceso_vivo(trabajo['pid'])
+    ):
+        return None
+    return trabajo
+
+
+def _podar_trabajos():
+    """
+    Elimina los archivos de trabajos terminados hace más de ML_TRABAJOS_RETENCION_DIAS
+    """
+    limite = time.time() - settings.ML_TRABAJOS_RETENCION_DIAS * 86400
+    try:
+        nombres = os.listdir(_directorio_trabajos())
+    except FileNotFoundError:
+        return
+
+    for nombre in nombres:
+        ruta = os.path.join(_directorio_trabajos(), nombre)
+        try:
+            if os.path.getmtime(ruta) >= limite:
+                continue
+            with open(ruta) as archivo:
+                if json.load(archivo)['estado'] in ESTADOS_ACTIVOS:
+                    continue
+            os.remove(ruta)
+        except (FileNotFoundError, ValueError, KeyError):
+            continue
+
+
+def _proceso_entrenamiento(*args):
+    """
+    Punto de entrada del proceso de entrenamiento: prepara Django y entrena
+    """
+    import django
+    django.setup()
+    ejecutar_entrenamiento(*args)
+
+
+def _lanzar_proceso(job_id, *args):
+    """
+    Lanza el entrenamiento en un proceso propio que termina con el trabajo
+
+    El proceso no queda ocioso entre trabajos: sklearn, numpy y pandas solo
+    ocupan memoria mientras se entrena. Un hilo del worker web espera que
+    termine para recogerlo y marcar el trabajo si murió sin terminarlo.
+    """
+    # spawn: el proceso no hereda hilos ni conexiones del worker web
+    proceso = multiprocessing.get_context('spawn').Process(
+        target=_proceso_entrenamiento, args=(job_id, *args)
+    )
+    proceso.start()
+    threading.Thread(target=_esperar_proceso, args=(job_id, proceso), daemon=True).start()
+
+
+def enviar_entrenamiento(materializar_meses=None, evaluacion=None, ajustar_hiperparametros=None,
+                         backend=None, tiempo_objetivo=None, fragmentos=None):
+    """
+    Encola un entrenamiento en el proceso de segundo plano
+
+    Args:
+        materializar_meses: Ver entrenar_y_guardar_modelo
+        evaluacion: Estrategia de evaluación ('oob', 'cv' o 'holdout')
+        ajustar_hiperparametros: Si True, busca los hiperparámetros antes de entrenar
+        backend: Algoritmo del modelo (ver backends.BACKENDS)
+        tiempo_objetivo: Segundos objetivo del ajuste (ver entrenar_y_guardar_modelo)
+        fragmentos: Fragmentos en los que se reparten los árboles (ver entrenar_y_guardar_modelo)
+
+    Returns:
+        tuple (trabajo, creado). Si ya hay un entrenamiento pendiente o en curso
+        no se crea otro y se devuelve el existente con creado=False.
+    """
+    os.makedirs(settings.ML_MODELS_DIR, exist_ok=True)
+    with open(_ruta_lock_turno(), 'a+') as lock_turno:
+        # Lock breve y distinto del de entrenamiento: solo ordena los envíos
+        # de todos los workers, que así deciden el turno de a uno
+        fcntl.flock(lock_turno, fcntl.LOCK_EX)
+
+        activo = trabajo_en_curso()
+        if activo is not None:
+            return activo, False
+
+        _podar_trabajos()
+
+        trabajo = _crear_trabajo(evaluacion, ajustar_hiperparametros, backend,
+                                 tiempo_objetivo, fragmentos)
+        _guardar_trabajo(trabajo)
+        temporal = f'{_ruta_turno()}.tmp'
+        with open(temporal, 'w') as archivo:
+            archivo.write(trabajo['job_id'])
+        os.replace(temporal, _ruta_turno())
+
+    try:
+        _lanzar_proceso(
+            trabajo['job_id'], materializar_meses, evaluacion, ajustar_hiperparametros,
+            backend, tiempo_objetivo, fragmentos
+        )
+    except Exception as e:
+        # El proceso no llegó a lanzarse: libera el turno
+        trabajo.update(estado='error', finalizado=datetime.now().isoformat(), error=str(e))
+        _guardar_trabajo(trabajo)
+        raise
+    return trabajo, True
+
+
+def _crear_trabajo(evaluacion, ajustar_hiperparametros, backend, tiempo_objetivo, fragmentos):
+    """
+    Estado inicial de un trabajo (el pid es el del worker que lo encola hasta
+    que el proceso de entrenamiento lo toma; host es donde corre ese pid)
+    """
+    return {
+        'job_id': uuid.uuid4().hex,
+        'estado': 'pendiente',
+        'fase': 'en_cola',
+        'progreso': 0.0,
+        'evaluacion': evaluacion,
+        'ajustar_hiperparametros': ajustar_hiperparametros,
+        'backend': backend,
+        'tiempo_objetivo': tiempo_objetivo,
+        'fragmentos': fragmentos,
+        'pid': os.getpid(),
+        'host': socket.gethostname(),
+        'creado': datetime.now().isoformat(),
+        'iniciado': None,
+        'finalizado': None,
+        'tiempos': {},
+        'resultado': None,
+        'error': None
+    }
+
+
+def _esperar_proceso(job_id, proceso):
+    """
+    Espera el fin del proceso de entrenamiento y marca el trabajo con error si
+    el proceso murió sin terminarlo
+    """
+    proceso.join()
+    if proceso.exitcode == 0:
+        return
+
+    trabajo = obtener_trabajo(job_id)
+    if trabajo is not None and trabajo['estado'] in ESTADOS_ACTIVOS:
+        trabajo.update(
+            estado='error',
+            finalizado=datetime.now().isoformat(),
+            error=f'El proceso de entrenamiento terminó de forma anormal (código {proceso.exitcode})'
+        )
+        _guardar_trabajo(trabajo)
+
+
+def ejecutar_entrenamiento(job_id, materializar_meses=None, evaluacion=None,
+                           ajustar_hiperparametros=None, backend=None, tiempo_objetivo=None,
+                           fragmentos=None):
+    """
+    Ejecuta un trabajo de entrenamiento (en el proceso de segundo plano)
+
+    Usa ML_TRABAJO_N_JOBS núcleos en lugar de ML_ENTRENAMIENTO_N_JOBS: el
+    proceso corre junto a los workers web.
+
+    Espera el lock de entrenamiento a lo sumo ML_ENTRENAMIENTO_ESPERA_LOCK_SEG:
+    si otro entrenamiento lo sigue teniendo, este termina con error en lugar
+    de entrenar en paralelo.
+    """
+    from django.db import connections
+    from .ml_model import entrenar_y_guardar_modelo
+
+    trabajo = obtener_trabajo(job_id)
+    os.makedirs(settings.ML_MODELS_DIR, exist_ok=True)
+
+    with open(_ruta_lock(), 'a+') as archivo_lock:
+        limite = time.monotonic() + settings.ML_ENTRENAMIENTO_ESPERA_LOCK_SEG
+        while True:
+            try:
+                fcntl.flock(archivo_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if time.monotonic() >= limite:
+                    trabajo.update(
+                        estado='error',
+                        finalizado=datetime.now().isoformat(),
+                        error='Ya hay un entrenamiento en curso'
+                    )
+                    _guardar_trabajo(trabajo)
+                    return trabajo
+                time.sleep(0.1)
+
+        inicio_fase = [time.perf_counter()]
+
+        def reportar(fase, progreso):
+            ahora = time.perf_counter()
+            if trabajo['fase'] != 'en_cola':
+                trabajo['tiempos'][trabajo['fase']] = round(ahora - inicio_fase[0], 3)
+            inicio_fase[0] = ahora
+            trabajo.update(fase=fase, progreso=progreso)
+            _guardar_trabajo(trabajo)
+
+        trabajo.update(
+            estado='en_curso', iniciado=datetime.now().isoformat(),
+            pid=os.getpid(), host=socket.gethostname()
+        )
+        _guardar_trabajo(trabajo)
+        inicio = time.perf_counter()
+
+        try:
+            resultado = entrenar_y_guardar_modelo(
+                materializar_meses=materializar_meses,
+                reportar=reportar,
+                evaluacion=evaluacion,
+                ajustar_hiperparametros=ajustar_hiperparametros,
+                backend=backend,
+                tiempo_objetivo=tiempo_objetivo,
+                fragmentos=fragmentos,
+                n_jobs=settings.ML_TRABAJO_N_JOBS
+            )
+            reportar('completado', 1.0)
+            trabajo.update(
+                estado='completado',
+                resultado={
+                    'metricas': {k: round(float(v), 4) for k, v in resultado['metricas'].items()},
+                    'fecha_entrenamiento': resultado['fecha_entrenamiento'],
+                    'num_registros': resultado['num_registros'],
+                    'version': resultado['version'],
+                    'backend': resultado['backend'],
+                    'evaluacion': resultado['evaluacion'],
+                    'tiempos_entrenamiento': {
+                        fase: round(segundos, 3) for fase, segundos in resultado['tiempos'].items()
+                    },
+                    'hiperparametros': resultado['hiperparametros'],
+                    'latencia': resultado['latencia'],
+                    'presupuesto': resultado['presupuesto'],
+                    'fragmentos': resultado['fragmentos'],
+                    'pronosticos_materializados': resultado['pronosticos_materializados']
+                }
+            )
+        except Exception as e:
+            trabajo.update(estado='error', error=str(e))
+        finally:
+            trabajo['tiempos']['total'] = round(time.perf_counter() - inicio, 3)
+            trabajo['finalizado'] = datetime.now().isoformat()
+            _guardar_trabajo(trabajo)
+            connections.close_all()
+
+    return trabajo
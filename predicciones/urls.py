@@ -1,7 +1,9 @@
 from django.urls import path
 from .views import (
     EntrenarModeloView,
+    EstadoEntrenamientoView,
     PrediccionVentasView,
+    PrediccionLoteView,
     TendenciaVentasView,
     TopProductosPrediccionView,
     EstadisticasVentasView,
@@ -18,12 +20,14 @@ urlpatterns = [
     
     # Entrenamiento
     path('entrenar/', EntrenarModeloView.as_view(), name='entrenar-modelo'),
+    path('entrenar/<str:job_id>/', EstadoEntrenamientoView.as_view(), name='estado-entrenamiento'),
     
     # Cache
     path('limpiar-cache/', LimpiarCacheView.as_view(), name='limpiar-cache'),
     
     # Predicciones
     path('predecir/', PrediccionVentasView.as_view(), name='predecir-ventas'),
+    path('predecir-lote/', PrediccionLoteView.as_view(), name='predecir-lote'),
     path('tendencia/<int:producto_id>/', TendenciaVentasView.as_view(), name='tendencia-ventas'),
     path('top-productos/', TopProductosPrediccionView.as_view(), name='top-productos'),
     path('agregadas/', PrediccionAgregadaView.as_view(), name='prediccion-agregada'),
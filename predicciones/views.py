@@ -1,62 +1,96 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db.models import Sum, Count, Avg
+from django.http import StreamingHttpResponse
+from django.urls import reverse
 from datetime import datetime
+import json
 
 from .serializers import (
     PrediccionVentasInputSerializer,
+    PrediccionLoteInputSerializer,
+    EntrenamientoInputSerializer,
     PrediccionVentasOutputSerializer,
-    EntrenamientoModeloSerializer,
     EstadisticasVentasSerializer
 )
-from .ml_model import entrenar_y_guardar_modelo
-from .inference import obtener_predictor
+from .inference import obtener_predictor, periodos_consecutivos
+from .trabajos import enviar_entrenamiento, obtener_trabajo
+from .memoria import reporte_memoria
 from .models import NotaVenta, Detalle_Venta, Producto
 
 
 class EntrenarModeloView(APIView):
     """
     POST /api/predicciones/entrenar/
-    Entrena el modelo de Random Forest con los datos históricos
+    Encola el entrenamiento del modelo de Random Forest con los datos históricos
+    
+    El entrenamiento corre en un proceso aparte; la respuesta incluye el
+    job_id para consultar su estado en GET /api/predicciones/entrenar/<job_id>/.
+    Si ya hay un entrenamiento en curso se devuelve ese trabajo (409).
+    
+    Body opcional: {"evaluacion": "oob" | "cv" | "holdout", "ajustar_hiperparametros": true,
+                    "backend": "random_forest" | "extra_trees" | "hist_gradient_boosting",
+                    "tiempo_objetivo": <segundos>, "fragmentos": <n>}
     """
     
     def post(self, request):
+        serializer = EntrenamientoInputSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
         try:
-            # Entrenar modelo
-            resultado = entrenar_y_guardar_modelo()
+            trabajo, creado = enviar_entrenamiento(
+                evaluacion=serializer.validated_data.get('evaluacion'),
+                ajustar_hiperparametros=serializer.validated_data.get('ajustar_hiperparametros'),
+                backend=serializer.validated_data.get('backend'),
+                tiempo_objetivo=serializer.validated_data.get('tiempo_objetivo'),
+                fragmentos=serializer.validated_data.get('fragmentos')
+            )
             
-            # Preparar respuesta
             response_data = {
-                'mensaje': 'Modelo entrenado y guardado exitosamente',
-                'metricas': {
-                    'r2_test': round(resultado['metricas']['r2_test'], 4),
-                    'rmse_test': round(resultado['metricas']['rmse_test'], 4),
-                    'mae_test': round(resultado['metricas']['mae_test'], 4),
-                    'cv_r2_mean': round(resultado['metricas']['cv_r2_mean'], 4),
-                },
-                'fecha_entrenamiento': resultado['fecha_entrenamiento'],
-                'num_registros': Detalle_Venta.objects.filter(nota_venta__estado='pagada').count()
+                'mensaje': (
+                    'Entrenamiento encolado' if creado
+                    else 'Ya hay un entrenamiento en curso'
+                ),
+                'job_id': trabajo['job_id'],
+                'estado': trabajo['estado'],
+                'url_estado': request.build_absolute_uri(
+                    reverse('predicciones:estado-entrenamiento', args=[trabajo['job_id']])
+                )
             }
             
-            serializer = EntrenamientoModeloSerializer(data=response_data)
-            if serializer.is_valid():
-                return Response(serializer.data, status=status.HTTP_200_OK)
-            
-            return Response(response_data, status=status.HTTP_200_OK)
-            
-        except ValueError as e:
             return Response(
-                {'error': str(e)},
-                status=status.HTTP_400_BAD_REQUEST
+                response_data,
+                status=status.HTTP_202_ACCEPTED if creado else status.HTTP_409_CONFLICT
             )
+            
         except Exception as e:
             return Response(
-                {'error': f'Error al entrenar el modelo: {str(e)}'},
+                {'error': f'Error al encolar el entrenamiento: {str(e)}'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
 
+class EstadoEntrenamientoView(APIView):
+    """
+    GET /api/predicciones/entrenar/<job_id>/
+    Obtiene fase, progreso, tiempos y métricas de un trabajo de entrenamiento
+    """
+    
+    def get(self, request, job_id):
+        trabajo = obtener_trabajo(job_id)
+        if trabajo is None:
+            return Response(
+                {'error': f'No existe el trabajo {job_id}'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        return Response(trabajo, status=status.HTTP_200_OK)
+
+
 class PrediccionVentasView(APIView):
     """
     POST /api/predicciones/predecir/
@@ -103,6 +137,82 @@ class PrediccionVentasView(APIView):
             )
 
 
+class PrediccionLoteView(APIView):
+    """
+    POST /api/predicciones/predecir-lote/
+    Predice ventas para muchos productos y meses en una sola petición.
+    La respuesta se envía como NDJSON (un objeto JSON por línea). Si algún
+    ID pedido no corresponde a ningún producto, la última línea es
+    {"no_encontrados": [ids]}.
+    
+    Body:
+    {
+        "productos_ids": [1, 2, 3],  // o producto_id / categoria_id / marca_id
+        "mes": 12,  // opcional, mes inicial
+        "anio": 2025,  // opcional, año inicial
+        "meses": 6  // opcional, cantidad de meses desde mes/anio
+    }
+    """
+    
+    def post(self, request):
+        # Validar entrada
+        serializer = PrediccionLoteInputSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        datos = serializer.validated_data
+        predictor = obtener_predictor()
+        if not predictor.modelo_cargado:
+            return Response(
+                {'error': 'El modelo no está cargado. Entrena el modelo primero.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Productos a predecir (filtrados sobre el catálogo en memoria)
+        ids = list(datos.get('productos_ids', []))
+        if datos.get('producto_id') is not None:
+            ids.append(datos['producto_id'])
+        snapshot, posiciones = predictor.catalogo.buscar(ids)
+        no_encontrados = sorted({
+            producto_id for producto_id, posicion in zip(ids, posiciones) if posicion < 0
+        })
+        productos_ids = snapshot.filtrar(
+            productos_ids=ids or None,
+            categoria_id=datos.get('categoria_id'),
+            marca_id=datos.get('marca_id')
+        ).tolist()
+        
+        fecha_actual = datetime.now()
+        periodos = periodos_consecutivos(
+            datos.get('mes') or fecha_actual.month,
+            datos.get('anio') or fecha_actual.year,
+            datos['meses']
+        )
+        
+        def generar_lineas():
+            try:
+                for pred in predictor.predecir_lote_iterativo(productos_ids, periodos):
+                    linea = {
+                        'producto_id': pred['producto']['id'],
+                        'mes': pred['features_utilizados']['mes'],
+                        'anio': pred['features_utilizados']['anio'],
+                        'prediccion': pred['prediccion'],
+                        'intervalo_confianza': pred['intervalo_confianza'],
+                        'producto': pred['producto']
+                    }
+                    yield json.dumps(linea, cls=DjangoJSONEncoder) + '\n'
+                if no_encontrados:
+                    yield json.dumps({'no_encontrados': no_encontrados}) + '\n'
+            except Exception as e:
+                yield json.dumps({'error': f'Error al realizar predicción: {str(e)}'}) + '\n'
+        
+        return StreamingHttpResponse(
+            generar_lineas(),
+            content_type='application/x-ndjson',
+            status=status.HTTP_200_OK
+        )
+
+
 class TendenciaVentasView(APIView):
     """
     GET /api/predicciones/tendencia/{producto_id}/?meses=6
@@ -111,7 +221,10 @@ class TendenciaVentasView(APIView):
     
     def get(self, request, producto_id):
         try:
-            meses_futuro = int(request.query_params.get('meses', 6))
+            meses_futuro = min(
+                int(request.query_params.get('meses', 6)),
+                settings.ML_TENDENCIA_MAX_MESES
+            )
             
             predictor = obtener_predictor()
             resultado = predictor.predecir_tendencia_producto(
@@ -241,13 +354,14 @@ class PrediccionAgregadaView(APIView):
     
     def get(self, request):
         try:
-            # Limitar a 6 meses por defecto para Render gratuito
-            meses = int(request.query_params.get('meses', 6))
-            if meses > 12:
-                meses = 12  # Máximo 12 meses
-            top_productos = int(request.query_params.get('top_productos', 3))
-            if top_productos > 5:
-                top_productos = 5  # Máximo 5 productos
+            meses = min(
+                int(request.query_params.get('meses', 6)),
+                settings.ML_AGREGADA_MAX_MESES
+            )
+            top_productos = min(
+                int(request.query_params.get('top_productos', 3)),
+                settings.ML_AGREGADA_MAX_TOP_PRODUCTOS
+            )
             
             predictor = obtener_predictor()
             resultado = predictor.predecir_ventas_totales_agregadas(
@@ -279,7 +393,8 @@ class HealthCheckView(APIView):
                 'status': 'ok',
                 'modelo': modelo_estado,
                 'timestamp': datetime.now(),
-                'database': 'conectada'
+                'database': 'conectada',
+                'memoria': reporte_memoria()
             }, status=status.HTTP_200_OK)
             
         except Exception as e:
@@ -59,9 +59,10 @@ def check_ml_directory():
         print(f"✅ Directorio ML existe: {ml_dir}")
         
         # Verificar si hay modelo entrenado
-        modelo_path = os.path.join(ml_dir, 'modelo_rf.pkl')
-        if os.path.exists(modelo_path):
-            print(f"   ✅ Modelo entrenado encontrado: modelo_rf.pkl\n")
+        version_path = os.path.join(ml_dir, 'version_modelo.txt')
+        if os.path.exists(version_path):
+            with open(version_path) as archivo:
+                print(f"   ✅ Modelo entrenado encontrado: versión {archivo.read().strip()}\n")
         else:
             print(f"   ⚠️ No hay modelo entrenado. Ejecuta POST /api/predicciones/entrenar/\n")
     else:
@@ -43,13 +43,17 @@ try:
     print(f"   R² Test: {metricas['r2_test']:.4f}")
     print(f"   RMSE Test: {metricas['rmse_test']:.4f}")
     print(f"   MAE Test: {metricas['mae_test']:.4f}")
-    print(f"   CV R² Mean: {metricas['cv_r2_mean']:.4f} ± {metricas['cv_r2_std']:.4f}")
+    if 'cv_r2_mean' in metricas:
+        print(f"   CV R² Mean: {metricas['cv_r2_mean']:.4f} ± {metricas['cv_r2_std']:.4f}")
+    if 'oob_r2' in metricas:
+        print(f"   OOB R²: {metricas['oob_r2']:.4f}")
+    print(f"   Evaluación: {resultado['evaluacion']} (entrenamiento en {resultado['tiempos']['total']:.2f}s)")
     
     print("\n🎯 Importancia de Features (Top 5):")
     for i, (feature, importancia) in enumerate(list(resultado['feature_importance'].items())[:5], 1):
         print(f"   {i}. {feature}: {importancia:.4f}")
     
-    print("\n💾 Modelo guardado en: predicciones/ml_models/modelo_rf.pkl")
+    print(f"\n💾 Modelo guardado en: predicciones/ml_models/versiones/{resultado['version']}/")
     print("="*60 + "\n")
     
 except Exception as e: